@@ -6,10 +6,11 @@ El latch recuerda la última cabina inferida al parar (cab 2 sigue en Auto).
 """
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, Dict, Optional
 
 from core.raildriver import RailDriverClient, get_raildriver_client
+from core.telemetry_frame import TelemetryFrame
 
 MIN_SPEED_MS = 0.5
 WHEEL_CAB2_MS = 0.15
@@ -17,26 +18,29 @@ TRACK_CAB2_MPH = 0.3
 REV_FORWARD = 0.05
 REV_REVERSE = -0.05
 
+# Claves Lua de las que depende la inferencia (velocidad, reverser, cabina, loco).
+CAB_INPUT_KEYS = frozenset({
+    "SpeedoType",
+    "CabSpeed",
+    "CurrentSpeed",
+    "Speed",
+    "Reversal",
+    "Reverser",
+    "ActiveCab",
+    "LocoName",
+})
+
 
 @dataclass
 class CabInferenceState:
     latched_cab: int = 0  # 0 = sin latch, 1 o 2
+    # Últimos campos escritos, para reaplicarlos en frames sin cambios de entrada.
+    last_fields: Dict[str, Any] = field(default_factory=dict)
 
 
-def _speed_ms(data: Dict[str, Any]) -> float:
-    try:
-        return abs(float(data.get("CurrentSpeed") or data.get("Speed") or 0.0))
-    except (TypeError, ValueError):
-        return 0.0
-
-
-def _reversal(data: Dict[str, Any], rd: RailDriverClient) -> float:
-    for key in ("Reversal", "Reverser"):
-        if key in data:
-            try:
-                return float(data[key])
-            except (TypeError, ValueError):
-                pass
+def _reversal(frame: TelemetryFrame, rd: RailDriverClient) -> float:
+    if frame.has_reversal:
+        return frame.reversal
     val = rd.get_value("UserVirtualReverser")
     if val is not None:
         return float(val)
@@ -80,7 +84,7 @@ def _infer_from_motion(
 
 
 def enrich_cab_telemetry(
-    data: Dict[str, Any],
+    frame: TelemetryFrame,
     state: CabInferenceState,
     client: Optional[RailDriverClient] = None,
 ) -> None:
@@ -88,10 +92,32 @@ def enrich_cab_telemetry(
     rd = client or get_raildriver_client()
     if not rd.available:
         return
-
+    _enrich(frame, state, rd)
+    data = frame.data
+    state.last_fields = {
+        key: data[key]
+        for key in ("LocoName", "WheelSpeedMS", "TrackMPH", "ActiveCab")
+        if key in data
+    }
+
+
+def reapply_cab_fields(frame: TelemetryFrame, state: CabInferenceState) -> None:
+    """Frame sin cambios en CAB_INPUT_KEYS: reutiliza el último enriquecimiento sin RailDriver."""
+    fields = state.last_fields
+    if "LocoName" in fields:
+        frame.set_loco_name(fields["LocoName"])
+    for key in ("WheelSpeedMS", "TrackMPH"):
+        if key in fields:
+            frame.data[key] = fields[key]
+    if "ActiveCab" in fields:
+        frame.set_active_cab(fields["ActiveCab"])
+
+
+def _enrich(frame: TelemetryFrame, state: CabInferenceState, rd: RailDriverClient) -> None:
+    data = frame.data
     loco = rd.get_loco_names()
     if loco:
-        data["LocoName"] = " / ".join(loco)
+        frame.set_loco_name(" / ".join(loco))
 
     wheel_ms = rd.get_value("WheelSpeedAbsMS")
     track_mph = rd.get_value("TrackMPH")
@@ -100,24 +126,18 @@ def enrich_cab_telemetry(
     if track_mph is not None:
         data["TrackMPH"] = track_mph
 
-    try:
-        reported = int(float(data.get("ActiveCab") or 1))
-    except (TypeError, ValueError):
-        reported = 1
-
-    if reported == 2:
+    if frame.active_cab == 2:
         state.latched_cab = 2
-        data["ActiveCab"] = 2
+        frame.set_active_cab(2)
         return
 
-    reversal = _reversal(data, rd)
-    speed_ms = _speed_ms(data)
-    motion_cab = _infer_from_motion(reversal, speed_ms, wheel_ms, track_mph)
+    reversal = _reversal(frame, rd)
+    motion_cab = _infer_from_motion(reversal, frame.speed_ms, wheel_ms, track_mph)
 
     if motion_cab is not None:
         state.latched_cab = motion_cab
-        data["ActiveCab"] = motion_cab
+        frame.set_active_cab(motion_cab)
         return
 
     if state.latched_cab in (1, 2):
-        data["ActiveCab"] = state.latched_cab
+        frame.set_active_cab(state.latched_cab)
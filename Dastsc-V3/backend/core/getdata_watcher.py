@@ -0,0 +1,484 @@
+"""
+getdata_watcher.py — Detección de cambios en GetData.txt sin sondeo fijo a 100 Hz.
+
+Fuentes enchufables: inotify (Linux), notificaciones de directorio Win32 (Windows)
+y sondeo por mtime como fallback. Un hilo lector deja cada línea nueva en una
+asyncio.Queue (solo el frame más reciente) que consume telemetry_reader.
+"""
+from __future__ import annotations
+
+import asyncio
+import ctypes
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+POLL_INTERVAL_S = 0.01
+MISSING_FILE_RETRY_S = 1.0
+# Relecturas de un frame incompleto dentro del mismo aviso de cambio.
+TORN_READ_RETRIES = 3
+TORN_READ_DELAY_S = 0.001
+# WriteData() en Lua cierra cada frame con SimulationTime.
+SENTINEL_KEY = "SimulationTime"
+# Cadencia adaptativa del sondeo: rápida con frames, backoff exponencial sin ellos.
+IDLE_POLL_MAX_S = 1.0
+BACKOFF_FACTOR = 2.0
+GAME_LINK_STALE_S = 4.0
+# Tope de cada espera bloqueante: permite parar el hilo y detectar borrado del fichero.
+WAIT_SLICE_S = 0.5
+
+_WATCH_ENV = "NEXUS_GETDATA_WATCH"
+
+
+class RawFrame(NamedTuple):
+    received_at: float
+    line: str
+
+
+def put_latest(queue: "asyncio.Queue[RawFrame]", item: RawFrame) -> None:
+    """Encola descartando el frame pendiente más antiguo si la cola está llena."""
+    while True:
+        try:
+            queue.put_nowait(item)
+            return
+        except asyncio.QueueFull:
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+
+
+def _read_first_line(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.readline()
+
+
+class FrameValidator:
+    """
+    Detecta frames truncados (Lua a mitad de escritura).
+
+    Si el plugin emite el centinela `SimulationTime:` al final, se exige; si no,
+    se compara el número de tokens con el último frame aceptado.
+    """
+
+    def __init__(self) -> None:
+        self.expected_tokens = 0
+        self.has_sentinel = False
+        self.frames_ok = 0
+        self.torn_reads = 0
+        self.recovered = 0
+        self.dropped = 0
+        self.layout_changes = 0
+
+    @staticmethod
+    def _ends_with_sentinel(text: str) -> bool:
+        key, sep, value = text.rpartition("|")[2].partition(":")
+        if not sep or key.strip() != SENTINEL_KEY:
+            return False
+        try:
+            float(value)
+        except ValueError:
+            return False
+        return True
+
+    def is_complete(self, line: str) -> bool:
+        text = line.strip()
+        if "|" not in text:
+            return False
+        if self._ends_with_sentinel(text):
+            return True
+        if self.has_sentinel:
+            return False
+        return text.count("|") + 1 >= self.expected_tokens
+
+    def accept(self, line: str) -> None:
+        text = line.strip()
+        self.has_sentinel = self._ends_with_sentinel(text)
+        self.expected_tokens = text.count("|") + 1
+        self.frames_ok += 1
+
+    def read_valid(
+        self,
+        read: Callable[[], str],
+        retries: int = TORN_READ_RETRIES,
+        delay_s: float = TORN_READ_DELAY_S,
+    ) -> Optional[str]:
+        """Lee y valida; relee hasta `retries` veces. None si el frame sigue roto."""
+        previous: Optional[str] = None
+        for attempt in range(retries + 1):
+            line = read()
+            if not line:
+                return line
+            if self.is_complete(line):
+                if attempt:
+                    self.recovered += 1
+                self.accept(line)
+                return line
+            self.torn_reads += 1
+            if line == previous:
+                # Contenido estable: no es escritura a medias sino cambio de formato.
+                self.layout_changes += 1
+                self.accept(line)
+                return line
+            previous = line
+            if attempt < retries:
+                time.sleep(delay_s)
+        self.dropped += 1
+        return None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ok": self.frames_ok,
+            "torn_reads": self.torn_reads,
+            "recovered": self.recovered,
+            "dropped": self.dropped,
+            "layout_changes": self.layout_changes,
+            "sentinel": self.has_sentinel,
+        }
+
+
+class AdaptiveCadence:
+    """
+    Intervalo de sondeo ligado al estado del juego.
+
+    Mientras llegan frames se sondea a `fast_s`; cuando el enlace lleva más de
+    `stale_s` sin frames el intervalo se duplica hasta `max_s`, y el primer
+    frame nuevo lo devuelve a `fast_s`.
+    """
+
+    def __init__(
+        self,
+        fast_s: float = POLL_INTERVAL_S,
+        max_s: float = IDLE_POLL_MAX_S,
+        stale_s: float = GAME_LINK_STALE_S,
+        factor: float = BACKOFF_FACTOR,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.fast_s = fast_s
+        self.max_s = max_s
+        self.stale_s = stale_s
+        self.factor = factor
+        self._clock = clock
+        self.interval_s = fast_s
+        self._last_frame_at = clock()
+        self._last_poll_at: Optional[float] = None
+        self._poll_dt_avg = 0.0
+
+    def note_frame(self) -> None:
+        self._last_frame_at = self._clock()
+        self.interval_s = self.fast_s
+
+    def next_interval(self) -> float:
+        now = self._clock()
+        if self._last_poll_at is not None:
+            dt = now - self._last_poll_at
+            self._poll_dt_avg = dt if self._poll_dt_avg <= 0 else self._poll_dt_avg + 0.2 * (dt - self._poll_dt_avg)
+        self._last_poll_at = now
+        if now - self._last_frame_at > self.stale_s:
+            self.interval_s = min(self.max_s, self.interval_s * self.factor)
+        return self.interval_s
+
+    @property
+    def backing_off(self) -> bool:
+        return self.interval_s > self.fast_s
+
+    def status(self, event_driven: bool = False) -> Dict[str, Any]:
+        """Con una fuente por eventos (inotify/win32) no hay sondeo: sin Hz objetivo."""
+        if event_driven:
+            return {
+                "mode": "event-driven",
+                "target_hz": None,
+                "current_hz": None,
+                "interval_s": None,
+                "backing_off": False,
+                "idle_s": round(self._clock() - self._last_frame_at, 2),
+            }
+        return {
+            "mode": "polling",
+            "target_hz": round(1.0 / self.interval_s, 2) if self.interval_s > 0 else None,
+            "current_hz": round(1.0 / self._poll_dt_avg, 2) if self._poll_dt_avg > 0 else None,
+            "interval_s": round(self.interval_s, 4),
+            "backing_off": self.backing_off,
+            "idle_s": round(self._clock() - self._last_frame_at, 2),
+        }
+
+
+class ChangeSource(ABC):
+    """Espera cambios de un fichero concreto (bloqueante, se usa desde un hilo)."""
+
+    name = "base"
+    # True si wait() se despierta por avisos del SO en vez de sondear.
+    event_driven = False
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @abstractmethod
+    def wait(self, timeout: float) -> bool:
+        """True si el fichero cambió; False al agotar timeout o con eventos ajenos."""
+
+    def close(self) -> None:
+        pass
+
+
+class PollingSource(ChangeSource):
+    """Fallback portable: compara mtime cada `interval_s` (o según `cadence`)."""
+
+    name = "polling"
+
+    def __init__(
+        self,
+        path: str,
+        interval_s: float = POLL_INTERVAL_S,
+        cadence: Optional[AdaptiveCadence] = None,
+    ):
+        super().__init__(path)
+        self.interval_s = interval_s
+        self.cadence = cadence
+        self._last_mtime_ns = self._mtime_ns()
+
+    def _mtime_ns(self) -> int:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return 0
+
+    def wait(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            mtime_ns = self._mtime_ns()
+            if mtime_ns and mtime_ns != self._last_mtime_ns:
+                self._last_mtime_ns = mtime_ns
+                if self.cadence is not None:
+                    self.cadence.note_frame()
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            interval = self.cadence.next_interval() if self.cadence is not None else self.interval_s
+            time.sleep(min(interval, remaining))
+
+
+class InotifySource(ChangeSource):
+    """Linux: inotify sobre el directorio (Lua trunca y reescribe el fichero)."""
+
+    name = "inotify"
+    event_driven = True
+
+    _IN_CLOSE_WRITE = 0x00000008
+    _IN_MOVED_TO = 0x00000080
+    _IN_CREATE = 0x00000100
+    _EVENT_HEADER = struct.Struct("iIII")
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        directory = os.path.dirname(os.path.abspath(path))
+        mask = self._IN_CLOSE_WRITE | self._IN_MOVED_TO | self._IN_CREATE
+        if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(err, f"inotify_add_watch falló en {directory}")
+        self._fd = fd
+        self._name = os.fsencode(os.path.basename(path))
+
+    def wait(self, timeout: float) -> bool:
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return False
+        changed = False
+        header = self._EVENT_HEADER
+        while True:
+            try:
+                buf = os.read(self._fd, 4096)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + header.size <= len(buf):
+                _wd, _mask, _cookie, length = header.unpack_from(buf, offset)
+                start = offset + header.size
+                if buf[start:start + length].rstrip(b"\0") == self._name:
+                    changed = True
+                offset = start + length
+        return changed
+
+    def close(self) -> None:
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+
+
+class Win32ChangeSource(ChangeSource):
+    """Windows: FindFirstChangeNotificationW sobre plugins/ + filtro por mtime."""
+
+    name = "win32"
+    event_driven = True
+
+    _FILE_NOTIFY_CHANGE_FILE_NAME = 0x00000001
+    _FILE_NOTIFY_CHANGE_LAST_WRITE = 0x00000010
+    _WAIT_OBJECT_0 = 0x00000000
+    _INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)  # type: ignore[attr-defined]
+        kernel32.FindFirstChangeNotificationW.restype = ctypes.c_void_p
+        kernel32.FindFirstChangeNotificationW.argtypes = [ctypes.c_wchar_p, ctypes.c_int, ctypes.c_uint32]
+        kernel32.FindNextChangeNotification.argtypes = [ctypes.c_void_p]
+        kernel32.FindCloseChangeNotification.argtypes = [ctypes.c_void_p]
+        kernel32.WaitForSingleObject.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
+        kernel32.WaitForSingleObject.restype = ctypes.c_uint32
+        directory = os.path.dirname(os.path.abspath(path))
+        handle = kernel32.FindFirstChangeNotificationW(
+            directory,
+            0,
+            self._FILE_NOTIFY_CHANGE_LAST_WRITE | self._FILE_NOTIFY_CHANGE_FILE_NAME,
+        )
+        if not handle or handle == self._INVALID_HANDLE_VALUE:
+            raise OSError(ctypes.get_last_error(), f"FindFirstChangeNotificationW falló en {directory}")  # type: ignore[attr-defined]
+        self._kernel32 = kernel32
+        self._handle = handle
+        self._mtime = PollingSource(path, interval_s=0.0)
+
+    def wait(self, timeout: float) -> bool:
+        result = self._kernel32.WaitForSingleObject(self._handle, int(timeout * 1000))
+        if result != self._WAIT_OBJECT_0:
+            return False
+        self._kernel32.FindNextChangeNotification(self._handle)
+        # La notificación es por directorio: confirmar que cambió GetData.txt.
+        return self._mtime.wait(0.0)
+
+    def close(self) -> None:
+        self._kernel32.FindCloseChangeNotification(self._handle)
+
+
+def create_change_source(
+    path: str,
+    prefer: Optional[str] = None,
+    cadence: Optional[AdaptiveCadence] = None,
+) -> ChangeSource:
+    """Fuente nativa de la plataforma; sondeo si no está disponible o se fuerza por env."""
+    choice = (prefer or os.environ.get(_WATCH_ENV, "") or "auto").strip().lower()
+    if choice == "polling":
+        return PollingSource(path, cadence=cadence)
+    try:
+        if choice in ("auto", "inotify") and sys.platform.startswith("linux"):
+            return InotifySource(path)
+        if choice in ("auto", "win32") and sys.platform == "win32":
+            return Win32ChangeSource(path)
+    except (OSError, AttributeError):
+        pass
+    return PollingSource(path, cadence=cadence)
+
+
+class GetDataWatcher:
+    """Hilo que vigila GetData.txt y publica la primera línea de cada escritura."""
+
+    def __init__(
+        self,
+        resolve_path: Callable[[], Optional[str]],
+        queue: "asyncio.Queue[RawFrame]",
+        loop: asyncio.AbstractEventLoop,
+        source_factory: Callable[..., ChangeSource] = create_change_source,
+        cadence: Optional[AdaptiveCadence] = None,
+        on_missing: Optional[Callable[[], None]] = None,
+        on_frame: Optional[Callable[[RawFrame], None]] = None,
+    ):
+        self._resolve_path = resolve_path
+        self._on_missing = on_missing
+        # Se llama en el hilo lector con cada frame leído, antes de coalescer (grabación).
+        self._on_frame = on_frame
+        self._queue = queue
+        self._loop = loop
+        self._source_factory = source_factory
+        self.cadence = cadence or AdaptiveCadence()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.source_name: Optional[str] = None
+        self._event_driven = False
+        self.frames_emitted = 0
+        self.validator = FrameValidator()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="getdata-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "source": self.source_name,
+            "frames_read": self.frames_emitted,
+            "validation": self.validator.status(),
+            "cadence": self.cadence.status(event_driven=self._event_driven),
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            path = self._resolve_path()
+            if not path:
+                self.source_name = None
+                self._stop.wait(MISSING_FILE_RETRY_S)
+                continue
+            try:
+                source = self._source_factory(path, cadence=self.cadence)
+            except OSError:
+                self._stop.wait(MISSING_FILE_RETRY_S)
+                continue
+            self.source_name = source.name
+            self._event_driven = source.event_driven
+            try:
+                # Frame inicial: el fichero puede llevar escrito desde antes de arrancar.
+                if self._emit(path):
+                    while not self._stop.is_set():
+                        if source.wait(WAIT_SLICE_S):
+                            if not self._emit(path):
+                                break
+                        elif not os.path.exists(path):
+                            break
+            finally:
+                source.close()
+            if self._stop.is_set():
+                break
+            # El fichero desapareció: que el resolvedor vuelva a sondear.
+            if self._on_missing is not None:
+                self._on_missing()
+            self._stop.wait(MISSING_FILE_RETRY_S)
+
+    def _emit(self, path: str) -> bool:
+        """Lee la línea y la publica. False si el fichero desapareció o el loop cerró."""
+        try:
+            line = self.validator.read_valid(lambda: _read_first_line(path))
+        except FileNotFoundError:
+            return False
+        except OSError:
+            return True
+        if not line:
+            return True
+        raw = RawFrame(time.time(), line)
+        # También con fuentes por eventos, para que idle_s refleje el enlace real.
+        self.cadence.note_frame()
+        if self._on_frame is not None:
+            self._on_frame(raw)
+        try:
+            self._loop.call_soon_threadsafe(put_latest, self._queue, raw)
+        except RuntimeError:
+            self._stop.set()
+            return False
+        self.frames_emitted += 1
+        return True
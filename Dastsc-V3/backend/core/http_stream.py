@@ -0,0 +1,151 @@
+"""
+http_stream.py — TELEMETRY por HTTP: SSE y long-poll sobre el mismo bus que /ws/telemetry.
+
+- /api/telemetry/stream (SSE): SseSink hace de WebSocket para una ClientConnection
+  normal, así que hereda cola acotada, lag, expulsión y grupos de suscripción.
+- /api/telemetry/latest?since=<seq> (long-poll): un LatestChannel por Subscription.
+  El bus lo trata como un cliente "full" más de su grupo (misma proyección, misma
+  caché de codificación); solo guarda el último texto y despierta a las peticiones
+  que esperan un seq mayor que `since`.
+
+Ninguno de los dos tiene bucle propio: más consumidores HTTP con la misma
+suscripción no añaden trabajo de serialización. El max_hz de HTTP se acota a
+NEXUS_HTTP_TELEMETRY_MAX_HZ (10 por defecto).
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from core.telemetry_codec import ENCODING_JSON
+from core.ws_protocol import PROTOCOL_FULL, ClientState, Subscription, parse_subscription
+
+_MAX_HZ_ENV = "NEXUS_HTTP_TELEMETRY_MAX_HZ"
+DEFAULT_HTTP_MAX_HZ = 10.0
+SSE_BUFFER = 4
+LONGPOLL_WAIT_S = 25.0
+MAX_LONGPOLL_WAIT_S = 60.0
+# Canal sin peticiones durante este tiempo: deja de recibir frames.
+LATEST_IDLE_S = 60.0
+MAX_LATEST_CHANNELS = 32
+
+
+def http_max_hz() -> float:
+    """Tope de frecuencia para consumidores HTTP (NEXUS_HTTP_TELEMETRY_MAX_HZ)."""
+    raw = os.environ.get(_MAX_HZ_ENV, "").strip()
+    try:
+        value = float(raw) if raw else DEFAULT_HTTP_MAX_HZ
+    except ValueError:
+        return DEFAULT_HTTP_MAX_HZ
+    return value if value > 0 else DEFAULT_HTTP_MAX_HZ
+
+
+def parse_http_subscription(fields: Optional[str], max_hz: Optional[float]) -> Subscription:
+    """`?fields=a,b&max_hz=5` → Subscription con max_hz acotado; ValueError como SUBSCRIBE."""
+    cmd: Dict[str, Any] = {"max_hz": max_hz}
+    if fields and fields.strip() != "*":
+        cmd["fields"] = [name.strip() for name in fields.split(",") if name.strip()]
+    subscription = parse_subscription(cmd)
+    cap = http_max_hz()
+    return Subscription(subscription.fields, min(subscription.max_hz or cap, cap))
+
+
+class SseSink:
+    """Sustituto de WebSocket para ClientConnection: cada texto enviado es un evento SSE."""
+
+    def __init__(self, client: Any = None, buffer: int = SSE_BUFFER):
+        self.client = client
+        self._queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(buffer)
+        self.closed_with: Optional[int] = None
+
+    async def send_text(self, text: str) -> None:
+        # Si la respuesta no drena, esto bloquea y ClientConnection expulsa por send_timeout.
+        await self._queue.put(text)
+
+    async def send_bytes(self, data: bytes) -> None:
+        raise TypeError("SSE solo transporta texto")
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed_with = code
+        try:
+            self._queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    async def events(self) -> AsyncIterator[str]:
+        # Tras close se entrega lo ya encolado; con la cola llena no hay centinela.
+        while not (self.closed_with is not None and self._queue.empty()):
+            text = await self._queue.get()
+            if text is None:
+                return
+            yield f"data: {text}\n\n"
+
+
+class LatestChannel:
+    """Último TELEMETRY de una Subscription, para /api/telemetry/latest."""
+
+    encoding = ENCODING_JSON
+    evicted = None
+
+    def __init__(self, subscription: Subscription):
+        self.subscription = subscription
+        self.state = ClientState(PROTOCOL_FULL)
+        self.known_fields = 0
+        # El bus asigna last_seq antes de offer_telemetry: es el seq de `text`.
+        self.last_seq = 0
+        self.text: Optional[str] = None
+        self.seq = 0
+        self.waiters = 0
+        self.touched_at = 0.0
+        self.frames = 0
+        self.served = 0
+        self._wake = asyncio.Event()
+
+    # ── Interfaz de consumidor del bus (como ClientConnection) ───────────────
+    def prepare_telemetry(self) -> None:
+        pass
+
+    def offer_telemetry(self, payload: str) -> None:
+        self.text = payload
+        self.seq = self.last_seq
+        self.frames += 1
+        wake, self._wake = self._wake, asyncio.Event()
+        wake.set()
+
+    def seed(self, seq: int, text: str) -> None:
+        """Estado inicial de un canal nuevo (último TELEMETRY ya publicado)."""
+        self.last_seq = self.seq = seq
+        self.text = text
+
+    # ── Peticiones ───────────────────────────────────────────────────────────
+    async def wait(self, since: int, timeout_s: float) -> Optional[Tuple[int, str]]:
+        """(seq, texto) del primer frame con seq > since, o None al vencer timeout_s."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout_s
+        self.waiters += 1
+        try:
+            while self.text is None or self.seq <= since:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return None
+                try:
+                    await asyncio.wait_for(self._wake.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return None
+        finally:
+            self.waiters -= 1
+        self.served += 1
+        return self.seq, self.text
+
+    def idle(self, now: float) -> bool:
+        return self.waiters == 0 and now - self.touched_at > LATEST_IDLE_S
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "subscription": self.subscription.to_dict(),
+            "seq": self.seq,
+            "frames": self.frames,
+            "served": self.served,
+            "waiters": self.waiters,
+        }
@@ -0,0 +1,116 @@
+"""
+last_state.py — Último estado conocido para INIT, en ranuras independientes.
+
+Sustituye al dict `last_payload`, que acumulaba con update() toda clave emitida
+(TELEMETRY, HEARTBEAT, PROFILE_CHANGED) y se copiaba entero en cada INIT. Cada
+ranura guarda un valor, su instante y su JSON ya codificado (una vez por valor):
+
+- telemetry: último TELEMETRY completo; caduca si el juego deja de escribir.
+- link: último estado del enlace con el juego (HEARTBEAT / primer frame).
+- profile: perfil activo (`active_profile` + `active_profile_id`), al asignarlo.
+
+Una ranura caducada o que supera su tope de bytes no entra en INIT.
+"""
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Dict, Optional
+
+TELEMETRY_MAX_AGE_S = 10.0
+TELEMETRY_MAX_BYTES = 256 * 1024
+LINK_MAX_BYTES = 1024
+PROFILE_MAX_BYTES = 1024 * 1024
+
+
+class StateSlot:
+    """Un valor con edad y tope de tamaño; se codifica perezosamente y se cachea."""
+
+    __slots__ = (
+        "name", "max_age_s", "max_bytes", "_clock",
+        "value", "updated_at", "version", "oversize", "_encoded",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        max_age_s: Optional[float] = None,
+        max_bytes: int = LINK_MAX_BYTES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.max_age_s = max_age_s
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self.value: Optional[Dict[str, Any]] = None
+        self.updated_at = 0.0
+        self.version = 0
+        self.oversize = 0
+        self._encoded: Optional[str] = None
+
+    def set(self, value: Optional[Dict[str, Any]]) -> None:
+        """Sustituye el valor (sin copia: el llamante no debe mutarlo después)."""
+        self.value = value
+        self.updated_at = self._clock()
+        self.version += 1
+        self._encoded = None
+
+    def age_s(self) -> Optional[float]:
+        return None if self.value is None else self._clock() - self.updated_at
+
+    def fresh(self) -> bool:
+        if self.value is None:
+            return False
+        return self.max_age_s is None or self._clock() - self.updated_at <= self.max_age_s
+
+    def encoded(self, encode: Callable[[Dict[str, Any]], str]) -> Optional[str]:
+        """JSON del valor, o None si está vacío, caducado o excede max_bytes."""
+        if not self.fresh():
+            return None
+        if self._encoded is None:
+            text = encode(self.value)  # type: ignore[arg-type]
+            if len(text) > self.max_bytes:
+                self.oversize += 1
+                text = ""
+            self._encoded = text
+        return self._encoded or None
+
+    def status(self) -> Dict[str, Any]:
+        age = self.age_s()
+        return {
+            "set": self.value is not None,
+            "age_s": round(age, 3) if age is not None else None,
+            "fresh": self.fresh(),
+            "bytes": len(self._encoded) if self._encoded else None,
+            "oversize": self.oversize,
+        }
+
+
+class LastKnownState:
+    """Ranuras telemetry / link / profile de TelemetryManager."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.telemetry = StateSlot("telemetry", TELEMETRY_MAX_AGE_S, TELEMETRY_MAX_BYTES, clock)
+        self.link = StateSlot("link", None, LINK_MAX_BYTES, clock)
+        self.profile = StateSlot("profile", None, PROFILE_MAX_BYTES, clock)
+
+    def note_telemetry(self, message: Dict[str, Any]) -> None:
+        self.telemetry.set(message)
+        # El enlace solo se reescribe al cambiar, no en cada frame.
+        link = self.link.value
+        if link is None or not link.get("gameLinked"):
+            self.link.set({"gameLinked": True, "timestamp": message.get("timestamp")})
+
+    def note_heartbeat(self, message: Dict[str, Any]) -> None:
+        self.link.set({
+            "gameLinked": bool(message.get("gameLinked")),
+            "timestamp": message.get("timestamp"),
+        })
+
+    def note_profile(self, profile: Optional[Dict[str, Any]]) -> None:
+        self.profile.set({
+            "active_profile": profile,
+            "active_profile_id": profile.get("id") if profile else None,
+        })
+
+    def status(self) -> Dict[str, Any]:
+        return {slot.name: slot.status() for slot in (self.telemetry, self.link, self.profile)}
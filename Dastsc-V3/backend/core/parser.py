@@ -3,7 +3,7 @@ parser.py — Convierte la línea de telemetría del plugin TSC (GetData.txt)
 en un diccionario listo para el WebSocket.
 """
 import math
-from typing import Any, Dict, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 TelemetryValue = Union[float, str]
 TelemetryDict = Dict[str, TelemetryValue]
@@ -40,3 +40,105 @@ def parse_telemetry_line(line: str) -> TelemetryDict:
             continue
         data[key] = _coerce_value(val)
     return data
+
+
+class TelemetryRecord:
+    """Registro por slots del último frame: claves fijas + valores reutilizados."""
+
+    __slots__ = ("keys", "values", "changed", "index")
+
+    def __init__(self, keys: Tuple[str, ...], values: List[TelemetryValue]):
+        self.keys = keys
+        self.values = values
+        self.changed: Sequence[int] = tuple(range(len(keys)))
+        self.index: Dict[str, int] = {key: slot for slot, key in enumerate(keys)}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        slot = self.index.get(key)
+        return default if slot is None else self.values[slot]
+
+    def changed_keys(self) -> List[str]:
+        keys = self.keys
+        return [keys[slot] for slot in self.changed]
+
+    def as_dict(self) -> TelemetryDict:
+        """Copia mutable para el enriquecimiento aguas abajo (mismo orden que el parser genérico)."""
+        return dict(zip(self.keys, self.values))
+
+
+_NO_CHANGES: Tuple[int, ...] = ()
+
+
+class CompiledLineParser:
+    """
+    Parser incremental de `clave:valor|…` para el formato fijo de WriteData() en Lua.
+
+    El primer frame fija el layout (posición de token → prefijo `clave:` → slot).
+    Los siguientes solo re-convierten los tokens cuyo texto cambió; si cambia el
+    número de tokens o un prefijo, se vuelve a aprender con el parser genérico.
+    """
+
+    def __init__(self) -> None:
+        self._raw: List[str] = []
+        self._prefix_len: List[int] = []
+        self._prefixes: List[str] = []
+        self._slots: List[int] = []
+        self._last_line: Optional[str] = None
+        self.record = TelemetryRecord((), [])
+        self.relearns = 0
+
+    def parse(self, line: str) -> TelemetryRecord:
+        if line == self._last_line:
+            self.record.changed = _NO_CHANGES
+            return self.record
+        if not line or "|" not in line:
+            self._last_line = None
+            self._raw = []
+            return TelemetryRecord((), [])
+
+        tokens = line.strip().split("|")
+        raw = self._raw
+        if len(tokens) != len(raw):
+            return self._learn(line, tokens)
+
+        dirty = [pos for pos, (new, old) in enumerate(zip(tokens, raw)) if new != old]
+        values = self.record.values
+        changed: List[int] = []
+        for pos in dirty:
+            token = tokens[pos]
+            slot = self._slots[pos]
+            if slot < 0 or not token.startswith(self._prefixes[pos]):
+                return self._learn(line, tokens)
+            raw[pos] = token
+            values[slot] = _coerce_value(token[self._prefix_len[pos]:])
+            changed.append(slot)
+
+        self._last_line = line
+        self.record.changed = changed
+        return self.record
+
+    def _learn(self, line: str, tokens: List[str]) -> TelemetryRecord:
+        keys: List[str] = []
+        values: List[TelemetryValue] = []
+        prefixes: List[str] = []
+        slots: List[int] = []
+        for token in tokens:
+            key, sep, val = token.partition(":")
+            key = key.strip()
+            if not sep or not key:
+                prefixes.append("")
+                slots.append(-1)
+                continue
+            prefixes.append(token[:token.index(":") + 1])
+            slots.append(len(keys))
+            keys.append(key)
+            values.append(_coerce_value(val))
+
+        self._raw = list(tokens)
+        self._prefixes = prefixes
+        self._prefix_len = [len(p) for p in prefixes]
+        self._slots = slots
+        self._last_line = line
+        self.record = TelemetryRecord(tuple(keys), values)
+        self.relearns += 1
+        return self.record
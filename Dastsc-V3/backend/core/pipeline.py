@@ -0,0 +1,171 @@
+"""
+pipeline.py — Pipeline por etapas para frames de telemetría.
+
+Cada etapa tiene su propia cola acotada que coalesce al frame más reciente
+(drop-oldest): una etapa lenta pierde frames intermedios pero nunca frena a las
+anteriores ni a las ramas hermanas. Con `merge` el frame superviviente absorbe
+al descartado (p. ej. unión de claves cambiadas). Cada etapa mide su latencia.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+Handler = Callable[[Any], Awaitable[Any]]
+Merge = Callable[[Any, Any], Any]
+
+_EWMA_ALPHA = 0.1
+
+
+class LatestQueue(asyncio.Queue):
+    """asyncio.Queue acotada que descarta el elemento más antiguo al llenarse."""
+
+    def __init__(self, maxsize: int = 1, merge: Optional[Merge] = None):
+        super().__init__(maxsize=maxsize)
+        self.merge = merge
+        self.dropped = 0
+
+    def put_nowait(self, item: Any) -> None:
+        while self.full():
+            try:
+                oldest = self.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            self.dropped += 1
+            if self.merge is not None:
+                item = self.merge(oldest, item)
+        super().put_nowait(item)
+
+
+class StageStats:
+    """Latencia por etapa (última, media exponencial, máxima) y contadores."""
+
+    __slots__ = ("processed", "errors", "last_ms", "avg_ms", "max_ms")
+
+    def __init__(self) -> None:
+        self.processed = 0
+        self.errors = 0
+        self.last_ms = 0.0
+        self.avg_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms: float) -> None:
+        self.processed += 1
+        self.last_ms = elapsed_ms
+        if self.processed == 1:
+            self.avg_ms = elapsed_ms
+        else:
+            self.avg_ms += _EWMA_ALPHA * (elapsed_ms - self.avg_ms)
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "processed": self.processed,
+            "errors": self.errors,
+            "last_ms": round(self.last_ms, 3),
+            "avg_ms": round(self.avg_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        handler: Handler,
+        queue_size: int = 1,
+        merge: Optional[Merge] = None,
+    ):
+        self.name = name
+        self.handler = handler
+        self.inbox = LatestQueue(queue_size, merge)
+        self.outputs: List[LatestQueue] = []
+        self.stats = StageStats()
+
+    async def run(self) -> None:
+        while True:
+            item = await self.inbox.get()
+            started = time.perf_counter()
+            try:
+                result = await self.handler(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.stats.errors += 1
+                print(f"[Nexus] Error en etapa '{self.name}': {exc}")
+                continue
+            self.stats.record((time.perf_counter() - started) * 1000.0)
+            if result is None:
+                continue
+            for queue in self.outputs:
+                queue.put_nowait(result)
+
+    def status(self) -> Dict[str, Any]:
+        payload = self.stats.to_dict()
+        payload["dropped"] = self.inbox.dropped
+        return payload
+
+
+class TelemetryPipeline:
+    """
+    Cadena principal de etapas + ramas laterales.
+
+    `add_stage(name, handler)` encadena tras la última etapa principal;
+    con `after=` cuelga una rama de otra etapa (p. ej. log de sesión tras track).
+    Un handler que devuelve None corta la propagación de ese frame.
+    """
+
+    def __init__(self) -> None:
+        self._stages: Dict[str, Stage] = {}
+        self._last_main: Optional[Stage] = None
+        self._tasks: List["asyncio.Task[None]"] = []
+
+    @property
+    def inbox(self) -> LatestQueue:
+        """Cola de entrada de la primera etapa (la alimenta el lector)."""
+        if not self._stages:
+            raise RuntimeError("pipeline sin etapas")
+        return next(iter(self._stages.values())).inbox
+
+    def add_stage(
+        self,
+        name: str,
+        handler: Handler,
+        *,
+        after: Optional[str] = None,
+        queue_size: int = 1,
+        merge: Optional[Merge] = None,
+    ) -> "TelemetryPipeline":
+        if name in self._stages:
+            raise ValueError(f"etapa duplicada: {name}")
+        stage = Stage(name, handler, queue_size, merge)
+        if after is not None:
+            self._stages[after].outputs.append(stage.inbox)
+        else:
+            if self._last_main is not None:
+                self._last_main.outputs.append(stage.inbox)
+            self._last_main = stage
+        self._stages[name] = stage
+        return self
+
+    def feed(self, item: Any) -> None:
+        self.inbox.put_nowait(item)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(stage.run(), name=f"pipeline:{name}")
+            for name, stage in self._stages.items()
+        ]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def status(self) -> Dict[str, Any]:
+        return {name: stage.status() for name, stage in self._stages.items()}
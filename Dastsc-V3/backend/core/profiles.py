@@ -3,6 +3,7 @@ profiles.py — Carga y selección de perfiles de tren (JSON en /profiles).
 """
 import glob
 import json
+import math
 import os
 from typing import Any, Dict, List, Optional
 
@@ -22,9 +23,16 @@ def _profile_id_from_path(file_path: str) -> str:
     return os.path.splitext(os.path.basename(file_path))[0]
 
 
+def _finite_float(text: str) -> float:
+    value = float(text)
+    return value if math.isfinite(value) else 0.0
+
+
 def _load_profile_file(file_path: str) -> Optional[Profile]:
+    # NaN/Infinity (y 1e999) → 0.0 al cargar: el perfil viaja en INIT y PROFILE_CHANGED
+    # y debe salir igual con cualquier encoder (stdlib rechaza NaN, orjson emite null).
     with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+        data = json.load(f, parse_float=_finite_float, parse_constant=lambda _: 0.0)
     if not isinstance(data, dict):
         return None
     profile_id = _profile_id_from_path(file_path)
@@ -59,10 +67,15 @@ class ProfileManager:
         self.profiles_dir = profiles_dir
         self.profiles: List[Profile] = []
         self.manual_profile: Optional[Profile] = None
+        # Sube en cada recarga: invalida cachés derivadas (resúmenes, INIT codificado).
+        self.version = 0
+        self._summaries: Optional[List[ProfileSummary]] = None
         self.load_profiles()
 
     def load_profiles(self) -> int:
         """Recarga perfiles desde disco. Devuelve cuántos se cargaron."""
+        self.version += 1
+        self._summaries = None
         if not os.path.isdir(self.profiles_dir):
             self.profiles = []
             return 0
@@ -83,11 +96,16 @@ class ProfileManager:
         return any(p.get("nexus") for p in self.profiles)
 
     def get_all_profiles(self) -> List[ProfileSummary]:
-        """Lista simplificada para el selector de la UI (legacy + nexus detectables)."""
+        """Lista simplificada para el selector de la UI (legacy + nexus detectables).
+
+        Cacheada hasta la próxima recarga: la lista es compartida, no mutarla.
+        """
+        if self._summaries is not None:
+            return self._summaries
         sources = [p for p in self.profiles if is_auto_detectable_profile(p)]
         if not sources:
             sources = self.profiles
-        return [
+        self._summaries = [
             {
                 "id": p["id"],
                 "name": p["name"],
@@ -96,6 +114,7 @@ class ProfileManager:
             }
             for p in sources
         ]
+        return self._summaries
 
     def get_by_id(self, profile_id: str) -> Optional[Profile]:
         target = str(profile_id).strip().lower()
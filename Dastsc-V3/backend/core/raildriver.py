@@ -1,12 +1,18 @@
 """
 raildriver.py — Acceso mínimo a RailDriver64.dll para autodetección de tren.
+
+La DLL no es reentrante: el cliente serializa sus llamadas con un lock, porque
+la sincronización de perfil y la inferencia de cabina la usan desde hilos
+distintos. Todas las llamadas bloquean: desde async, en un hilo.
 """
 from __future__ import annotations
 
 import ctypes
+import math
 import os
 from dataclasses import dataclass
 from pathlib import Path
+from threading import RLock
 from typing import Dict, List, Optional, Tuple
 
 VALUE_CURRENT = 0
@@ -53,12 +59,17 @@ class RailDriverClient:
         self._connected = False
         self._name_to_index: Dict[str, int] = {}
         self._list_key = ""
+        self._lock = RLock()
 
     @property
     def available(self) -> bool:
         return self.dll_path.is_file()
 
     def connect(self) -> bool:
+        with self._lock:
+            return self._connect()
+
+    def _connect(self) -> bool:
         if not self.available:
             return False
         if self._dll is None:
@@ -96,15 +107,25 @@ class RailDriverClient:
         return bool(self._name_to_index)
 
     def get_value(self, name: str) -> Optional[float]:
+        with self._lock:
+            return self._get_value(name)
+
+    def _get_value(self, name: str) -> Optional[float]:
         dll = self._dll_handle()
         if dll is None or not self._ensure_indices():
             return None
         index = self._name_to_index.get(name)
         if index is None:
             return None
-        return float(dll.GetControllerValue(index, VALUE_CURRENT))
+        value = float(dll.GetControllerValue(index, VALUE_CURRENT))
+        # Entra directo al frame publicado: sin NaN/Inf (no se sanea aguas abajo).
+        return value if math.isfinite(value) else None
 
     def get_loco_names(self) -> List[str]:
+        with self._lock:
+            return self._get_loco_names()
+
+    def _get_loco_names(self) -> List[str]:
         dll = self._dll_handle()
         if dll is None:
             return []
@@ -114,11 +135,15 @@ class RailDriverClient:
         return [part.strip() for part in loco_raw.split(".:.") if part.strip()]
 
     def snapshot(self) -> Optional[RailDriverSnapshot]:
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> Optional[RailDriverSnapshot]:
         dll = self._dll_handle()
         if dll is None:
             return None
 
-        loco_names = self.get_loco_names()
+        loco_names = self._get_loco_names()
 
         if not self._ensure_indices():
             return RailDriverSnapshot(loco_names=loco_names, controllers=[])
@@ -0,0 +1,113 @@
+"""
+railworks_paths.py — Resolución cacheada de GetData.txt / SendCommand.txt en RailWorks.
+
+Evita sondear Program Files en cada tick o en cada COMMAND: la ruta activa se
+guarda y solo se vuelve a comprobar tras un error (invalidate) o con un
+temporizador lento. Raíces configurables con NEXUS_RAILWORKS_DIR (varias
+separadas por os.pathsep); por defecto la instalación Steam estándar.
+"""
+from __future__ import annotations
+
+import os
+import time
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Sequence
+
+DEFAULT_RAILWORKS_ROOT = r"C:\Program Files (x86)\Steam\steamapps\common\RailWorks"
+GETDATA_FILENAME = "GetData.txt"
+SENDCOMMAND_FILENAME = "SendCommand.txt"
+SHM_FILENAME = "GetData.shm"
+PLUGINS_SUBDIR = "plugins"
+
+# Ruta encontrada: revalidar de vez en cuando (p. ej. plugin movido a la raíz).
+REPROBE_FOUND_S = 30.0
+# Sin ruta (juego cerrado / no instalado): reintentar más a menudo.
+REPROBE_MISSING_S = 1.0
+
+_ROOTS_ENV = "NEXUS_RAILWORKS_DIR"
+
+
+def configured_roots() -> List[str]:
+    """Raíces RailWorks desde NEXUS_RAILWORKS_DIR, con la de Steam como último recurso."""
+    raw = os.environ.get(_ROOTS_ENV, "").strip()
+    roots = [p.strip() for p in raw.split(os.pathsep) if p.strip()] if raw else []
+    if DEFAULT_RAILWORKS_ROOT not in roots:
+        roots.append(DEFAULT_RAILWORKS_ROOT)
+    return roots
+
+
+def getdata_candidates(roots: Sequence[str]) -> List[str]:
+    """plugins/GetData.txt antes que GetData.txt en la raíz, por cada raíz."""
+    candidates: List[str] = []
+    for root in roots:
+        candidates.append(os.path.join(root, PLUGINS_SUBDIR, GETDATA_FILENAME))
+        candidates.append(os.path.join(root, GETDATA_FILENAME))
+    return candidates
+
+
+class RailWorksPathResolver:
+    def __init__(
+        self,
+        roots: Optional[Sequence[str]] = None,
+        reprobe_found_s: float = REPROBE_FOUND_S,
+        reprobe_missing_s: float = REPROBE_MISSING_S,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._roots = list(roots) if roots is not None else None
+        self.reprobe_found_s = reprobe_found_s
+        self.reprobe_missing_s = reprobe_missing_s
+        self._clock = clock
+        self._lock = Lock()
+        self._getdata: Optional[str] = None
+        self._next_probe_at = 0.0
+        self.probes = 0
+
+    @property
+    def roots(self) -> List[str]:
+        return list(self._roots) if self._roots is not None else configured_roots()
+
+    def _probe(self) -> Optional[str]:
+        self.probes += 1
+        for path in getdata_candidates(self.roots):
+            if os.path.exists(path):
+                return path
+        return None
+
+    def getdata_path(self) -> Optional[str]:
+        """Ruta activa de GetData.txt (cacheada), o None si no existe."""
+        with self._lock:
+            now = self._clock()
+            if now >= self._next_probe_at:
+                self._getdata = self._probe()
+                delay = self.reprobe_found_s if self._getdata else self.reprobe_missing_s
+                self._next_probe_at = now + delay
+            return self._getdata
+
+    def invalidate(self) -> None:
+        """Fuerza re-sondeo en la próxima consulta (fichero desaparecido, error de escritura)."""
+        with self._lock:
+            self._next_probe_at = 0.0
+
+    def plugins_dir(self) -> str:
+        """Carpeta del plugin activo; si no hay GetData, plugins/ de la primera raíz."""
+        getdata = self.getdata_path()
+        if getdata:
+            return os.path.dirname(getdata)
+        return os.path.join(self.roots[0], PLUGINS_SUBDIR)
+
+    def send_command_path(self) -> Optional[str]:
+        """SendCommand.txt junto a GetData.txt del plugin TSC."""
+        getdata = self.getdata_path()
+        if not getdata:
+            return None
+        return os.path.join(os.path.dirname(getdata), SENDCOMMAND_FILENAME)
+
+    def shm_path(self) -> str:
+        return os.path.join(self.plugins_dir(), SHM_FILENAME)
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "roots": self.roots,
+            "getdata": self._getdata,
+            "probes": self.probes,
+        }
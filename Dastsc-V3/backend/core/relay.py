@@ -0,0 +1,377 @@
+"""
+relay.py — Reparto horizontal de /ws/telemetry: un proceso ingest y N workers relay.
+
+El proceso ingest (NEXUS_RELAY_ROLE=ingest) lee GetData como siempre y además
+publica cada mensaje del bus, codificado una vez, por un socket TCP local
+(NEXUS_RELAY_ADDR, 127.0.0.1:8765 por defecto). Los workers relay
+(NEXUS_RELAY_ROLE=relay) no arrancan telemetry_reader: se suscriben a ese
+socket y pasan cada mensaje a su TelemetryManager, que proyecta, codifica y
+reparte a sus propios clientes. Sin estado propio, se pueden lanzar tantos como
+núcleos con NEXUS_WORKERS=N (uvicorn sin reload, p. ej. en NEXUS_PORT=8001).
+
+Trama: longitud u32 big-endian + JSON.
+  ingest → relay: {"message": {...}, "delta": ["Clave", ...] | null}
+  relay → ingest: {"command": {...}}   (sin respuesta: el ACK local es "relayed")
+
+Los endpoints REST con estado en disco o del juego (logs de sesión, brake_log,
+OCR) responden 409 {"error": "ingest_only"} en un worker relay: hay que
+llamarlos en el puerto del ingest. Los comandos WS (SESSION_*, SELECT_PROFILE…)
+sí se reenvían al ingest.
+
+Al conectar, el relay recibe una instantánea (perfil activo, enlace, último
+TELEMETRY) para que su INIT no salga vacío. Un relay que no lee (búfer de
+escritura > MAX_PEER_BUFFER) se desconecta y vuelve a entrar con instantánea.
+
+Benchmark de capacidad (clientes servidos por núcleo):
+    python -m core.relay bench --clients 2000 --workers 1 2 4
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import struct
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from core.telemetry_codec import encode_json
+
+ROLE_INGEST = "ingest"
+ROLE_RELAY = "relay"
+ROLES = (ROLE_INGEST, ROLE_RELAY)
+DEFAULT_ADDR = ("127.0.0.1", 8765)
+MAX_FRAME_BYTES = 4 * 1024 * 1024
+MAX_PEER_BUFFER = 1024 * 1024
+RECONNECT_S = 1.0
+
+_LENGTH = struct.Struct(">I")
+
+Address = Tuple[str, int]
+MessageHandler = Callable[[Dict[str, Any], Optional[Dict[str, Any]]], Awaitable[Any]]
+
+
+def role_from_env() -> str:
+    """NEXUS_RELAY_ROLE: 'ingest', 'relay' o '' (proceso único, como siempre)."""
+    role = os.environ.get("NEXUS_RELAY_ROLE", "").strip().lower()
+    return role if role in ROLES else ""
+
+
+def addr_from_env() -> Address:
+    """NEXUS_RELAY_ADDR como host:puerto."""
+    raw = os.environ.get("NEXUS_RELAY_ADDR", "").strip()
+    host, _, port = raw.rpartition(":")
+    try:
+        return (host or DEFAULT_ADDR[0], int(port))
+    except ValueError:
+        return DEFAULT_ADDR
+
+
+def workers_from_env() -> int:
+    """NEXUS_WORKERS: procesos uvicorn (con más de uno no hay reload)."""
+    raw = os.environ.get("NEXUS_WORKERS", "").strip()
+    try:
+        return max(1, int(raw)) if raw else 1
+    except ValueError:
+        return 1
+
+
+def pack_frame(payload: Union[str, bytes]) -> bytes:
+    data = payload.encode("utf-8") if isinstance(payload, str) else payload
+    if len(data) > MAX_FRAME_BYTES:
+        raise ValueError("frame_too_large")
+    return _LENGTH.pack(len(data)) + data
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """Siguiente trama decodificada; None si el otro extremo cerró."""
+    try:
+        head = await reader.readexactly(_LENGTH.size)
+        (length,) = _LENGTH.unpack(head)
+        if length > MAX_FRAME_BYTES:
+            raise ValueError("frame_too_large")
+        body = await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    frame = json.loads(body)
+    if not isinstance(frame, dict):
+        raise ValueError("invalid_frame")
+    return frame
+
+
+class RelayPublisher:
+    """Lado ingest: servidor TCP que difunde cada mensaje del bus a los relays."""
+
+    def __init__(
+        self,
+        addr: Address = DEFAULT_ADDR,
+        encode: Callable[[Dict[str, Any]], str] = encode_json,
+        on_command: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None,
+        snapshot: Optional[Callable[[], List[Dict[str, Any]]]] = None,
+        max_peer_buffer: int = MAX_PEER_BUFFER,
+    ):
+        self.addr = addr
+        self._encode = encode
+        self.on_command = on_command
+        self.snapshot = snapshot
+        self.max_peer_buffer = max_peer_buffer
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self.published = 0
+        self.commands = 0
+        self.dropped_peers = 0
+
+    @property
+    def peers(self) -> int:
+        return len(self._peers)
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._on_peer, *self.addr)
+        # Con puerto 0 (tests, bench) el sistema elige uno libre.
+        self.addr = self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self) -> None:
+        for writer in list(self._peers):
+            self._drop(writer)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def publish(self, message: Dict[str, Any], delta: Optional[Dict[str, Any]] = None) -> None:
+        if not self._peers:
+            return
+        frame = pack_frame(self._encode({
+            "message": message,
+            "delta": list(delta) if delta is not None else None,
+        }))
+        self.published += 1
+        for writer in list(self._peers):
+            self._write(writer, frame)
+
+    def _write(self, writer: asyncio.StreamWriter, frame: bytes) -> None:
+        if writer.transport.get_write_buffer_size() > self.max_peer_buffer:
+            self.dropped_peers += 1
+            print(f"[Nexus] Relay lento desconectado: {writer.get_extra_info('peername')}")
+            self._drop(writer)
+            return
+        writer.write(frame)
+
+    def _drop(self, writer: asyncio.StreamWriter) -> None:
+        self._peers.discard(writer)
+        writer.close()
+
+    async def _on_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        for message in self.snapshot() if self.snapshot else []:
+            writer.write(pack_frame(self._encode({"message": message, "delta": None})))
+        self._peers.add(writer)
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                command = frame.get("command")
+                if isinstance(command, dict) and self.on_command is not None:
+                    self.commands += 1
+                    await self.on_command(command)
+        except Exception as exc:
+            print(f"[Nexus] Error en conexión de relay: {exc}")
+        finally:
+            self._drop(writer)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "role": ROLE_INGEST,
+            "addr": f"{self.addr[0]}:{self.addr[1]}",
+            "peers": self.peers,
+            "published": self.published,
+            "commands": self.commands,
+            "dropped_peers": self.dropped_peers,
+        }
+
+
+class RelaySubscriber:
+    """Lado relay: lee del ingest y entrega cada mensaje a `on_message(message, delta)`."""
+
+    def __init__(
+        self,
+        addr: Address,
+        on_message: MessageHandler,
+        reconnect_s: Optional[float] = RECONNECT_S,
+    ):
+        self.addr = addr
+        self.on_message = on_message
+        # None: sin reconexión, run() vuelve al cerrarse el ingest (bench).
+        self.reconnect_s = reconnect_s
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self.connected = False
+        self.connects = 0
+        self.received = 0
+        self.relayed_commands = 0
+
+    async def run(self) -> None:
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_connection(*self.addr)
+                self.connected = True
+                self.connects += 1
+                while True:
+                    frame = await read_frame(reader)
+                    if frame is None:
+                        break
+                    message = frame.get("message")
+                    if not isinstance(message, dict):
+                        continue
+                    keys = frame.get("delta")
+                    delta = {k: message.get(k) for k in keys} if isinstance(keys, list) else None
+                    self.received += 1
+                    await self.on_message(message, delta)
+            except OSError:
+                pass
+            except Exception as exc:
+                print(f"[Nexus] Error leyendo del ingest: {exc}")
+            finally:
+                self.connected = False
+                writer, self._writer = self._writer, None
+                if writer is not None:
+                    writer.close()
+            if self.reconnect_s is None:
+                return
+            await asyncio.sleep(self.reconnect_s)
+
+    def send_command(self, command: Dict[str, Any]) -> bool:
+        """Reenvía un comando al ingest sin esperar respuesta; False si no hay conexión."""
+        if self._writer is None:
+            return False
+        self._writer.write(pack_frame(encode_json({"command": command})))
+        self.relayed_commands += 1
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "role": ROLE_RELAY,
+            "addr": f"{self.addr[0]}:{self.addr[1]}",
+            "connected": self.connected,
+            "connects": self.connects,
+            "received": self.received,
+            "relayed_commands": self.relayed_commands,
+        }
+
+
+# ── Benchmark ────────────────────────────────────────────────────────────────
+class _NullSink:
+    """WebSocket que solo cuenta bytes: mide el coste de proyectar/codificar/repartir."""
+
+    client = None
+
+    def __init__(self) -> None:
+        self.bytes = 0
+
+    async def send_text(self, text: str) -> None:
+        self.bytes += len(text)
+
+    async def send_bytes(self, data: bytes) -> None:
+        self.bytes += len(data)
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+async def _bench_relay(addr: Address, clients: int) -> Dict[str, Any]:
+    import main  # import diferido: main arranca FastAPI y perfiles
+    from core.ws_client import ClientConnection
+
+    manager = main.manager
+    for _ in range(clients):
+        sink = _NullSink()
+        manager.clients[sink] = ClientConnection(sink)
+        manager.clients[sink].start()
+    subscriber = RelaySubscriber(addr, manager.apply_relayed, reconnect_s=None)
+    await subscriber.run()
+    await asyncio.sleep(0.2)  # que los escritores vacíen su último frame
+    return {
+        "received": subscriber.received,
+        "delivered": sum(c.sent for c in manager.clients.values()),
+        "dropped": sum(c.dropped for c in manager.clients.values()),
+    }
+
+
+def _bench_worker(addr: Address, clients: int, results: Any) -> None:
+    results.put(asyncio.run(_bench_relay(addr, clients)))
+
+
+def _bench_message(i: int, fields: int) -> Dict[str, Any]:
+    message: Dict[str, Any] = {
+        "type": "TELEMETRY",
+        "timestamp": time.time(),
+        "gameLinked": True,
+        "CurrentSpeed": i * 0.1,
+    }
+    for k in range(fields):
+        message[f"Control{k}"] = float((i + k) % 7)
+    return message
+
+
+async def _bench_ingest(workers: int, clients: int, hz: float, duration_s: float) -> Dict[str, Any]:
+    publisher = RelayPublisher(("127.0.0.1", 0), max_peer_buffer=64 * MAX_PEER_BUFFER)
+    await publisher.start()
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    per_worker = max(1, clients // workers)
+    procs = [
+        ctx.Process(target=_bench_worker, args=(publisher.addr, per_worker, results))
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    deadline = time.monotonic() + 60.0
+    while publisher.peers < workers and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+
+    frames = int(hz * duration_s)
+    started = time.monotonic()
+    for i in range(frames):
+        publisher.publish(_bench_message(i, 60), None if i % 50 == 0 else {"CurrentSpeed": 0})
+        await asyncio.sleep(max(0.0, started + (i + 1) / hz - time.monotonic()))
+    await asyncio.sleep(0.5)
+    await publisher.stop()
+
+    # Sin bloquear el loop: el cierre de los peers aún tiene que llegar a los workers.
+    loop = asyncio.get_running_loop()
+    stats = [await loop.run_in_executor(None, results.get, True, 60.0) for _ in procs]
+    for proc in procs:
+        proc.join()
+    delivered = sum(s["delivered"] for s in stats)
+    served = per_worker * workers
+    return {
+        "workers": workers,
+        "clients": served,
+        "frames": frames,
+        "delivered_per_s": round(delivered / duration_s),
+        # 1.0 = cada cliente recibió cada frame; menos = frames pisados por falta de CPU.
+        "delivery_ratio": round(delivered / max(1, served * frames), 3),
+    }
+
+
+def bench(workers: List[int], clients: int, hz: float = 60.0, duration_s: float = 5.0) -> List[Dict[str, Any]]:
+    """Mismos clientes repartidos entre 1, 2, 4… workers relay alimentados por un ingest sintético."""
+    return [asyncio.run(_bench_ingest(w, clients, hz, duration_s)) for w in workers]
+
+
+def _cli() -> None:
+    parser = argparse.ArgumentParser(description="Relay de telemetría")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    bench_cmd = sub.add_parser("bench", help="capacidad de clientes según número de workers")
+    bench_cmd.add_argument("--clients", type=int, default=2000)
+    bench_cmd.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    bench_cmd.add_argument("--hz", type=float, default=60.0)
+    bench_cmd.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+    if args.cmd == "bench":
+        for row in bench(args.workers, args.clients, args.hz, args.duration):
+            print(row)
+
+
+if __name__ == "__main__":
+    _cli()
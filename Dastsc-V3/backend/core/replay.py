@@ -0,0 +1,225 @@
+"""
+replay.py — Grabación y reproducción de frames GetData para pruebas sin TSC.
+
+FrameRecorder añade cada línea cruda con su instante monotónico (offset desde
+el inicio del segmento) a un log de texto compacto (`.gz` opcional):
+
+    #nexus-replay v1
+    #segment
+    0.0000<TAB>SpeedoType:1|CurrentSpeed:0.0000|...
+    0.0102<TAB>...
+
+Se graba en el hilo del watcher (on_frame), antes de que la cola del pipeline
+descarte frames: la captura tiene todo lo que leyó el watcher.
+
+ReplaySource lo vuelve a inyectar a 1×, N× o tan rápido como sea posible
+(speed=0), con timestamps virtuales. TelemetryProcessor.process usa esos
+timestamps para el tracker, el odómetro y las cadencias de perfil / tick de
+sesión, así que esa salida es determinista. No lo son el `timestamp` de cada
+TELEMETRY (reloj real al publicar) ni lo que venga de RailDriver u OCR.
+
+Benchmark del pipeline completo:
+    python -m core.replay bench captura.log [--speed 0]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import inspect
+import os
+import threading
+import time
+from typing import IO, Any, Callable, Dict, Iterator, Optional, Tuple
+
+from core.getdata_watcher import RawFrame
+
+REPLAY_HEADER = "#nexus-replay v1"
+SEGMENT_MARKER = "#segment"
+# A máxima velocidad, ceder el loop cada N frames para no acaparar el event loop.
+_YIELD_EVERY_N = 64
+
+
+def _open_text(path: str, mode: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")  # type: ignore[return-value]
+    return open(path, mode, encoding="utf-8", newline="\n")
+
+
+class FrameRecorder:
+    """Log append-only de líneas GetData con offset monotónico (seguro entre hilos)."""
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.monotonic):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.path = path
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._file = _open_text(path, "a")
+        if is_new:
+            self._file.write(REPLAY_HEADER + "\n")
+        self._file.write(SEGMENT_MARKER + "\n")
+        self._t0: Optional[float] = None
+        self.count = 0
+        self.errors = 0
+
+    def record(self, line: str, t: Optional[float] = None) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            now = self._clock() if t is None else t
+            if self._t0 is None:
+                self._t0 = now
+            self._file.write(f"{now - self._t0:.4f}\t{line.strip()}\n")
+            self.count += 1
+
+    def record_frame(self, raw: RawFrame) -> None:
+        """Hook on_frame de los watchers."""
+        try:
+            self.record(raw.line)
+        except OSError as exc:
+            self.errors += 1
+            if self.errors == 1:
+                print(f"[Nexus] Error grabando frame en {self.path}: {exc}")
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def read_frames(path: str) -> Iterator[Tuple[float, str]]:
+    """(offset_s, línea) con offsets crecientes aunque haya varios segmentos."""
+    base = 0.0
+    last = 0.0
+    pending_segment = False
+    with _open_text(path, "r") as f:
+        for raw in f:
+            raw = raw.rstrip("\n")
+            if not raw:
+                continue
+            if raw.startswith("#"):
+                if raw == SEGMENT_MARKER:
+                    pending_segment = True
+                continue
+            stamp, sep, line = raw.partition("\t")
+            if not sep:
+                continue
+            try:
+                offset = float(stamp)
+            except ValueError:
+                continue
+            if pending_segment:
+                base = last
+                pending_segment = False
+            last = base + offset
+            yield last, line
+
+
+class ReplaySource:
+    """Reproduce un log grabado hacia `feed` (síncrono o corrutina)."""
+
+    def __init__(self, path: str, speed: float = 1.0):
+        if speed < 0:
+            raise ValueError("speed debe ser >= 0 (0 = máxima velocidad)")
+        self.path = path
+        self.speed = speed
+        self.frames_emitted = 0
+        self.elapsed_s = 0.0
+
+    async def run(self, feed: Callable[[RawFrame], Any]) -> int:
+        start_wall = time.time()
+        start_mono = time.monotonic()
+        for offset, line in read_frames(self.path):
+            if self.speed > 0:
+                delay = start_mono + offset / self.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif self.frames_emitted % _YIELD_EVERY_N == 0:
+                await asyncio.sleep(0)
+            result = feed(RawFrame(start_wall + offset, line))
+            if inspect.isawaitable(result):
+                await result
+            self.frames_emitted += 1
+        self.elapsed_s = time.monotonic() - start_mono
+        return self.frames_emitted
+
+    def status(self) -> Dict[str, Any]:
+        fps = self.frames_emitted / self.elapsed_s if self.elapsed_s > 0 else None
+        return {
+            "path": self.path,
+            "speed": self.speed,
+            "frames": self.frames_emitted,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "fps": round(fps, 1) if fps else None,
+        }
+
+
+class ReplayWatcher:
+    """Mismo contrato que GetDataWatcher, alimentando la cola desde un log grabado."""
+
+    def __init__(self, path: str, queue: "asyncio.Queue[RawFrame]", speed: float = 1.0):
+        self.source = ReplaySource(path, speed)
+        self._queue = queue
+        self._task: Optional["asyncio.Task[int]"] = None
+        self.source_name: Optional[str] = "replay"
+
+    @property
+    def frames_emitted(self) -> int:
+        return self.source.frames_emitted
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.source.run(self._queue.put_nowait))
+
+    def stop(self, timeout: float = 0.0) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "source": self.source_name,
+            "frames_read": self.frames_emitted,
+            "replay": self.source.status(),
+        }
+
+
+def replay_speed_from_env(default: float = 1.0) -> float:
+    """NEXUS_REPLAY_SPEED: 1, 10… o 0 para máxima velocidad."""
+    raw = os.environ.get("NEXUS_REPLAY_SPEED", "").strip()
+    try:
+        return max(0.0, float(raw)) if raw else default
+    except ValueError:
+        return default
+
+
+async def bench(path: str, speed: float = 0.0) -> Dict[str, Any]:
+    """Pasa el log por TelemetryProcessor en serie y mide el throughput."""
+    import main  # import diferido: main arranca FastAPI y perfiles
+
+    processor = main.TelemetryProcessor(main.manager)
+    source = ReplaySource(path, speed)
+    await source.run(processor.process)
+    return source.status()
+
+
+def _cli() -> None:
+    parser = argparse.ArgumentParser(description="Replay de capturas GetData")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    bench_cmd = sub.add_parser("bench", help="throughput del pipeline completo")
+    bench_cmd.add_argument("path")
+    bench_cmd.add_argument("--speed", type=float, default=0.0)
+    args = parser.parse_args()
+    if args.cmd == "bench":
+        print(asyncio.run(bench(args.path, args.speed)))
+
+
+if __name__ == "__main__":
+    _cli()
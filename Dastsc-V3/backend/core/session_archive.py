@@ -0,0 +1,315 @@
+"""
+session_archive.py — Archivo comprimido de sesiones terminadas (logs/nexus-v4/archive/).
+
+Cada sesión archivada es un session_<id>.ndjson.gz (o .zst con zstandard): el
+mismo formato que el export NDJSON — {"session": cabecera} en la primera línea y
+un evento por línea. archive/index.json guarda, por sesión, cabecera, nº de
+eventos, archivo y tamaño, así que listar no abre ni descomprime nada.
+
+Retención por presupuesto en vez de por número de sesiones:
+  NEXUS_SESSION_ARCHIVE_MAX_MB (256 por defecto; 0 = sin tope de tamaño) y
+  NEXUS_SESSION_ARCHIVE_MAX_DAYS (30 por defecto; 0 = sin tope de edad).
+Al pasarse se borran primero las más antiguas. NEXUS_SESSION_ARCHIVE_CODEC
+elige gzip / zstd (zstd por defecto si está instalado).
+
+Escribe solo el hilo SessionWriter; los lectores usan el índice en memoria
+(se recarga si otro proceso reescribió index.json). status() no toca el disco:
+devuelve lo que dejó la última carga o escritura del índice.
+"""
+from __future__ import annotations
+
+import copy
+import gzip
+import io
+import json
+import os
+import time
+from threading import Lock
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# ── Comprobación de dependencias opcionales ───────────────────────────────────
+try:
+    import zstandard as _zstd
+    ZSTD_OK = True
+except ImportError:
+    ZSTD_OK = False
+
+CODEC_GZIP = "gzip"
+CODEC_ZSTD = "zstd"
+_SUFFIXES = {CODEC_GZIP: ".ndjson.gz", CODEC_ZSTD: ".ndjson.zst"}
+ARCHIVE_DIRNAME = "archive"
+INDEX_FILE = "index.json"
+DEFAULT_MAX_MB = 256
+DEFAULT_MAX_DAYS = 30
+READ_CHUNK_BYTES = 64 * 1024
+
+
+def codec_from_env() -> str:
+    """NEXUS_SESSION_ARCHIVE_CODEC: gzip / zstd (zstd solo si zstandard está instalado)."""
+    raw = os.environ.get("NEXUS_SESSION_ARCHIVE_CODEC", "").strip().lower()
+    if raw == CODEC_GZIP or not ZSTD_OK:
+        return CODEC_GZIP
+    return CODEC_ZSTD
+
+
+def _env_number(name: str, default: float) -> float:
+    raw = os.environ.get(name, "").strip()
+    try:
+        return max(0.0, float(raw)) if raw else float(default)
+    except ValueError:
+        return float(default)
+
+
+def max_bytes_from_env() -> int:
+    """NEXUS_SESSION_ARCHIVE_MAX_MB → bytes (0 = sin tope)."""
+    return int(_env_number("NEXUS_SESSION_ARCHIVE_MAX_MB", DEFAULT_MAX_MB) * 1024 * 1024)
+
+
+def max_age_s_from_env() -> float:
+    """NEXUS_SESSION_ARCHIVE_MAX_DAYS → segundos (0 = sin tope)."""
+    return _env_number("NEXUS_SESSION_ARCHIVE_MAX_DAYS", DEFAULT_MAX_DAYS) * 86400.0
+
+
+def _codec_of(name: str) -> Optional[str]:
+    for codec, suffix in _SUFFIXES.items():
+        if name.endswith(suffix):
+            return codec
+    return None
+
+
+def _open_write(path: str, codec: str) -> BinaryIO:
+    if codec == CODEC_ZSTD:
+        return _zstd.ZstdCompressor(level=3).stream_writer(open(path, "wb"))
+    return gzip.open(path, "wb", compresslevel=6)
+
+
+def _open_read(path: str) -> BinaryIO:
+    if _codec_of(path) == CODEC_ZSTD:
+        if not ZSTD_OK:
+            raise OSError(f"zstandard no instalado: no se puede leer {os.path.basename(path)}")
+        return io.BufferedReader(_zstd.ZstdDecompressor().stream_reader(open(path, "rb")))
+    return gzip.open(path, "rb")
+
+
+def _header_line(header: Dict[str, Any]) -> bytes:
+    return (json.dumps({"session": header}, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class SessionArchive:
+    """Sesiones terminadas de un directorio de logs, comprimidas y con índice."""
+
+    def __init__(
+        self,
+        directory: str,
+        codec: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        max_age_s: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.directory = directory
+        self.codec = codec or codec_from_env()
+        self.max_bytes = max_bytes_from_env() if max_bytes is None else max_bytes
+        self.max_age_s = max_age_s_from_env() if max_age_s is None else max_age_s
+        self._clock = clock
+        self._lock = Lock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._index_mtime = 0.0
+        # (sesiones, bytes) del índice en memoria, para status() sin disco.
+        self._totals: Optional[Tuple[int, int]] = None
+        self.expired = 0
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.directory, INDEX_FILE)
+
+    # ── Índice ───────────────────────────────────────────────────────────────
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Con _lock tomado. Un stat por llamada; relee solo si index.json cambió."""
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except OSError:
+            mtime = 0.0
+        if self._entries is not None and mtime == self._index_mtime:
+            return self._entries
+        entries: Optional[Dict[str, Dict[str, Any]]] = None
+        if mtime:
+            try:
+                with open(self.index_path, encoding="utf-8") as f:
+                    entries = json.load(f)["sessions"]
+            except (OSError, ValueError, KeyError, TypeError) as exc:
+                print(f"[Nexus] Índice de archivo de sesiones ilegible ({exc}); se reconstruye")
+        if entries is None:
+            entries = self._rebuild()
+        self._set_entries(entries)
+        self._index_mtime = mtime
+        return entries
+
+    def _set_entries(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        self._entries = entries
+        self._totals = (len(entries), sum(entry["bytes"] for entry in entries.values()))
+
+    def load(self) -> None:
+        """Carga (o relee) el índice; lo llama el escritor para tener status() al día."""
+        with self._lock:
+            self._load()
+
+    def _rebuild(self) -> Dict[str, Dict[str, Any]]:
+        """Sin index.json: se recorre el directorio (solo pasa si se perdió el índice)."""
+        entries: Dict[str, Dict[str, Any]] = {}
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in os.listdir(self.directory):
+            if _codec_of(name) is None:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with _open_read(path) as f:
+                    header = json.loads(f.readline())["session"]
+                    count = sum(1 for _ in f)
+                entries[header["id"]] = {
+                    "header": header,
+                    "event_count": count,
+                    "file": name,
+                    "bytes": os.path.getsize(path),
+                    "archived_at": os.path.getmtime(path),
+                }
+            except (OSError, ValueError, KeyError, TypeError, EOFError):
+                continue
+        if entries:
+            self._save(entries)
+        return entries
+
+    def _save(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"sessions": entries}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self.index_path)
+        self._index_mtime = os.path.getmtime(self.index_path)
+
+    # ── Escritura (hilo SessionWriter) ───────────────────────────────────────
+    def add(
+        self,
+        session_id: str,
+        header: Dict[str, Any],
+        lines: Iterable[bytes],
+        fsync: Optional[Callable[[str], None]] = None,
+    ) -> Dict[str, Any]:
+        """Comprime la sesión (líneas JSONL ya codificadas) y la registra en el índice."""
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"session_{session_id.replace(':', '-')}{_SUFFIXES[self.codec]}"
+        path = os.path.join(self.directory, name)
+        tmp = path + ".tmp"
+        count = 0
+        with _open_write(tmp, self.codec) as out:
+            out.write(_header_line(header))
+            for line in lines:
+                out.write(line)
+                count += 1
+        if fsync is not None:
+            fsync(tmp)
+        os.replace(tmp, path)
+        entry = {
+            "header": header,
+            "event_count": count,
+            "file": name,
+            "bytes": os.path.getsize(path),
+            "archived_at": self._clock(),
+        }
+        with self._lock:
+            entries = dict(self._load())
+            previous = entries.get(session_id)
+            if previous is not None and previous["file"] != name:
+                self._unlink(previous["file"])
+            entries[session_id] = entry
+            self._save(entries)
+            self._set_entries(entries)
+        return entry
+
+    def enforce(self) -> List[str]:
+        """Aplica el presupuesto (edad y tamaño); devuelve los ids borrados."""
+        with self._lock:
+            entries = dict(self._load())
+            oldest_first = sorted(entries, key=lambda sid: entries[sid]["archived_at"])
+            total = sum(entry["bytes"] for entry in entries.values())
+            now = self._clock()
+            removed: List[str] = []
+            for sid in oldest_first:
+                entry = entries[sid]
+                too_old = self.max_age_s > 0 and now - entry["archived_at"] > self.max_age_s
+                too_big = self.max_bytes > 0 and total > self.max_bytes
+                if not (too_old or too_big):
+                    continue
+                self._unlink(entry["file"])
+                total -= entry["bytes"]
+                del entries[sid]
+                removed.append(sid)
+            if removed:
+                self.expired += len(removed)
+                self._save(entries)
+                self._set_entries(entries)
+        return removed
+
+    def _unlink(self, name: str) -> None:
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    # ── Lectura ──────────────────────────────────────────────────────────────
+    def entry(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._load().get(session_id)
+            return copy.deepcopy(entry) if entry is not None else None
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Entradas del índice, la archivada más recientemente primero."""
+        with self._lock:
+            entries = list(self._load().values())
+        return sorted(entries, key=lambda entry: entry["archived_at"], reverse=True)
+
+    def iter_events(self, session_id: str) -> Iterator[bytes]:
+        """Líneas de eventos (sin la cabecera), descomprimiendo sobre la marcha."""
+        entry = self.entry(session_id)
+        if entry is None:
+            return
+        with _open_read(os.path.join(self.directory, entry["file"])) as f:
+            f.readline()
+            for line in f:
+                if line.endswith(b"\n"):
+                    yield line
+
+    def iter_ndjson(self, session_id: str) -> Iterator[bytes]:
+        """El NDJSON archivado tal cual (cabecera + eventos), por trozos."""
+        entry = self.entry(session_id)
+        if entry is None:
+            return
+        with _open_read(os.path.join(self.directory, entry["file"])) as f:
+            for chunk in iter(lambda: f.read(READ_CHUNK_BYTES), b""):
+                yield chunk
+
+    def status(self) -> Dict[str, Any]:
+        """Sin disco (apto para el event loop); sessions/bytes son None hasta la primera carga."""
+        totals = self._totals
+        return {
+            "codec": self.codec,
+            "sessions": totals[0] if totals else None,
+            "bytes": totals[1] if totals else None,
+            "max_bytes": self.max_bytes,
+            "max_age_days": round(self.max_age_s / 86400.0, 2),
+            "expired": self.expired,
+        }
+
+
+_archives: Dict[str, SessionArchive] = {}
+_archives_lock = Lock()
+
+
+def archive_for(session_dir: str) -> SessionArchive:
+    """Archivo (compartido en el proceso) del directorio de logs `session_dir`."""
+    directory = os.path.join(session_dir, ARCHIVE_DIRNAME)
+    with _archives_lock:
+        archive = _archives.get(directory)
+        if archive is None:
+            archive = _archives[directory] = SessionArchive(directory)
+        return archive
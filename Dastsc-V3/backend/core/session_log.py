@@ -1,16 +1,47 @@
 """
 session_log.py — Logs de sesión Nexus V4 (diagnóstico TSC).
-Mantiene los últimos N archivos JSON en logs/nexus-v4/.
+
+Cada sesión viva son tres archivos en logs/nexus-v4/:
+- session_<id>.jsonl: un evento por línea; append O(1), nunca se reescribe.
+- session_<id>.meta.json: cabecera (id, started_at, ended_at, meta, summary);
+  pequeña, se reescribe entera (tmp + replace) cuando cambia.
+- session_<id>.idx.json: índice derivado del .jsonl (eventos, bytes y un
+  checkpoint de offset cada INDEX_STRIDE eventos); si no cuadra con el .jsonl se
+  reconstruye.
+
+get() y list_sessions() reconstruyen la vista de siempre ({..., "events": [...]});
+list_sessions() cuenta con el índice, sin leer los eventos. page() pagina por
+cursor (nº de evento) con filtros de tipo y de tiempo (`t`), y export() da un
+NDJSON en streaming; ambos saltan al checkpoint más cercano y solo decodifican
+lo que devuelven.
+Los session_<id>.json antiguos se siguen leyendo y se migran en la primera escritura.
+
+Las sesiones terminadas (y las vivas abandonadas más allá de las max_files más
+recientes) se comprimen en logs/nexus-v4/archive/ (ver session_archive) con
+retención por tamaño/edad; las lecturas buscan allí lo que ya no está vivo.
+
+Solo SessionWriter (un hilo) escribe en disco: SessionLogStore actualiza su
+estado en memoria y encola, así que append/append_active desde el event loop
+no esperan al disco. El hilo agrupa escrituras (NEXUS_SESSION_FLUSH_MS o
+BATCH_EVENTS eventos pendientes) y aplica la política NEXUS_SESSION_FSYNC:
+  never — nunca fsync; end (defecto) — al terminar una sesión y al cerrar;
+  batch — tras cada lote.
 """
 from __future__ import annotations
 
 import json
 import os
 import re
+from itertools import chain
+import threading
 import time
+from bisect import bisect_right
 from datetime import datetime, timezone
+from collections import OrderedDict, deque
 from threading import Lock
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from core import session_archive
 
 _V4_SOURCES = frozenset({"v4_session", "v4_websocket"})
 _V4_TICK_TYPES = frozenset({"tick", "tick_change", "session_start", "connection"})
@@ -27,12 +58,36 @@ def _merge_session_meta(existing: Dict[str, Any], patch: Dict[str, Any]) -> Dict
     merged.update(patch)
     return merged
 
+# Sesiones sin terminar que se quedan vivas; las terminadas van siempre al archivo.
 _MAX_SESSION_FILES = 5
 _SESSION_ID_RE = re.compile(r"^[\w\-]+$")
 
+_FILE_PREFIX = "session_"
+_META_SUFFIX = ".meta.json"
+_EVENTS_SUFFIX = ".jsonl"
+_INDEX_SUFFIX = ".idx.json"
+_LEGACY_SUFFIX = ".json"
+
 _BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 _DEFAULT_LOG_DIR = os.path.normpath(os.path.join(_BACKEND_DIR, "..", "..", "logs", "nexus-v4"))
 
+DEFAULT_FLUSH_MS = 500
+BATCH_EVENTS = 256
+MAX_PENDING_EVENTS = 10_000
+FSYNC_NEVER = "never"
+FSYNC_END = "end"
+FSYNC_BATCH = "batch"
+_FSYNC_POLICIES = (FSYNC_NEVER, FSYNC_END, FSYNC_BATCH)
+
+MAX_OPEN_SESSIONS = 4
+TAIL_EVENTS = 500
+MAX_TAIL_BYTES = 4 * 1024 * 1024
+
+INDEX_STRIDE = 1000
+PAGE_LIMIT = 500
+MAX_PAGE_LIMIT = 5000
+EXPORT_CHUNK_BYTES = 64 * 1024
+
 
 def _session_dir() -> str:
     env = os.environ.get("NEXUS_V4_LOG_DIR", "").strip()
@@ -43,92 +98,842 @@ def _log_json_pretty() -> bool:
     return os.environ.get("NEXUS_V4_LOG_PRETTY", "").strip().lower() in ("1", "true", "yes")
 
 
-def _session_path(session_id: str) -> str:
+def flush_interval_s_from_env() -> float:
+    """NEXUS_SESSION_FLUSH_MS: retraso máximo de un evento antes de llegar al disco."""
+    raw = os.environ.get("NEXUS_SESSION_FLUSH_MS", "").strip()
+    try:
+        return max(0.0, float(raw)) / 1000.0 if raw else DEFAULT_FLUSH_MS / 1000.0
+    except ValueError:
+        return DEFAULT_FLUSH_MS / 1000.0
+
+
+def fsync_policy_from_env() -> str:
+    """NEXUS_SESSION_FSYNC: never / end / batch."""
+    raw = os.environ.get("NEXUS_SESSION_FSYNC", "").strip().lower()
+    return raw if raw in _FSYNC_POLICIES else FSYNC_END
+
+
+def _session_file(session_id: str, suffix: str, directory: Optional[str] = None) -> str:
     safe = session_id.replace(":", "-")
-    return os.path.join(_session_dir(), f"session_{safe}.json")
+    return os.path.join(directory or _session_dir(), f"{_FILE_PREFIX}{safe}{suffix}")
+
+
+def _meta_path(session_id: str, directory: Optional[str] = None) -> str:
+    return _session_file(session_id, _META_SUFFIX, directory)
+
+
+def _events_path(session_id: str, directory: Optional[str] = None) -> str:
+    return _session_file(session_id, _EVENTS_SUFFIX, directory)
+
+
+def _index_path(session_id: str, directory: Optional[str] = None) -> str:
+    return _session_file(session_id, _INDEX_SUFFIX, directory)
+
+
+def _legacy_path(session_id: str, directory: Optional[str] = None) -> str:
+    """Formato anterior: un único JSON con cabecera y todos los eventos."""
+    return _session_file(session_id, _LEGACY_SUFFIX, directory)
+
+
+def _new_header(session_id: str, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {
+        "id": session_id,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "ended_at": None,
+        "meta": meta or {},
+    }
+
+
+def _event_line(event: Any) -> str:
+    return json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def _ensure_dir(directory: Optional[str] = None) -> str:
+    directory = directory or _session_dir()
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _session_ids_on_disk(directory: Optional[str] = None) -> List[str]:
+    """Ids de sesión en disco (ambos formatos), la modificada más recientemente primero."""
+    directory = _ensure_dir(directory)
+    stamps: Dict[str, float] = {}
+    for name in os.listdir(directory):
+        if not name.startswith(_FILE_PREFIX):
+            continue
+        # .meta.json / .idx.json antes que .json: terminan igual.
+        for suffix in (_META_SUFFIX, _INDEX_SUFFIX, _EVENTS_SUFFIX, _LEGACY_SUFFIX):
+            if name.endswith(suffix):
+                session_id = name[len(_FILE_PREFIX):-len(suffix)]
+                try:
+                    mtime = os.path.getmtime(os.path.join(directory, name))
+                except OSError:
+                    break
+                stamps[session_id] = max(stamps.get(session_id, 0.0), mtime)
+                break
+    return sorted(stamps, key=lambda sid: stamps[sid], reverse=True)
+
+
+def _read_legacy(session_id: str, directory: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    path = _legacy_path(session_id, directory)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _read_header_file(session_id: str, directory: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Cabecera en disco de una sesión viva (.meta.json o formato antiguo), o None."""
+    path = _meta_path(session_id, directory)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    legacy = _read_legacy(session_id, directory)
+    if legacy is not None:
+        legacy.pop("events", None)
+    return legacy
+
+
+class _EventIndex:
+    """Índice de un .jsonl: nº de eventos, bytes válidos y checkpoints [evento, offset]."""
+
+    __slots__ = ("events", "bytes", "checkpoints")
+
+    def __init__(self, events: int = 0, size: int = 0, checkpoints: Optional[List[List[int]]] = None):
+        self.events = events
+        self.bytes = size
+        self.checkpoints: List[List[int]] = checkpoints or []
+
+    def add(self, size: int) -> None:
+        if self.events and self.events % INDEX_STRIDE == 0:
+            self.checkpoints.append([self.events, self.bytes])
+        self.events += 1
+        self.bytes += size
+
+    def seek(self, after: int) -> Tuple[int, int]:
+        """(evento, offset) del checkpoint más cercano sin pasarse de `after`."""
+        pos = bisect_right(self.checkpoints, [after, float("inf")])
+        if pos == 0:
+            return 0, 0
+        ordinal, offset = self.checkpoints[pos - 1]
+        return ordinal, offset
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"events": self.events, "bytes": self.bytes, "checkpoints": self.checkpoints}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_EventIndex":
+        return cls(int(data["events"]), int(data["bytes"]), [list(map(int, c)) for c in data["checkpoints"]])
+
+
+def _read_index(session_id: str, directory: Optional[str] = None) -> Optional[_EventIndex]:
+    try:
+        with open(_index_path(session_id, directory), encoding="utf-8") as f:
+            return _EventIndex.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _scan_index(path: str) -> _EventIndex:
+    """Reconstruye el índice recorriendo el .jsonl; se para en una línea a medias."""
+    index = _EventIndex()
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            index.add(len(line))
+    return index
+
+
+def _current_index(session_id: str, directory: Optional[str] = None) -> _EventIndex:
+    """Índice del .jsonl, reconstruido (sin escribirlo) si falta o no cuadra con el archivo."""
+    path = _events_path(session_id, directory)
+    index = _read_index(session_id, directory)
+    if index is None or index.bytes != os.path.getsize(path):
+        index = _scan_index(path)
+    return index
+
+
+def _iter_lines(path: str, index: _EventIndex, after: int) -> Iterator[Tuple[int, bytes]]:
+    """(nº de evento, línea) desde el evento `after`, sin pasar de index.bytes."""
+    ordinal, offset = index.seek(after)
+    with open(path, "rb") as f:
+        f.seek(offset)
+        remaining = index.bytes - offset
+        while remaining > 0:
+            line = f.readline(remaining)
+            if not line:
+                return
+            remaining -= len(line)
+            if ordinal >= after:
+                yield ordinal, line
+            ordinal += 1
+
+
+def _event_matcher(
+    types: Optional[Iterable[str]] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+) -> Callable[[bytes], Optional[Dict[str, Any]]]:
+    """Línea → evento si pasa los filtros (tipo, since <= t <= until), si no None."""
+    wanted = frozenset(types or ())
+    # Prefiltro sin decodificar: las líneas se escriben con _event_line (sin espacios).
+    needles = [f'"type":{json.dumps(t, ensure_ascii=False)}'.encode("utf-8") for t in wanted]
+    filtering = bool(wanted) or since is not None or until is not None
+
+    def match(line: bytes) -> Optional[Dict[str, Any]]:
+        if needles and not any(needle in line for needle in needles):
+            return None
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return None
+        if not filtering:
+            return event
+        if not isinstance(event, dict):
+            return None
+        if wanted and event.get("type") not in wanted:
+            return None
+        if since is not None or until is not None:
+            t = event.get("t")
+            if not isinstance(t, (int, float)):
+                return None
+            if (since is not None and t < since) or (until is not None and t > until):
+                return None
+        return event
+
+    return match
+
+
+def _fsync_path(path: str) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+_Key = Tuple[str, str]  # (directorio, session_id)
+
+
+class SessionWriter:
+    """Hilo único de escritura de logs de sesión, con cola acotada y lotes."""
+
+    def __init__(
+        self,
+        flush_interval_s: Optional[float] = None,
+        fsync_policy: Optional[str] = None,
+        batch_events: int = BATCH_EVENTS,
+        max_pending_events: int = MAX_PENDING_EVENTS,
+    ):
+        self.flush_interval_s = flush_interval_s_from_env() if flush_interval_s is None else flush_interval_s
+        self.fsync_policy = fsync_policy or fsync_policy_from_env()
+        self.batch_events = batch_events
+        self.max_pending_events = max_pending_events
+        self._cond = threading.Condition()
+        # Pendiente: operaciones en orden (remove/migrate/prune), cabeceras (la última
+        # gana) y eventos por sesión. Las operaciones van antes en cada lote. Todo va
+        # con el directorio resuelto al encolar, no al escribir.
+        self._ops: List[Tuple[str, Any]] = []
+        self._headers: Dict[_Key, Dict[str, Any]] = {}
+        self._events: Dict[_Key, List[str]] = {}
+        self._pending_events = 0
+        self._pending_bytes = 0
+        # Cabeceras del lote que se está escribiendo (para pending_header).
+        self._inflight_headers: Dict[_Key, Dict[str, Any]] = {}
+        self._flush_requested = False
+        self._submitted = 0
+        self._completed = 0
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        # Archivos escritos sin fsync todavía (política end).
+        self._unsynced: Set[str] = set()
+        # Índices de los .jsonl en escritura (solo el hilo escritor).
+        self._indexes: Dict[_Key, _EventIndex] = {}
+        # Directorios cuyo índice de archivo ya cargó este hilo (status sin disco).
+        self._archives_loaded: Set[str] = set()
+        self.batches = 0
+        self.written_events = 0
+        self.dropped_events = 0
+        self.fsyncs = 0
+        self.archived_sessions = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    # ── Productores (cualquier hilo; no tocan el disco) ──────────────────────
+    def _submit(self, urgent: bool = False) -> None:
+        """Con _cond tomado."""
+        self._submitted += 1
+        if urgent:
+            self._flush_requested = True
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="session-log-writer", daemon=True)
+            self._thread.start()
+        self._cond.notify_all()
+
+    def append(self, session_id: str, lines: List[str]) -> bool:
+        """Encola líneas JSONL; False (y se cuentan como perdidas) si la cola está llena."""
+        with self._cond:
+            if self._pending_events + len(lines) > self.max_pending_events:
+                if not self.dropped_events:
+                    print("[Nexus] Log de sesión: cola llena, se descartan eventos")
+                self.dropped_events += len(lines)
+                return False
+            self._events.setdefault((_session_dir(), session_id), []).extend(lines)
+            self._pending_events += len(lines)
+            self._pending_bytes += sum(len(line) for line in lines)
+            self._submit()
+        return True
+
+    def write_header(self, session_id: str, header: Dict[str, Any]) -> None:
+        with self._cond:
+            self._headers[(_session_dir(), session_id)] = dict(header)
+            self._submit(urgent=bool(header.get("ended_at")))
+
+    def pending_header(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Cabecera encolada y aún no escrita (la de disco estaría desfasada)."""
+        with self._cond:
+            key = (_session_dir(), session_id)
+            header = self._headers.get(key) or self._inflight_headers.get(key)
+            return dict(header) if header is not None else None
+
+    def migrate(self, session_id: str) -> None:
+        with self._cond:
+            self._ops.append(("migrate", (_session_dir(), session_id)))
+            self._submit()
+
+    def remove(self, session_id: str) -> None:
+        """Borra la sesión y descarta lo que tuviera pendiente."""
+        key = (_session_dir(), session_id)
+        with self._cond:
+            dropped = self._events.pop(key, [])
+            self._pending_events -= len(dropped)
+            self._pending_bytes -= sum(len(line) for line in dropped)
+            self._headers.pop(key, None)
+            self._ops.append(("remove", key))
+            self._submit()
+
+    def prune(self, max_files: int, protect: Set[str]) -> None:
+        with self._cond:
+            self._ops.append(("prune", (_session_dir(), max_files, frozenset(protect))))
+            self._submit()
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Escribe ya lo pendiente y espera a que esté en disco (no desde el event loop)."""
+        with self._cond:
+            target = self._submitted
+            if self._completed >= target:
+                return True
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._completed >= target, timeout)
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Vacía la cola, hace fsync de lo pendiente (salvo política never) y para el hilo."""
+        with self._cond:
+            thread = self._thread
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join(timeout)
+
+    # ── Hilo escritor ────────────────────────────────────────────────────────
+    def _has_work(self) -> bool:
+        return bool(self._ops or self._headers or self._events)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._has_work() and not self._stopping:
+                    self._cond.wait()
+                if not self._has_work():
+                    break
+                deadline = time.monotonic() + self.flush_interval_s
+                while not (self._flush_requested or self._stopping
+                           or self._pending_events >= self.batch_events):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                ops, self._ops = self._ops, []
+                headers, self._headers = self._headers, {}
+                self._inflight_headers = headers
+                events, self._events = self._events, {}
+                self._pending_events = 0
+                self._pending_bytes = 0
+                self._flush_requested = False
+                target = self._submitted
+            self._write_batch(ops, headers, events)
+            with self._cond:
+                self._inflight_headers = {}
+                self._completed = target
+                self._cond.notify_all()
+        if self.fsync_policy != FSYNC_NEVER:
+            self._fsync_unsynced()
+
+    def _write_batch(
+        self,
+        ops: List[Tuple[str, Any]],
+        headers: Dict[_Key, Dict[str, Any]],
+        events: Dict[_Key, List[str]],
+    ) -> None:
+        for directory in {key[0] for key in list(headers) + list(events)}:
+            self._guard(_ensure_dir, directory)
+            if directory not in self._archives_loaded:
+                self._archives_loaded.add(directory)
+                self._guard(session_archive.archive_for(directory).load)
+        # prune va al final del lote: archiva con la cabecera de fin ya escrita.
+        for op, arg in ops:
+            if op != "prune":
+                self._guard(getattr(self, f"_op_{op}"), arg)
+        ended: List[_Key] = []
+        for key, header in headers.items():
+            self._guard(self._write_header_file, key, header)
+            if header.get("ended_at"):
+                ended.append(key)
+        for key, items in events.items():
+            self._guard(self._append_lines, key, items)
+        for key in ended:
+            self._indexes.pop(key, None)
+        for op, arg in ops:
+            if op == "prune":
+                self._guard(self._op_prune, arg)
+        self.batches += 1
+        if self.fsync_policy == FSYNC_BATCH:
+            self._fsync_unsynced()
+        elif self.fsync_policy == FSYNC_END and ended:
+            for directory, session_id in ended:
+                for path in (_events_path(session_id, directory), _meta_path(session_id, directory)):
+                    if path in self._unsynced:
+                        self._unsynced.discard(path)
+                        self._fsync(path)
+
+    def _guard(self, fn: Any, *args: Any) -> None:
+        try:
+            fn(*args)
+        except (OSError, TypeError, ValueError) as exc:
+            self.errors += 1
+            self.last_error = str(exc)
+            print(f"[Nexus] Error escribiendo log de sesión: {exc}")
+
+    def _write_header_file(self, key: _Key, header: Dict[str, Any]) -> None:
+        path = _meta_path(key[1], key[0])
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            if _log_json_pretty():
+                json.dump(header, f, ensure_ascii=False, indent=2)
+            else:
+                json.dump(header, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+        self._mark_unsynced(path)
+
+    def _write_index_file(self, key: _Key, index: _EventIndex) -> None:
+        # Derivado del .jsonl: sin fsync, se reconstruye si queda desfasado.
+        path = _index_path(key[1], key[0])
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index.to_dict(), f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def _index_for(self, key: _Key, path: str) -> _EventIndex:
+        index = self._indexes.get(key)
+        if index is not None:
+            return index
+        directory, session_id = key
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        index = _read_index(session_id, directory)
+        if index is None or index.bytes != size:
+            index = _scan_index(path) if size else _EventIndex()
+            if size > index.bytes:
+                # Línea a medias de un corte: se descarta para no pegarle la siguiente.
+                print(f"[Nexus] Log de sesión: línea incompleta descartada en {path}")
+                with open(path, "r+b") as f:
+                    f.truncate(index.bytes)
+        self._indexes[key] = index
+        return index
+
+    def _append_lines(self, key: _Key, lines: List[str]) -> None:
+        path = _events_path(key[1], key[0])
+        index = self._index_for(key, path)
+        data = [line.encode("utf-8") for line in lines]
+        with open(path, "ab") as f:
+            f.write(b"".join(data))
+        for chunk in data:
+            index.add(len(chunk))
+        self.written_events += len(lines)
+        self._mark_unsynced(path)
+        self._write_index_file(key, index)
+
+    def _mark_unsynced(self, path: str) -> None:
+        if self.fsync_policy != FSYNC_NEVER:
+            self._unsynced.add(path)
+
+    def _op_migrate(self, key: _Key) -> None:
+        """session_<id>.json → .jsonl + .meta.json, antes de la primera escritura."""
+        directory, session_id = key
+        legacy = _read_legacy(session_id, directory)
+        if legacy is None:
+            return
+        events = legacy.pop("events", None) or []
+        path = _events_path(session_id, directory)
+        data = [_event_line(e).encode("utf-8") for e in events]
+        with open(path, "wb") as f:
+            f.write(b"".join(data))
+        self._mark_unsynced(path)
+        index = _EventIndex()
+        for chunk in data:
+            index.add(len(chunk))
+        self._indexes[key] = index
+        self._write_index_file(key, index)
+        self._write_header_file(key, legacy)
+        os.remove(_legacy_path(session_id, directory))
+
+    def _op_remove(self, key: _Key) -> None:
+        directory, session_id = key
+        self._indexes.pop(key, None)
+        paths = (
+            _meta_path(session_id, directory),
+            _events_path(session_id, directory),
+            _index_path(session_id, directory),
+            _legacy_path(session_id, directory),
+        )
+        for path in paths:
+            self._unsynced.discard(path)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _op_prune(self, arg: Tuple[str, int, frozenset]) -> None:
+        """Archiva las terminadas y las vivas más allá de max_files; luego aplica el presupuesto."""
+        directory, max_files, protect = arg
+        for position, session_id in enumerate(_session_ids_on_disk(directory)):
+            if session_id in protect:
+                continue
+            header = _read_header_file(session_id, directory)
+            if header is None:
+                if position >= max_files:
+                    self._op_remove((directory, session_id))  # .jsonl huérfano
+                continue
+            if header.get("ended_at") or position >= max_files:
+                self._guard(self._archive_session, directory, session_id, header)
+        session_archive.archive_for(directory).enforce()
+
+    def _archive_session(self, directory: str, session_id: str, header: Dict[str, Any]) -> None:
+        path = _events_path(session_id, directory)
+        if os.path.exists(path):
+            index = _current_index(session_id, directory)
+            lines: Iterable[bytes] = (line for _, line in _iter_lines(path, index, 0))
+        else:
+            events = (_read_legacy(session_id, directory) or {}).get("events") or []
+            lines = (_event_line(e).encode("utf-8") for e in events)
+        archive = session_archive.archive_for(directory)
+        if archive.entry(session_id) is not None:
+            # Eventos tardíos de una sesión ya archivada: se juntan, no se pisan.
+            lines = chain(archive.iter_events(session_id), lines)
+        fsync = self._fsync if self.fsync_policy != FSYNC_NEVER else None
+        archive.add(session_id, header, lines, fsync=fsync)
+        # Solo tras dejar el archivo completo en su sitio se borra la copia viva.
+        self._op_remove((directory, session_id))
+        self.archived_sessions += 1
+
+    def _fsync(self, path: str) -> None:
+        _fsync_path(path)
+        self.fsyncs += 1
+
+    def _fsync_unsynced(self) -> None:
+        paths, self._unsynced = self._unsynced, set()
+        for path in paths:
+            self._fsync(path)
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            pending = self._pending_events
+            pending_bytes = self._pending_bytes
+        return {
+            "flush_ms": round(self.flush_interval_s * 1000.0),
+            "fsync": self.fsync_policy,
+            "pending_events": pending,
+            "pending_bytes": pending_bytes,
+            "batches": self.batches,
+            "written_events": self.written_events,
+            "dropped_events": self.dropped_events,
+            "fsyncs": self.fsyncs,
+            "archived_sessions": self.archived_sessions,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+class _Tail:
+    """Últimos eventos de una sesión abierta, como líneas JSONL ya codificadas."""
+
+    __slots__ = ("lines", "bytes", "complete")
+
+    def __init__(self, complete: bool):
+        self.lines: Deque[str] = deque()
+        self.bytes = 0
+        # True mientras contiene todos los eventos de la sesión (creada aquí, sin recortes).
+        self.complete = complete
+
+    def push(self, lines: List[str], max_events: int) -> None:
+        for line in lines:
+            self.lines.append(line)
+            self.bytes += len(line)
+        while len(self.lines) > max_events:
+            self.drop_oldest()
+
+    def drop_oldest(self) -> None:
+        self.bytes -= len(self.lines.popleft())
+        self.complete = False
+
+    def clear(self) -> None:
+        self.lines.clear()
+        self.bytes = 0
+        self.complete = False
 
 
 class SessionLogStore:
-    def __init__(self, max_files: int = _MAX_SESSION_FILES):
+    """
+    Estado en memoria de las sesiones, acotado: cabeceras de como mucho
+    max_open sesiones (LRU; la activa nunca se suelta) y, de cada una, una cola
+    de tail_events eventos recientes con un tope global de max_tail_bytes. El
+    resto de eventos solo vive en disco (vía SessionWriter).
+    """
+
+    def __init__(
+        self,
+        max_files: int = _MAX_SESSION_FILES,
+        writer: Optional[SessionWriter] = None,
+        max_open: int = MAX_OPEN_SESSIONS,
+        tail_events: int = TAIL_EVENTS,
+        max_tail_bytes: int = MAX_TAIL_BYTES,
+    ):
         self.max_files = max_files
+        self.max_open = max_open
+        self.tail_events = tail_events
+        self.max_tail_bytes = max_tail_bytes
         self._lock = Lock()
-        self._open: Dict[str, Dict[str, Any]] = {}
+        self._writer = writer or SessionWriter()
+        # Cabeceras (sin eventos) de las sesiones abiertas, de menos a más reciente.
+        self._open: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._tails: Dict[str, _Tail] = {}
+        self._tail_bytes = 0
+        # Sesiones con cabecera ya encolada en formato nuevo (evita stat por append).
+        self._on_disk: Set[str] = set()
         self._latest_session_id: Optional[str] = None
         self._v4_tick_at: float = 0.0
+        self.evicted_sessions = 0
+        self.encode_errors = 0
+
+    def _keep(self, session_id: str, header: Dict[str, Any], fresh: bool = False) -> None:
+        """Registra/usa una sesión abierta (pasa a ser la más reciente del LRU)."""
+        self._open[session_id] = header
+        self._open.move_to_end(session_id)
+        if session_id not in self._tails:
+            self._tails[session_id] = _Tail(complete=fresh)
+        excess = len(self._open) - self.max_open
+        for victim in list(self._open):
+            if excess <= 0:
+                break
+            if victim in (session_id, self._latest_session_id):
+                continue
+            self._forget(victim)
+            self.evicted_sessions += 1
+            excess -= 1
 
-    def _ensure_dir(self) -> str:
-        directory = _session_dir()
-        os.makedirs(directory, exist_ok=True)
-        return directory
-
-    def _list_session_files(self) -> List[str]:
-        directory = self._ensure_dir()
-        files = [
-            os.path.join(directory, name)
-            for name in os.listdir(directory)
-            if name.startswith("session_") and name.endswith(".json")
-        ]
-        files.sort(key=lambda p: os.path.getmtime(p), reverse=True)
-        return files
+    def _forget(self, session_id: str) -> None:
+        """Suelta la sesión de memoria; lo suyo ya está encolado o en disco."""
+        self._open.pop(session_id, None)
+        tail = self._tails.pop(session_id, None)
+        if tail is not None:
+            self._tail_bytes -= tail.bytes
+        self._on_disk.discard(session_id)
+
+    def _push_tail(self, session_id: str, lines: List[str]) -> None:
+        tail = self._tails[session_id]
+        before = tail.bytes
+        tail.push(lines, self.tail_events)
+        self._tail_bytes += tail.bytes - before
+        # Presupuesto global: primero se vacían las colas de las sesiones menos recientes.
+        for other in list(self._open):
+            if self._tail_bytes <= self.max_tail_bytes:
+                return
+            if other != session_id:
+                victim = self._tails[other]
+                self._tail_bytes -= victim.bytes
+                victim.clear()
+        while self._tail_bytes > self.max_tail_bytes and tail.lines:
+            before = tail.bytes
+            tail.drop_oldest()
+            self._tail_bytes -= before - tail.bytes
+
+    def _remove_files(self, session_id: str) -> None:
+        self._on_disk.discard(session_id)
+        self._writer.remove(session_id)
 
     def _prune_old_sessions(self) -> None:
-        files = self._list_session_files()
-        for path in files[self.max_files:]:
+        self._writer.prune(self.max_files, set(self._open))
+
+    def _exists(self, session_id: str) -> bool:
+        return (
+            session_id in self._on_disk
+            or os.path.exists(_meta_path(session_id))
+            or os.path.exists(_legacy_path(session_id))
+        )
+
+    def _load_header(self, session_id: str) -> Dict[str, Any]:
+        pending = self._writer.pending_header(session_id)
+        if pending is not None:
+            return pending
+        header = _read_header_file(session_id)
+        if header is None:
+            entry = self._archive().entry(session_id)
+            header = entry["header"] if entry is not None else _new_header(session_id)
+        return header
+
+    @staticmethod
+    def _archive() -> session_archive.SessionArchive:
+        return session_archive.archive_for(_session_dir())
+
+    def _save_header(self, session_id: str, header: Dict[str, Any]) -> None:
+        if session_id not in self._on_disk:
+            if os.path.exists(_legacy_path(session_id)):
+                self._writer.migrate(session_id)
+            self._on_disk.add(session_id)
+        self._writer.write_header(session_id, header)
+
+    def _append_events(self, session_id: str, header: Dict[str, Any], events: List[Dict[str, Any]]) -> bool:
+        """Solo encola: la cabecera la primera vez y después únicamente los eventos."""
+        lines: List[str] = []
+        for event in events:
             try:
-                os.remove(path)
-            except OSError:
-                pass
+                lines.append(_event_line(event))
+            except (TypeError, ValueError):
+                self.encode_errors += 1
+        if session_id not in self._on_disk:
+            self._save_header(session_id, header)
+        if not self._writer.append(session_id, lines):
+            return False
+        self._push_tail(session_id, lines)
+        return True
+
+    def _count_events(self, session_id: str) -> int:
+        """Eventos del .jsonl: del índice o, si no lo hay, contando líneas sin decodificarlas."""
+        path = _events_path(session_id)
+        index = _read_index(session_id)
+        if index is not None and index.bytes == os.path.getsize(path):
+            return index.events
+        count = 0
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                count += chunk.count(b"\n")
+        return count
 
-    def _load(self, session_id: str) -> Dict[str, Any]:
-        path = _session_path(session_id)
+    def _live_lines(self, session_id: str, after: int) -> Optional[Tuple[int, Iterator[Tuple[int, bytes]]]]:
+        path = _events_path(session_id)
         if os.path.exists(path):
-            with open(path, encoding="utf-8") as f:
-                return json.load(f)
+            index = _current_index(session_id)
+            return index.events, _iter_lines(path, index, after)
+        legacy = _read_legacy(session_id)
+        if legacy is not None:
+            # Formato antiguo: todo en memoria; se migra en la próxima escritura.
+            events = legacy.get("events") or []
+            lines = ((n, _event_line(e).encode("utf-8")) for n, e in enumerate(events) if n >= after)
+            return len(events), lines
+        return None
+
+    def _event_lines(self, session_id: str, after: int) -> Tuple[int, Iterator[Tuple[int, bytes]]]:
+        """
+        (total de eventos, iterador perezoso de (nº, línea) desde `after`). Con
+        copia archivada y eventos tardíos vivos a la vez, se leen seguidos:
+        primero el archivo y después lo vivo.
+        """
+        archive = self._archive()
+        entry = archive.entry(session_id)
+        archived_count = entry["event_count"] if entry is not None else 0
+        live = self._live_lines(session_id, max(0, after - archived_count))
+        if entry is None:
+            return live or (0, iter(()))
+        archived: Iterator[Tuple[int, bytes]] = iter(())
+        if after < archived_count:
+            # Sin checkpoints: se descomprime desde el principio.
+            numbered = enumerate(archive.iter_events(session_id))
+            archived = ((n, line) for n, line in numbered if n >= after)
+        if live is None:
+            return archived_count, archived
+        live_count, live_lines = live
+        shifted = ((archived_count + n, line) for n, line in live_lines)
+        return archived_count + live_count, chain(archived, shifted)
+
+    def _is_live(self, session_id: str) -> bool:
+        return os.path.exists(_events_path(session_id)) or os.path.exists(_legacy_path(session_id))
+
+    def _header_for_read(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            header = self._open.get(session_id)
+            if header is None and self._exists(session_id):
+                header = self._load_header(session_id)
+        if header is None:
+            entry = self._archive().entry(session_id)
+            return entry["header"] if entry is not None else None
+        return dict(header)
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        return self._writer.flush(timeout)
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """Al apagar (lifespan): todo lo encolado a disco."""
+        self._writer.close(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        writer = self._writer.status()
+        with self._lock:
+            tail_events = sum(len(t.lines) for t in self._tails.values())
+            tail_bytes = self._tail_bytes
+            open_sessions = len(self._open)
         return {
-            "id": session_id,
-            "started_at": datetime.now(timezone.utc).isoformat(),
-            "ended_at": None,
-            "meta": {},
-            "events": [],
+            "open_sessions": open_sessions,
+            "max_open": self.max_open,
+            "evicted_sessions": self.evicted_sessions,
+            "tail_events": tail_events,
+            "tail_bytes": tail_bytes,
+            # Eventos retenidos en memoria: colas + lo pendiente de escribir.
+            "resident_bytes": tail_bytes + writer["pending_bytes"],
+            "encode_errors": self.encode_errors,
+            "writer": writer,
+            "archive": self._archive().status(),
         }
 
-    def _save(self, session_id: str, data: Dict[str, Any]) -> None:
-        self._ensure_dir()
-        path = _session_path(session_id)
-        with open(path, "w", encoding="utf-8") as f:
-            if _log_json_pretty():
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            else:
-                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
-
     def start(self, meta: Optional[Dict[str, Any]] = None) -> str:
         session_id = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         with self._lock:
             existing = self._open.get(session_id)
-            if existing is None and os.path.exists(_session_path(session_id)):
-                existing = self._load(session_id)
+            if existing is None and self._exists(session_id):
+                existing = self._load_header(session_id)
             if existing and not existing.get("ended_at"):
                 if meta:
                     existing["meta"] = _merge_session_meta(
                         existing.get("meta") or {},
                         meta,
                     )
-                self._open[session_id] = existing
                 self._latest_session_id = session_id
-                self._save(session_id, existing)
+                self._keep(session_id, existing)
+                self._save_header(session_id, existing)
                 self._prune_old_sessions()
                 return session_id
-        payload = {
-            "id": session_id,
-            "started_at": datetime.now(timezone.utc).isoformat(),
-            "ended_at": None,
-            "meta": meta or {},
-            "events": [],
-        }
-        with self._lock:
-            self._open[session_id] = payload
+            # Sesión nueva (o una terminada en este mismo segundo): empieza vacía.
+            if existing is not None:
+                self._forget(session_id)
+                self._remove_files(session_id)
+            header = _new_header(session_id, meta)
             self._latest_session_id = session_id
-            self._save(session_id, payload)
+            self._keep(session_id, header, fresh=True)
+            self._save_header(session_id, header)
             self._prune_old_sessions()
         return session_id
 
@@ -138,16 +943,17 @@ class SessionLogStore:
             session_id = self._latest_session_id
             if session_id:
                 if session_id not in self._open:
-                    loaded = self._load(session_id)
+                    loaded = self._load_header(session_id)
                     if loaded.get("ended_at"):
                         session_id = None
                     else:
-                        self._open[session_id] = loaded
+                        self._keep(session_id, loaded)
             if session_id and session_id in self._open:
+                self._keep(session_id, self._open[session_id])
                 if meta:
                     cur = self._open[session_id].setdefault("meta", {})
                     self._open[session_id]["meta"] = _merge_session_meta(cur, meta)
-                    self._save(session_id, self._open[session_id])
+                    self._save_header(session_id, self._open[session_id])
                 return session_id
         return self.start(meta or {"source": "v4_session"})
 
@@ -168,23 +974,23 @@ class SessionLogStore:
         if not events:
             return True
         with self._lock:
-            data = self._open.get(session_id) or self._load(session_id)
-            data.setdefault("events", []).extend(events)
-            self._open[session_id] = data
-            self._save(session_id, data)
+            header = self._open.get(session_id) or self._load_header(session_id)
+            self._keep(session_id, header)
+            saved = self._append_events(session_id, header, events)
             self._note_v4_activity(events)
-        return True
+        return saved
 
     def adopt_session(self, session_id: str, meta: Optional[Dict[str, Any]] = None) -> bool:
         if not session_id or not _SESSION_ID_RE.match(session_id):
             return False
         with self._lock:
-            data = self._load(session_id)
+            header = self._load_header(session_id)
             if meta:
-                data["meta"] = _merge_session_meta(data.get("meta") or {}, meta)
-            self._open[session_id] = data
+                header["meta"] = _merge_session_meta(header.get("meta") or {}, meta)
+            self._forget(session_id)  # releída de disco: la cola anterior ya no vale
             self._latest_session_id = session_id
-            self._save(session_id, data)
+            self._keep(session_id, header)
+            self._save_header(session_id, header)
         return True
 
     def ensure_active_session(self, meta: Optional[Dict[str, Any]] = None) -> str:
@@ -192,12 +998,11 @@ class SessionLogStore:
         with self._lock:
             session_id = self._latest_session_id
             if session_id:
-                if session_id not in self._open:
-                    self._open[session_id] = self._load(session_id)
+                self._keep(session_id, self._open.get(session_id) or self._load_header(session_id))
                 if meta:
                     cur = self._open[session_id].setdefault("meta", {})
                     self._open[session_id]["meta"] = _merge_session_meta(cur, meta)
-                    self._save(session_id, self._open[session_id])
+                    self._save_header(session_id, self._open[session_id])
                 return session_id
         return self.start(meta or {"source": "backend_auto"})
 
@@ -205,10 +1010,10 @@ class SessionLogStore:
         if not session_id or not _SESSION_ID_RE.match(session_id) or not patch:
             return False
         with self._lock:
-            data = self._open.get(session_id) or self._load(session_id)
-            data["meta"] = _merge_session_meta(data.get("meta") or {}, patch)
-            self._open[session_id] = data
-            self._save(session_id, data)
+            header = self._open.get(session_id) or self._load_header(session_id)
+            header["meta"] = _merge_session_meta(header.get("meta") or {}, patch)
+            self._keep(session_id, header)
+            self._save_header(session_id, header)
         return True
 
     def append_active(self, events: List[Dict[str, Any]]) -> bool:
@@ -220,57 +1025,181 @@ class SessionLogStore:
             if not session_id:
                 return False
             if session_id not in self._open:
-                loaded = self._load(session_id)
-                if not loaded.get("events") and not os.path.exists(_session_path(session_id)):
+                if not self._exists(session_id):
                     return False
-                self._open[session_id] = loaded
-            data = self._open[session_id]
-            data.setdefault("events", []).extend(events)
-            self._save(session_id, data)
-        return True
+            self._keep(session_id, self._open.get(session_id) or self._load_header(session_id))
+            return self._append_events(session_id, self._open[session_id], events)
 
     def end(self, session_id: str, summary: Optional[Dict[str, Any]] = None) -> bool:
         if not session_id or not _SESSION_ID_RE.match(session_id):
             return False
         with self._lock:
-            data = self._open.pop(session_id, None) or self._load(session_id)
-            data["ended_at"] = datetime.now(timezone.utc).isoformat()
+            header = self._open.get(session_id) or self._load_header(session_id)
+            self._forget(session_id)
+            header["ended_at"] = datetime.now(timezone.utc).isoformat()
             if summary:
-                data["summary"] = summary
-            self._save(session_id, data)
+                header["summary"] = summary
+            self._save_header(session_id, header)
+            # El escritor la archivará: deja de contar como viva.
+            self._on_disk.discard(session_id)
             if self._latest_session_id == session_id:
                 self._latest_session_id = None
             self._prune_old_sessions()
         return True
 
-    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+    def get(self, session_id: str, tail: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Sesión completa; con `tail`, solo los últimos N eventos (de memoria si están)."""
         if not session_id or not _SESSION_ID_RE.match(session_id):
             return None
-        with self._lock:
-            if session_id in self._open:
-                return dict(self._open[session_id])
-            path = _session_path(session_id)
-            if not os.path.exists(path):
-                return None
-            with open(path, encoding="utf-8") as f:
-                return json.load(f)
+        if tail is not None:
+            tail = max(0, tail)
+            with self._lock:
+                header = self._open.get(session_id)
+                recent = self._tails.get(session_id)
+                if header is not None and recent is not None and (
+                    recent.complete or len(recent.lines) >= tail
+                ):
+                    lines = list(recent.lines)[-tail:] if tail else []
+                    return {**header, "events": [json.loads(line) for line in lines]}
+        self.flush()
+        header = self._header_for_read(session_id)
+        if header is None:
+            return None
+        match = _event_matcher()
+        _, lines = self._event_lines(session_id, 0)
+        events = [event for event in (match(line) for _, line in lines) if event is not None]
+        if tail is not None:
+            events = events[-tail:] if tail else []
+        return {**header, "events": events}
+
+    def page(
+        self,
+        session_id: str,
+        after: int = 0,
+        limit: int = PAGE_LIMIT,
+        types: Optional[Iterable[str]] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Página de eventos desde el cursor `after` (nº de evento). `next` es el
+        cursor de la página siguiente; has_more=False cuando se llegó al final
+        (en una sesión en curso se puede volver a pedir desde `next`).
+        """
+        if not session_id or not _SESSION_ID_RE.match(session_id):
+            return None
+        after = max(0, after)
+        limit = max(1, min(limit, MAX_PAGE_LIMIT))
+        self.flush()
+        header = self._header_for_read(session_id)
+        if header is None:
+            return None
+        match = _event_matcher(types, since, until)
+        events: List[Any] = []
+        cursor = after
+        has_more = False
+        total, lines = self._event_lines(session_id, after)
+        for ordinal, line in lines:
+            if len(events) >= limit:
+                has_more = True
+                break
+            cursor = ordinal + 1
+            event = match(line)
+            if event is not None:
+                events.append(event)
+        return {
+            **header,
+            "events": events,
+            "event_count": total,
+            "after": after,
+            "next": cursor,
+            "has_more": has_more,
+        }
+
+    def export(
+        self,
+        session_id: str,
+        types: Optional[Iterable[str]] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> Optional[Iterator[bytes]]:
+        """
+        NDJSON por trozos: primero {"session": cabecera}, después un evento por
+        línea. Sin filtros se copian los bytes del .jsonl tal cual.
+        """
+        if not session_id or not _SESSION_ID_RE.match(session_id):
+            return None
+        self.flush()
+        header = self._header_for_read(session_id)
+        if header is None:
+            return None
+        filtering = bool(types) or since is not None or until is not None
+        match = _event_matcher(types, since, until)
+
+        def chunks() -> Iterator[bytes]:
+            if not filtering and not self._is_live(session_id):
+                # El archivo ya es este NDJSON: se descomprime sin decodificar.
+                yield from self._archive().iter_ndjson(session_id)
+                return
+            yield _event_line({"session": header}).encode("utf-8")
+            _, lines = self._event_lines(session_id, 0)
+            buffer: List[bytes] = []
+            size = 0
+            for _, line in lines:
+                if filtering and match(line) is None:
+                    continue
+                buffer.append(line)
+                size += len(line)
+                if size >= EXPORT_CHUNK_BYTES:
+                    yield b"".join(buffer)
+                    buffer, size = [], 0
+            if buffer:
+                yield b"".join(buffer)
+
+        return chunks()
 
     def list_sessions(self) -> List[Dict[str, Any]]:
+        self.flush()
+        # Archivadas: solo el índice del archivo, sin abrir ninguna sesión.
+        archived = {entry["header"].get("id"): entry for entry in self._archive().entries()}
         result: List[Dict[str, Any]] = []
-        for path in self._list_session_files()[: self.max_files]:
+        for session_id in _session_ids_on_disk():
             try:
-                with open(path, encoding="utf-8") as f:
-                    data = json.load(f)
-                result.append({
-                    "id": data.get("id", os.path.basename(path)),
-                    "started_at": data.get("started_at"),
-                    "ended_at": data.get("ended_at"),
-                    "event_count": len(data.get("events") or []),
-                    "meta": data.get("meta") or {},
-                })
+                if os.path.exists(_meta_path(session_id)):
+                    header = self._load_header(session_id)
+                    event_count = (
+                        self._count_events(session_id)
+                        if os.path.exists(_events_path(session_id)) else 0
+                    )
+                else:
+                    legacy = _read_legacy(session_id)
+                    if legacy is None:
+                        continue
+                    header = legacy
+                    event_count = len(legacy.get("events") or [])
+                # Eventos tardíos de una sesión archivada: cuentan los dos tramos.
+                entry = archived.get(session_id)
+                if entry is not None:
+                    event_count += entry["event_count"]
+                result.append(self._summary(header, session_id, event_count, archived=entry is not None))
             except (json.JSONDecodeError, OSError):
                 continue
+        listed = {item["id"] for item in result}
+        for sid, entry in archived.items():
+            if sid not in listed:
+                result.append(self._summary(entry["header"], sid, entry["event_count"], archived=True))
         return result
 
+    @staticmethod
+    def _summary(header: Dict[str, Any], session_id: Any, event_count: int, archived: bool) -> Dict[str, Any]:
+        return {
+            "id": header.get("id", session_id),
+            "started_at": header.get("started_at"),
+            "ended_at": header.get("ended_at"),
+            "event_count": event_count,
+            "meta": header.get("meta") or {},
+            "archived": archived,
+        }
+
 
 _store = SessionLogStore()
@@ -0,0 +1,250 @@
+"""
+shm_transport.py — Transporte opcional de telemetría por ring buffer en memoria mapeada.
+
+Alternativa a GetData.txt: el escritor (plugin o ShmRingWriter en tests) publica
+cada línea en un slot del anillo con número de secuencia; el backend la lee con
+mmap sin reabrir ficheros. Las lecturas a medias se detectan comparando la
+secuencia al principio y al final del slot (seqlock), no por mtime.
+
+Layout (little-endian):
+  cabecera 32 B: magic(8) version(u32) slot_count(u32) slot_size(u32) pad(u32) write_seq(u64)
+  slot: seq_start(u64) length(u32) pad(u32) payload(slot_size - 24) seq_end(u64)
+"""
+from __future__ import annotations
+
+import asyncio
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from core.getdata_watcher import MISSING_FILE_RETRY_S, AdaptiveCadence, RawFrame, put_latest
+
+MAGIC = b"NXSHM01\0"
+VERSION = 1
+DEFAULT_SLOT_COUNT = 8
+DEFAULT_SLOT_SIZE = 8192
+MAX_READ_RETRIES = 3
+
+_HEADER = struct.Struct("<8sIIIIQ")
+_SLOT_HEAD = struct.Struct("<QII")
+_SEQ = struct.Struct("<Q")
+_WRITE_SEQ_OFFSET = _HEADER.size - _SEQ.size
+
+
+def _slot_offset(index: int, slot_size: int) -> int:
+    return _HEADER.size + index * slot_size
+
+
+def _file_identity(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size
+
+
+class ShmRingWriter:
+    """Escritor del anillo (stand-in del plugin Lua para tests y replay)."""
+
+    def __init__(
+        self,
+        path: str,
+        slot_count: int = DEFAULT_SLOT_COUNT,
+        slot_size: int = DEFAULT_SLOT_SIZE,
+    ):
+        if slot_size <= _SLOT_HEAD.size + _SEQ.size:
+            raise ValueError("slot_size demasiado pequeño")
+        self.path = path
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        total = _HEADER.size + slot_count * slot_size
+        with open(path, "wb") as f:
+            f.truncate(total)
+        self._file = open(path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), total)
+        _HEADER.pack_into(self._map, 0, MAGIC, VERSION, slot_count, slot_size, 0, 0)
+        self.seq = 0
+
+    @property
+    def payload_capacity(self) -> int:
+        return self.slot_size - _SLOT_HEAD.size - _SEQ.size
+
+    def write(self, line: str) -> int:
+        payload = line.encode("utf-8")
+        if len(payload) > self.payload_capacity:
+            raise ValueError(f"frame de {len(payload)} B excede el slot ({self.payload_capacity} B)")
+        seq = self.seq + 1
+        base = _slot_offset(seq % self.slot_count, self.slot_size)
+        _SLOT_HEAD.pack_into(self._map, base, seq, len(payload), 0)
+        start = base + _SLOT_HEAD.size
+        self._map[start:start + len(payload)] = payload
+        _SEQ.pack_into(self._map, base + self.slot_size - _SEQ.size, seq)
+        _SEQ.pack_into(self._map, _WRITE_SEQ_OFFSET, seq)
+        self.seq = seq
+        return seq
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+
+class ShmRingReader:
+    """Lector del último frame publicado; cuenta lecturas rotas y frames saltados."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise
+        if len(self._map) < _HEADER.size:
+            self.close()
+            raise ValueError("fichero shm truncado")
+        magic, version, slot_count, slot_size, _pad, _seq = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or slot_count <= 0:
+            self.close()
+            raise ValueError("cabecera shm desconocida")
+        if len(self._map) < _HEADER.size + slot_count * slot_size:
+            self.close()
+            raise ValueError("fichero shm truncado")
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.last_seq = 0
+        self.torn_reads = 0
+        self.skipped_frames = 0
+
+    def write_seq(self) -> int:
+        return _SEQ.unpack_from(self._map, _WRITE_SEQ_OFFSET)[0]
+
+    def _read_slot(self, seq: int) -> Optional[str]:
+        base = _slot_offset(seq % self.slot_count, self.slot_size)
+        # Orden inverso al escritor: seq_end → payload → seq_start.
+        seq_end = _SEQ.unpack_from(self._map, base + self.slot_size - _SEQ.size)[0]
+        _seq, length, _pad = _SLOT_HEAD.unpack_from(self._map, base)
+        start = base + _SLOT_HEAD.size
+        payload = self._map[start:start + min(length, self.slot_size - _SLOT_HEAD.size - _SEQ.size)]
+        seq_start = _SEQ.unpack_from(self._map, base)[0]
+        if seq_end != seq or seq_start != seq:
+            return None
+        return payload.decode("utf-8", errors="replace")
+
+    def read_latest(self) -> Optional[Tuple[int, str]]:
+        """(seq, línea) si hay un frame nuevo y consistente; None si no hay nada nuevo."""
+        for _ in range(MAX_READ_RETRIES):
+            seq = self.write_seq()
+            if seq == 0 or seq == self.last_seq:
+                return None
+            line = self._read_slot(seq)
+            if line is None:
+                self.torn_reads += 1
+                continue
+            if self.last_seq and seq > self.last_seq + 1:
+                self.skipped_frames += seq - self.last_seq - 1
+            self.last_seq = seq
+            return seq, line
+        return None
+
+    def close(self) -> None:
+        try:
+            self._map.close()
+        except (AttributeError, ValueError):
+            pass
+        self._file.close()
+
+
+class ShmRingWatcher:
+    """Mismo contrato que GetDataWatcher, leyendo del anillo shm."""
+
+    def __init__(
+        self,
+        resolve_path: Callable[[], Optional[str]],
+        queue: "asyncio.Queue[RawFrame]",
+        loop: asyncio.AbstractEventLoop,
+        cadence: Optional[AdaptiveCadence] = None,
+        on_missing: Optional[Callable[[], None]] = None,
+        on_frame: Optional[Callable[[RawFrame], None]] = None,
+    ):
+        self._resolve_path = resolve_path
+        self._on_missing = on_missing
+        self._on_frame = on_frame
+        self._queue = queue
+        self._loop = loop
+        self.cadence = cadence or AdaptiveCadence()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reader: Optional[ShmRingReader] = None
+        self.source_name: Optional[str] = None
+        self.frames_emitted = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="shm-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def status(self) -> Dict[str, Any]:
+        reader = self.reader
+        return {
+            "source": self.source_name,
+            "frames_read": self.frames_emitted,
+            "validation": {
+                "torn_reads": reader.torn_reads if reader else 0,
+                "skipped_frames": reader.skipped_frames if reader else 0,
+                "last_seq": reader.last_seq if reader else 0,
+            },
+            "cadence": self.cadence.status(),
+        }
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            path = self._resolve_path()
+            if not path or not os.path.exists(path):
+                self.source_name = None
+                self._stop.wait(MISSING_FILE_RETRY_S)
+                continue
+            try:
+                reader = ShmRingReader(path)
+            except (OSError, ValueError):
+                if self._on_missing is not None:
+                    self._on_missing()
+                self._stop.wait(MISSING_FILE_RETRY_S)
+                continue
+            self.reader = reader
+            self.source_name = "shm"
+            identity = _file_identity(path)
+            idle_since = time.monotonic()
+            try:
+                while not self._stop.is_set():
+                    frame = reader.read_latest()
+                    if frame is not None:
+                        self.cadence.note_frame()
+                        idle_since = time.monotonic()
+                        raw = RawFrame(time.time(), frame[1])
+                        if self._on_frame is not None:
+                            self._on_frame(raw)
+                        try:
+                            self._loop.call_soon_threadsafe(put_latest, self._queue, raw)
+                        except RuntimeError:
+                            return
+                        self.frames_emitted += 1
+                    elif time.monotonic() - idle_since >= MISSING_FILE_RETRY_S:
+                        # Sin frames: ¿el escritor recreó o borró el fichero?
+                        if _file_identity(path) != identity:
+                            if self._on_missing is not None:
+                                self._on_missing()
+                            break
+                        idle_since = time.monotonic()
+                    self._stop.wait(self.cadence.next_interval())
+            finally:
+                reader.close()
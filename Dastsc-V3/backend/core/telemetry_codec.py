@@ -0,0 +1,143 @@
+"""
+telemetry_codec.py — Serialización de mensajes WS: se codifica una vez por broadcast.
+
+Con orjson instalado (opcional, `pip install orjson`) se usa su encoder; si no,
+json.dumps compacto de la stdlib. El resultado es texto: los clientes hacen
+JSON.parse(event.data) sobre frames de texto.
+
+Codificación binaria opcional (`pip install msgpack`), por conexión con
+`/ws/telemetry?encoding=msgpack` o el subprotocolo `nexus.msgpack`: solo
+TELEMETRY / TELEMETRY_DELTA viajan como frames binarios MessagePack, con las
+claves sustituidas por ids numéricos de FieldTable. La tabla llega en INIT
+(`field_ids`) y las claves nuevas en un FIELD_IDS previo al frame que las usa.
+El resto de mensajes (INIT, ACK, PROFILE_CHANGED, el keyframe de RESYNC…)
+siguen siendo texto JSON con claves de texto.
+
+NaN/Inf no se sanean aquí: los valores son finitos al entrar (parser,
+RailDriver, perfiles al cargar, eventos de sesión saneados). Si aun así se
+cuela uno, el encoder stdlib lo rechaza (ValueError, allow_nan=False) y orjson
+lo emite como null; en ningún caso sale JSON que el navegador no pueda parsear,
+pero el valor solo es idéntico con ambos encoders si llegó finito.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# ── Comprobación de dependencias opcionales ───────────────────────────────────
+try:
+    import orjson as _orjson
+    ORJSON_OK = True
+except ImportError:
+    ORJSON_OK = False
+
+try:
+    import msgpack as _msgpack
+    MSGPACK_OK = True
+except ImportError:
+    MSGPACK_OK = False
+
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+MSGPACK_SUBPROTOCOL = "nexus.msgpack"
+
+# Ids fijos del sobre; las claves de telemetría se numeran detrás por orden de aparición.
+BASE_FIELDS = ("type", "seq", "timestamp", "gameLinked", "keyframe", "base", "changes")
+# Tope de la tabla: más allá, la clave viaja como texto (MessagePack admite claves mixtas).
+MAX_FIELD_IDS = 4096
+
+
+def _encode_stdlib(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, allow_nan=False)
+
+
+def encode_json(obj: Any) -> str:
+    """JSON compacto; orjson si está disponible (fallback a stdlib si rechaza el tipo).
+
+    Lanza ValueError con NaN/Inf en la ruta stdlib.
+    """
+    if ORJSON_OK:
+        try:
+            return _orjson.dumps(obj).decode("utf-8")
+        except TypeError:
+            pass
+    return _encode_stdlib(obj)
+
+
+def encoder_name() -> str:
+    return "orjson" if ORJSON_OK else "json"
+
+
+def normalize_encoding(value: Any) -> Optional[str]:
+    """'json' / 'msgpack' (sin distinguir mayúsculas), None si no es válido."""
+    if not isinstance(value, str):
+        return None
+    value = value.strip().lower()
+    return value if value in (ENCODING_JSON, ENCODING_MSGPACK) else None
+
+
+def negotiate_encoding(
+    requested: Optional[str],
+    subprotocols: Sequence[str] = (),
+) -> Tuple[str, Optional[str]]:
+    """(codificación, subprotocolo a aceptar). Sin msgpack instalado se queda en JSON."""
+    via_subprotocol = MSGPACK_SUBPROTOCOL in subprotocols
+    wants_msgpack = normalize_encoding(requested) == ENCODING_MSGPACK or via_subprotocol
+    if not wants_msgpack or not MSGPACK_OK:
+        return ENCODING_JSON, None
+    return ENCODING_MSGPACK, MSGPACK_SUBPROTOCOL if via_subprotocol else None
+
+
+def encode_msgpack(obj: Any) -> bytes:
+    return _msgpack.packb(obj, use_bin_type=True)
+
+
+class FieldTable:
+    """Ids numéricos estables de las claves TELEMETRY: solo se añaden, nunca cambian."""
+
+    def __init__(self, base: Sequence[str] = BASE_FIELDS, max_ids: int = MAX_FIELD_IDS):
+        self.max_ids = max_ids
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        for name in base:
+            self._id(name)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _id(self, key: str) -> Any:
+        field_id = self._ids.get(key)
+        if field_id is None:
+            if len(self._names) >= self.max_ids:
+                return key
+            field_id = len(self._names)
+            self._ids[key] = field_id
+            self._names.append(key)
+        return field_id
+
+    def ids(self) -> Dict[str, int]:
+        return dict(self._ids)
+
+    def ids_since(self, start: int) -> Dict[str, int]:
+        """Claves añadidas desde que la tabla tenía `start` entradas."""
+        return {name: start + i for i, name in enumerate(self._names[start:])}
+
+    def pack(self, message: Dict[str, Any]) -> Dict[Any, Any]:
+        """Mensaje con claves → ids (también dentro de `changes` de un parche)."""
+        packed: Dict[Any, Any] = {}
+        for key, value in message.items():
+            if key == "changes" and isinstance(value, dict):
+                value = self.pack(value)
+            packed[self._id(key)] = value
+        return packed
+
+    def unpack(self, packed: Dict[Any, Any]) -> Dict[str, Any]:
+        """Inverso de pack (para tests y herramientas)."""
+        names = self._names
+        message: Dict[str, Any] = {}
+        for key, value in packed.items():
+            name = names[key] if isinstance(key, int) else key
+            if name == "changes" and isinstance(value, dict):
+                value = self.unpack(value)
+            message[name] = value
+        return message
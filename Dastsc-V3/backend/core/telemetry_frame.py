@@ -0,0 +1,250 @@
+"""
+telemetry_frame.py — Frame de telemetría tipado: alias y unidades resueltos una vez.
+
+El parser entrega el dict crudo de GetData.txt; TelemetryFrame resuelve aquí las
+claves que consultan varios consumidores (velocidad en m/s, SpeedoType, mando
+combinado, reverser, cabina, puertas) para que nadie vuelva a hacer float(...)
+sobre el dict en el camino por frame.
+
+Cada frame lleva además su delta de ingesta (`changed`, claves cuyo token cambió
+respecto al frame anterior) y las claves escritas después por el
+enriquecimiento (`data.written`). FrameSubscription deja que un consumidor se
+salte el trabajo si no se movió nada de lo que usa; DeltaTracker entrega a la
+capa de publicación solo lo que cambió desde el último frame publicado.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Set
+
+from core.parser import TelemetryRecord
+from core.station_distance import speed_ms_from_telemetry
+
+SPEEDO_MPH = 1
+SPEEDO_KMH = 2
+
+
+def _as_float(value: Any, default: float) -> float:
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _float_from_keys(data: Dict[str, Any], *keys: str, default: float = 0.0) -> float:
+    """Primer alias presente y numérico (p. ej. CombinedControl / Combined)."""
+    for key in keys:
+        if key in data:
+            try:
+                return float(data[key])
+            except (TypeError, ValueError):
+                pass
+    return default
+
+
+def _as_int(value: Any, default: int) -> int:
+    try:
+        return int(float(value or default))
+    except (TypeError, ValueError):
+        return default
+
+
+class TelemetryData(dict):
+    """dict del frame que recuerda qué claves se escribieron tras la ingesta."""
+
+    __slots__ = ("written",)
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.written: Set[str] = set()
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.written.add(key)
+        dict.__setitem__(self, key, value)
+
+
+class TelemetryFrame:
+    """Un frame GetData: dict mutable para publicar + campos resueltos."""
+
+    __slots__ = (
+        "data",
+        "changed",
+        "delta",
+        "received_at",
+        "speedo_type",
+        "speed_ms",
+        "combined_control",
+        "reversal",
+        "has_reversal",
+        "active_cab",
+        "door_l",
+        "door_r",
+        "lua_station_raw",
+        "loco_name",
+    )
+
+    def __init__(
+        self,
+        data: Dict[str, Any],
+        received_at: float = 0.0,
+        changed: Optional[FrozenSet[str]] = None,
+    ):
+        self.data = data if isinstance(data, TelemetryData) else TelemetryData(data)
+        # None = frame completo (primer frame, layout nuevo o sin parser incremental).
+        self.changed = changed
+        # Lo rellena la etapa publish (DeltaTracker); None = enviar todo.
+        self.delta: Optional[Dict[str, Any]] = None
+        self.received_at = received_at
+        self.speedo_type = _as_int(data.get("SpeedoType"), SPEEDO_MPH)
+        try:
+            self.speed_ms = speed_ms_from_telemetry(data)
+        except (TypeError, ValueError):
+            self.speed_ms = 0.0
+        self.combined_control = _float_from_keys(data, "CombinedControl", "Combined")
+        self.has_reversal = "Reversal" in data or "Reverser" in data
+        self.reversal = _float_from_keys(data, "Reversal", "Reverser")
+        self.active_cab = _as_int(data.get("ActiveCab"), 1)
+        self.door_l = _as_float(data.get("DoorL") or 0.0, 0.0)
+        self.door_r = _as_float(data.get("DoorR") or 0.0, 0.0)
+        self.lua_station_raw = _as_float(data.get("StationDistance") or -1, -1.0)
+        self.loco_name = str(data.get("LocoName") or "")
+
+    @classmethod
+    def from_record(cls, record: TelemetryRecord, received_at: float = 0.0) -> "TelemetryFrame":
+        changed: Optional[FrozenSet[str]] = None
+        if len(record.changed) < len(record.keys):
+            changed = frozenset(record.changed_keys())
+        return cls(TelemetryData(zip(record.keys, record.values)), received_at, changed)
+
+    @classmethod
+    def coalesce(cls, older: Any, newer: Any) -> Any:
+        """Merge para LatestQueue: el frame superviviente hereda el delta del descartado.
+
+        No muta `newer`: el mismo objeto está en las colas de otras ramas
+        (publish, session_log, profile_sync) y cada una coalesce por su cuenta.
+        """
+        if not (isinstance(older, cls) and isinstance(newer, cls)):
+            return newer
+        if newer.changed is None:
+            return newer
+        if older.changed is None:
+            return newer.with_changed(None)
+        if older.changed <= newer.changed:
+            return newer
+        return newer.with_changed(newer.changed | older.changed)
+
+    def with_changed(self, changed: Optional[FrozenSet[str]]) -> "TelemetryFrame":
+        """Copia superficial (mismo `data`) con otro conjunto de claves cambiadas."""
+        clone = TelemetryFrame.__new__(TelemetryFrame)
+        for name in TelemetryFrame.__slots__:
+            setattr(clone, name, getattr(self, name))
+        clone.changed = changed
+        return clone
+
+    def touches(self, keys: FrozenSet[str]) -> bool:
+        """¿Cambió en la ingesta alguna de `keys`? (siempre True en frames completos)."""
+        return self.changed is None or not self.changed.isdisjoint(keys)
+
+    @property
+    def speed_unit(self) -> str:
+        return "MPH" if self.speedo_type == SPEEDO_MPH else "km/h"
+
+    def set_active_cab(self, cab: int) -> None:
+        self.active_cab = cab
+        self.data["ActiveCab"] = cab
+
+    def set_loco_name(self, name: str) -> None:
+        self.loco_name = name
+        self.data["LocoName"] = name
+
+    def get(self, key: str, default: Optional[Any] = None) -> Any:
+        return self.data.get(key, default)
+
+
+class FrameSubscription:
+    """
+    Consumidor suscrito a un conjunto de claves: `wants(frame)` es False si
+    ninguna cambió (ni en la ingesta ni al re-escribirse con otro valor).
+    `refresh_s` fuerza una ejecución periódica aunque no haya cambios.
+    """
+
+    def __init__(self, name: str, keys: Iterable[str], refresh_s: Optional[float] = None):
+        self.name = name
+        self.keys: FrozenSet[str] = frozenset(keys)
+        self.refresh_s = refresh_s
+        self.runs = 0
+        self.skipped = 0
+        self._seen: Dict[str, Any] = {}
+        self._last_run_at: Optional[float] = None
+        # due() dio True y aún no hubo ran(): el cambio sigue pendiente.
+        self._pending = False
+
+    def wants(self, frame: TelemetryFrame) -> bool:
+        if self.due(frame):
+            self.ran(frame)
+            return True
+        return False
+
+    def due(self, frame: TelemetryFrame) -> bool:
+        """Como wants() pero sin dar el cambio por consumido (ver ran())."""
+        if self._pending or self._should_run(frame):
+            self._pending = True
+            return True
+        self.skipped += 1
+        return False
+
+    def ran(self, frame: TelemetryFrame) -> None:
+        """El consumidor sí se ejecutó con este frame."""
+        self._pending = False
+        self.runs += 1
+        self._last_run_at = frame.received_at
+        data = frame.data
+        self._seen = {key: data.get(key) for key in self.keys}
+
+    def _should_run(self, frame: TelemetryFrame) -> bool:
+        if self._last_run_at is None or frame.touches(self.keys):
+            return True
+        if self.refresh_s is not None and frame.received_at - self._last_run_at >= self.refresh_s:
+            return True
+        data = frame.data
+        seen = self._seen
+        for key in self.keys.intersection(data.written):
+            if data.get(key) != seen.get(key):
+                return True
+        return False
+
+    def status(self) -> Dict[str, Any]:
+        return {"keys": sorted(self.keys), "runs": self.runs, "skipped": self.skipped}
+
+
+class DeltaTracker:
+    """Claves que cambiaron desde el último frame publicado (ingesta + derivadas)."""
+
+    def __init__(self) -> None:
+        self._written: Dict[str, Any] = {}
+        self._published = False
+
+    def reset(self) -> None:
+        self._written = {}
+        self._published = False
+
+    def delta(self, frame: TelemetryFrame) -> Optional[Dict[str, Any]]:
+        """Dict parcial a publicar, o None si hay que enviar el frame completo."""
+        data = frame.data
+        previous = self._written
+        written = {key: data[key] for key in data.written if key in data}
+        self._written = written
+        if frame.changed is None or not self._published:
+            self._published = True
+            return None
+
+        delta = {key: data[key] for key in frame.changed if key in data and key not in written}
+        for key, value in written.items():
+            if key not in previous or previous[key] != value:
+                delta[key] = value
+        # Clave derivada que este frame ya no sobrescribe: vuelve al valor de ingesta.
+        for key in previous:
+            if key not in written and key in data:
+                delta[key] = data[key]
+        return delta
@@ -0,0 +1,193 @@
+"""
+ws_client.py — Escritor por conexión de /ws/telemetry con cola acotada.
+
+Cada WebSocket tiene una única corrutina escritora. TELEMETRY ocupa un solo
+hueco (el más reciente sustituye al pendiente); el resto de mensajes (ACK,
+PROFILE_CHANGED, HEARTBEAT…) van a una cola FIFO corta. Un cliente que no
+consume se mide (lag, frames descartados) y se expulsa:
+
+- un envío que tarda más de SEND_TIMEOUT_S,
+- MAX_DROPPED_STREAK frames seguidos sustituidos sin llegar a enviarse,
+- la cola de control llena.
+
+La memoria por cliente queda acotada por diseño, se porte como se porte.
+
+Con codificación msgpack, TELEMETRY llega como bytes y sale por send_bytes;
+lo demás sigue siendo texto.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, Union
+
+from core.telemetry_codec import ENCODING_JSON
+from core.ws_protocol import ALL_FIELDS, PROTOCOL_DELTA, ClientState, Subscription
+
+SEND_TIMEOUT_S = 5.0
+MAX_DROPPED_STREAK = 200  # ~2 s a 100 Hz sin completar un envío
+MAX_CONTROL_QUEUE = 64
+CLOSE_CODE_SLOW_CONSUMER = 1013  # Try Again Later
+
+_EWMA_ALPHA = 0.1
+
+Payload = Union[str, bytes]
+
+
+class ClientConnection:
+    """Protocolo + cola de salida + escritor de un WebSocket."""
+
+    def __init__(
+        self,
+        websocket: Any,
+        protocol: Optional[str] = None,
+        *,
+        encoding: str = ENCODING_JSON,
+        send_timeout_s: float = SEND_TIMEOUT_S,
+        max_dropped_streak: int = MAX_DROPPED_STREAK,
+        max_control_queue: int = MAX_CONTROL_QUEUE,
+        on_evict: Optional[Callable[["ClientConnection", str], None]] = None,
+    ):
+        self.websocket = websocket
+        self.state = ClientState(protocol)
+        self.subscription: Subscription = ALL_FIELDS
+        self.encoding = encoding
+        # Entradas de FieldTable que ya conoce el cliente (INIT + FIELD_IDS).
+        self.known_fields = 0
+        # Último seq TELEMETRY entregado a la cola: base de su próximo parche.
+        self.last_seq = 0
+        self.send_timeout_s = send_timeout_s
+        self.max_dropped_streak = max_dropped_streak
+        self.max_control_queue = max_control_queue
+        self.on_evict = on_evict
+        self._control: Deque[Tuple[str, float]] = deque()
+        self._telemetry: Optional[Tuple[Payload, float]] = None
+        self._wake = asyncio.Event()
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.connected_at = time.time()
+        self.sent = 0
+        self.dropped = 0
+        self.dropped_streak = 0
+        self.lag_ms = 0.0
+        self.avg_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.evicted: Optional[str] = None
+
+    # ── Productor (broadcast) ────────────────────────────────────────────────
+    def prepare_telemetry(self) -> None:
+        """Antes de elegir keyframe/parche: si se va a pisar un frame, el parche rompería la cadena."""
+        if self._telemetry is not None and self.state.protocol == PROTOCOL_DELTA:
+            self.state.needs_keyframe = True
+
+    def subscribe(self, subscription: Subscription) -> None:
+        if subscription != self.subscription:
+            self.subscription = subscription
+            self.state.needs_keyframe = True
+
+    def offer_telemetry(self, payload: Payload) -> None:
+        if self.evicted:
+            return
+        if self._telemetry is not None:
+            self.dropped += 1
+            self.dropped_streak += 1
+            if self.dropped_streak >= self.max_dropped_streak:
+                self._evict("dropped_streak")
+                return
+        self._telemetry = (payload, time.monotonic())
+        self._wake.set()
+
+    def discard_telemetry(self) -> None:
+        """Descarta el TELEMETRY pendiente (p. ej. lo sustituye un keyframe de RESYNC)."""
+        self._telemetry = None
+
+    def offer(self, text: str) -> None:
+        if self.evicted:
+            return
+        if len(self._control) >= self.max_control_queue:
+            self._evict("control_queue_full")
+            return
+        self._control.append((text, time.monotonic()))
+        self._wake.set()
+
+    # ── Escritor ─────────────────────────────────────────────────────────────
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+
+    def _next(self) -> Optional[Tuple[Payload, float, bool]]:
+        if self._control:
+            text, queued_at = self._control.popleft()
+            return text, queued_at, False
+        if self._telemetry is not None:
+            (payload, queued_at), self._telemetry = self._telemetry, None
+            return payload, queued_at, True
+        return None
+
+    async def _run(self) -> None:
+        while not self.evicted:
+            await self._wake.wait()
+            self._wake.clear()
+            while not self.evicted:
+                item = self._next()
+                if item is None:
+                    break
+                payload, queued_at, is_telemetry = item
+                if isinstance(payload, bytes):
+                    send = self.websocket.send_bytes(payload)
+                else:
+                    send = self.websocket.send_text(payload)
+                try:
+                    await asyncio.wait_for(send, self.send_timeout_s)
+                except asyncio.TimeoutError:
+                    self._evict("send_timeout")
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    self._evict("send_error")
+                    return
+                self._record_lag((time.monotonic() - queued_at) * 1000.0)
+                if is_telemetry:
+                    self.dropped_streak = 0
+
+    def _record_lag(self, lag_ms: float) -> None:
+        self.sent += 1
+        self.lag_ms = lag_ms
+        if self.sent == 1:
+            self.avg_lag_ms = lag_ms
+        else:
+            self.avg_lag_ms += _EWMA_ALPHA * (lag_ms - self.avg_lag_ms)
+        if lag_ms > self.max_lag_ms:
+            self.max_lag_ms = lag_ms
+
+    def _evict(self, reason: str) -> None:
+        if self.evicted:
+            return
+        self.evicted = reason
+        self._control.clear()
+        self._telemetry = None
+        self._wake.set()
+        if self.on_evict is not None:
+            self.on_evict(self, reason)
+
+    def status(self) -> Dict[str, Any]:
+        client = getattr(self.websocket, "client", None)
+        return {
+            "client": f"{client.host}:{client.port}" if client else None,
+            **self.state.status(),
+            "encoding": self.encoding,
+            "subscription": self.subscription.to_dict(),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "pending": len(self._control) + (1 if self._telemetry else 0),
+            "lag_ms": round(self.lag_ms, 3),
+            "avg_lag_ms": round(self.avg_lag_ms, 3),
+            "max_lag_ms": round(self.max_lag_ms, 3),
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,227 @@
+"""
+ws_protocol.py — Protocolo TELEMETRY por conexión de /ws/telemetry.
+
+"full" (por defecto): cada frame es el dict completo, como siempre.
+"delta": keyframe periódico (TELEMETRY con `keyframe: true`) seguido de
+TELEMETRY_DELTA con solo las claves cambiadas. Todos los TELEMETRY llevan `seq`;
+un parche aplica sobre `base` (= seq - 1). Si el cliente detecta un hueco envía
+RESYNC y recibe un keyframe.
+
+Negociación: `/ws/telemetry?telemetry=delta` o el comando
+`{"type": "SET_PROTOCOL", "telemetry": "delta"}`.
+
+Suscripción: `{"type": "SUBSCRIBE", "fields": ["CurrentSpeed", ...], "max_hz": 10}`
+limita las claves y la frecuencia de TELEMETRY de esa conexión; las conexiones
+con la misma suscripción forman un grupo que se proyecta y codifica una vez.
+"""
+from __future__ import annotations
+
+import os
+from typing import AbstractSet, Any, Dict, FrozenSet, NamedTuple, Optional, Set
+
+PROTOCOL_FULL = "full"
+PROTOCOL_DELTA = "delta"
+PROTOCOLS = (PROTOCOL_FULL, PROTOCOL_DELTA)
+
+TELEMETRY = "TELEMETRY"
+TELEMETRY_DELTA = "TELEMETRY_DELTA"
+
+# Claves que acompañan a todo parche aunque no cambien.
+ALWAYS_SENT = ("timestamp", "gameLinked")
+# Sobre de un TELEMETRY proyectado: siempre presente sea cual sea la suscripción.
+ENVELOPE_KEYS = ("type", "seq") + ALWAYS_SENT
+MAX_SUBSCRIBE_FIELDS = 512
+# Grupo con suscripción sin cambios en sus claves: un frame igualmente cada N s.
+SUBSCRIPTION_KEEPALIVE_S = 1.0
+
+_KEYFRAME_ENV = "NEXUS_WS_KEYFRAME_EVERY"
+DEFAULT_KEYFRAME_EVERY = 100
+
+SEND_FULL = "full"
+SEND_KEYFRAME = "keyframe"
+SEND_PATCH = "patch"
+
+
+def keyframe_every_from_env() -> int:
+    """Frames entre keyframes para clientes delta (NEXUS_WS_KEYFRAME_EVERY)."""
+    raw = os.environ.get(_KEYFRAME_ENV, "").strip()
+    try:
+        return max(1, int(raw)) if raw else DEFAULT_KEYFRAME_EVERY
+    except ValueError:
+        return DEFAULT_KEYFRAME_EVERY
+
+
+def normalize_protocol(value: Any) -> Optional[str]:
+    """'delta' / 'full' (sin distinguir mayúsculas), None si no es válido."""
+    if not isinstance(value, str):
+        return None
+    value = value.strip().lower()
+    return value if value in PROTOCOLS else None
+
+
+def build_keyframe(message: Dict[str, Any]) -> Dict[str, Any]:
+    return {**message, "keyframe": True}
+
+
+def build_patch(
+    message: Dict[str, Any],
+    changed: AbstractSet[str],
+    base: Optional[int] = None,
+) -> Dict[str, Any]:
+    """TELEMETRY_DELTA desde el mensaje completo y las claves cambiadas desde `base`."""
+    seq = message["seq"]
+    changes = {key: message[key] for key in changed if key in message}
+    for key in ALWAYS_SENT:
+        if key in message:
+            changes[key] = message[key]
+    return {
+        "type": TELEMETRY_DELTA,
+        "seq": seq,
+        "base": seq - 1 if base is None else base,
+        "changes": changes,
+    }
+
+
+class Subscription(NamedTuple):
+    """Claves (None = todas) y frecuencia máxima (None = sin límite) de una conexión."""
+
+    fields: Optional[FrozenSet[str]] = None
+    max_hz: Optional[float] = None
+
+    @property
+    def min_interval_s(self) -> float:
+        return 1.0 / self.max_hz if self.max_hz else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "fields": sorted(self.fields) if self.fields is not None else None,
+            "max_hz": self.max_hz,
+        }
+
+
+ALL_FIELDS = Subscription()
+
+
+def parse_subscription(cmd: Dict[str, Any]) -> Subscription:
+    """SUBSCRIBE → Subscription; ValueError con el código de error para el ACK."""
+    raw_fields = cmd.get("fields")
+    fields: Optional[FrozenSet[str]] = None
+    if raw_fields is not None and raw_fields != "*":
+        if not isinstance(raw_fields, list) or len(raw_fields) > MAX_SUBSCRIBE_FIELDS:
+            raise ValueError("invalid_fields")
+        if not all(isinstance(f, str) and f for f in raw_fields):
+            raise ValueError("invalid_fields")
+        fields = frozenset(raw_fields)
+
+    raw_hz = cmd.get("max_hz")
+    max_hz: Optional[float] = None
+    if raw_hz is not None:
+        try:
+            max_hz = float(raw_hz)
+        except (TypeError, ValueError):
+            raise ValueError("invalid_max_hz") from None
+        if not max_hz > 0:
+            raise ValueError("invalid_max_hz")
+    return Subscription(fields, max_hz)
+
+
+def project(message: Dict[str, Any], fields: Optional[FrozenSet[str]]) -> Dict[str, Any]:
+    """Solo las claves suscritas más el sobre (type/seq/timestamp/gameLinked)."""
+    if fields is None:
+        return message
+    projected = {key: message[key] for key in ENVELOPE_KEYS if key in message}
+    for key in fields:
+        if key in message:
+            projected[key] = message[key]
+    return projected
+
+
+class SubscriptionGroup:
+    """
+    Conexiones con la misma Subscription: comparten muestreo y codificación.
+
+    Acumula las claves cambiadas de los frames saltados por el límite de
+    frecuencia para que el siguiente parche las incluya.
+    """
+
+    __slots__ = ("subscription", "next_due", "last_sent_at", "changed", "full")
+
+    def __init__(self, subscription: Subscription):
+        self.subscription = subscription
+        self.next_due = 0.0
+        self.last_sent_at = 0.0
+        self.changed: Set[str] = set()
+        self.full = True
+
+    def note_frame(self, delta: Optional[AbstractSet[str]]) -> None:
+        if delta is None:
+            self.full = True
+        else:
+            self.changed.update(delta)
+
+    def due(self, now: float) -> bool:
+        return now >= self.next_due
+
+    def relevant_changes(self) -> Optional[Set[str]]:
+        """Claves cambiadas dentro de la proyección; None = hace falta el frame completo."""
+        if self.full:
+            return None
+        fields = self.subscription.fields
+        return set(self.changed) if fields is None else self.changed & fields
+
+    def should_send(self, now: float, changes: Optional[Set[str]], needs_keyframe: bool) -> bool:
+        """Vencido el intervalo y con algo que contar (o keep-alive)."""
+        if not self.due(now):
+            return False
+        if changes is None or changes or needs_keyframe:
+            return True
+        return now - self.last_sent_at >= SUBSCRIPTION_KEEPALIVE_S
+
+    def mark_sent(self, now: float) -> None:
+        self.changed = set()
+        self.full = False
+        self.last_sent_at = now
+        self.next_due = now + self.subscription.min_interval_s
+
+
+class ClientState:
+    """Estado del protocolo de una conexión."""
+
+    __slots__ = ("protocol", "keyframe_every", "needs_keyframe", "since_keyframe", "resyncs")
+
+    def __init__(self, protocol: Optional[str] = None, keyframe_every: Optional[int] = None):
+        self.protocol = normalize_protocol(protocol) or PROTOCOL_FULL
+        self.keyframe_every = keyframe_every or keyframe_every_from_env()
+        self.needs_keyframe = True
+        self.since_keyframe = 0
+        self.resyncs = 0
+
+    def set_protocol(self, protocol: str) -> None:
+        if protocol != self.protocol:
+            self.protocol = protocol
+            self.needs_keyframe = True
+
+    def request_resync(self) -> None:
+        self.resyncs += 1
+        self.needs_keyframe = True
+
+    def keyframe_sent(self) -> None:
+        self.needs_keyframe = False
+        self.since_keyframe = 0
+
+    def next_send(self, has_patch: bool) -> str:
+        """Qué recibe esta conexión para el próximo TELEMETRY."""
+        if self.protocol != PROTOCOL_DELTA:
+            return SEND_FULL
+        if not has_patch or self.needs_keyframe or self.since_keyframe >= self.keyframe_every:
+            self.keyframe_sent()
+            return SEND_KEYFRAME
+        self.since_keyframe += 1
+        return SEND_PATCH
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "protocol": self.protocol,
+            "since_keyframe": self.since_keyframe,
+            "resyncs": self.resyncs,
+        }
@@ -2,9 +2,10 @@
 main.py — Nexus V3 API: WebSocket de telemetría y REST auxiliar.
 """
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
+from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 import asyncio
 import json
 import logging
@@ -18,42 +19,37 @@ from datetime import datetime, timezone
 if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-from core.parser import parse_telemetry_line
+from core.parser import CompiledLineParser
+from core.pipeline import TelemetryPipeline
 from core.profiles import ProfileManager
-from core.raildriver import get_raildriver_client
+from core.raildriver import RailDriverSnapshot, get_raildriver_client
 import core.ocr_hud as ocr_hud
 import core.brake_log as brake_log
 import core.session_log as session_log
 import core.command_bus as command_bus
 import core.station_distance as station_distance
-from core.cab_inference import CabInferenceState, enrich_cab_telemetry
+from core.cab_inference import (
+    CAB_INPUT_KEYS,
+    CabInferenceState,
+    enrich_cab_telemetry,
+    reapply_cab_fields,
+)
+from core.last_state import LastKnownState
+from core.telemetry_frame import DeltaTracker, FrameSubscription, TelemetryFrame
+import core.getdata_watcher as getdata_watcher
+import core.shm_transport as shm_transport
+import core.railworks_paths as railworks_paths
+import core.replay as replay
+import core.ws_protocol as ws_protocol
+import core.telemetry_codec as telemetry_codec
+import core.http_stream as http_stream
+import core.relay as relay
+from core.ws_client import CLOSE_CODE_SLOW_CONSUMER, ClientConnection
+from core.telemetry_codec import encode_json
 
 _BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
 _DEFAULT_PROFILES_DIR = os.path.normpath(os.path.join(_BACKEND_DIR, "..", "..", "profiles"))
 
-_GETDATA_PLUGIN_PATH = (
-    r"C:\Program Files (x86)\Steam\steamapps\common\RailWorks\plugins\GetData.txt"
-)
-_GETDATA_ALT_PATH = r"C:\Program Files (x86)\Steam\steamapps\common\RailWorks\GetData.txt"
-_SENDCOMMAND_FILENAME = "SendCommand.txt"
-
-
-def _telemetry_int(data: Dict[str, Any], key: str, default: int = 1) -> int:
-    try:
-        return int(float(data.get(key) or default))
-    except (TypeError, ValueError):
-        return default
-
-
-def _telemetry_float_from_keys(data: Dict[str, Any], *keys: str, default: float = 0.0) -> float:
-    for key in keys:
-        if key in data:
-            try:
-                return float(data[key])
-            except (TypeError, ValueError):
-                pass
-    return default
-
 _CORS_ORIGINS = [
     "http://localhost:5173",
     "http://localhost:5174",
@@ -62,15 +58,25 @@ _CORS_ORIGINS = [
     "http://127.0.0.1:5175",
 ]
 
-_POLL_INTERVAL_S = 0.01
-_HEARTBEAT_EVERY_N = 200  # a 100 Hz → keep-alive cada ~2 s si GetData no cambia
+_HEARTBEAT_INTERVAL_S = 2.0  # keep-alive si GetData no cambia
 _GAME_LINK_STALE_S = 4.0
 _DOOR_OPEN_THRESHOLD = 0.5
 _PROFILE_SYNC_INTERVAL_S = 2.0
+# Frames sin cambios en sus claves: RailDriver y perfil se refrescan igualmente cada N s.
+_CAB_REFRESH_S = 1.0
+_PROFILE_REFRESH_S = 30.0
+# Frame idéntico al publicado: se omite el broadcast salvo este keep-alive.
+_PUBLISH_KEEPALIVE_S = 1.0
 
 
 def _sanitize(obj: Any) -> Any:
-    """Reemplaza float no finitos por 0 para que JSON.parse no falle en el frontend."""
+    """
+    Reemplaza float no finitos por 0 para que JSON.parse no falle en el frontend.
+
+    Copia recursiva: solo para payloads no confiables (eventos/meta de sesión) o
+    como fallback cuando el encoder rechaza un mensaje. El frame TELEMETRY es
+    finito desde el parser y no pasa por aquí.
+    """
     if isinstance(obj, float):
         return obj if math.isfinite(obj) else 0.0
     if isinstance(obj, dict):
@@ -80,6 +86,14 @@ def _sanitize(obj: Any) -> Any:
     return obj
 
 
+def _encode_payload(message: Dict[str, Any]) -> str:
+    """JSON para WS: el encoder rechaza NaN/Inf sin recorrer el dict; solo entonces se sanea."""
+    try:
+        return encode_json(message)
+    except ValueError:
+        return encode_json(_sanitize(message))
+
+
 def _resolve_profiles_dir(candidates: Optional[List[str]] = None) -> str:
     """Primera carpeta de perfiles existente; fallback al path por defecto del repo."""
     if candidates is None:
@@ -97,27 +111,39 @@ def _resolve_profiles_dir(candidates: Optional[List[str]] = None) -> str:
     return _DEFAULT_PROFILES_DIR
 
 
-def _resolve_getdata_path(
-    plugin_path: str = _GETDATA_PLUGIN_PATH,
-    alt_path: str = _GETDATA_ALT_PATH,
-) -> Optional[str]:
-    """Ruta activa de GetData.txt del plugin TSC, o None si no existe."""
-    if os.path.exists(plugin_path):
-        return plugin_path
-    if os.path.exists(alt_path):
-        return alt_path
-    return None
-
-
-def _resolve_send_command_path(
-    plugin_path: str = _GETDATA_PLUGIN_PATH,
-    alt_path: str = _GETDATA_ALT_PATH,
-) -> Optional[str]:
-    """Ruta de SendCommand.txt junto a GetData.txt del plugin TSC."""
-    getdata = _resolve_getdata_path(plugin_path, alt_path)
-    if not getdata:
+# Rutas RailWorks cacheadas: sin os.path.exists por tick ni por COMMAND.
+_railworks_paths = railworks_paths.RailWorksPathResolver()
+
+
+def _resolve_shm_path() -> Optional[str]:
+    """Anillo shm de telemetría (NEXUS_SHM_PATH o plugins/GetData.shm), si existe."""
+    path = os.environ.get("NEXUS_SHM_PATH", "").strip() or _railworks_paths.shm_path()
+    return path if os.path.exists(path) else None
+
+
+def _telemetry_transport() -> str:
+    """'text' (GetData.txt, por defecto), 'shm' o 'replay' (NEXUS_REPLAY_PATH)."""
+    if _replay_path():
+        return "replay"
+    value = os.environ.get("NEXUS_TELEMETRY_TRANSPORT", "").strip().lower()
+    return "shm" if value == "shm" else "text"
+
+
+def _replay_path() -> Optional[str]:
+    """Captura a reproducir en lugar del juego (NEXUS_REPLAY_PATH)."""
+    return os.environ.get("NEXUS_REPLAY_PATH", "").strip() or None
+
+
+def _create_frame_recorder() -> Optional[replay.FrameRecorder]:
+    """Grabación de frames crudos si NEXUS_RECORD_PATH está definido."""
+    path = os.environ.get("NEXUS_RECORD_PATH", "").strip()
+    if not path:
+        return None
+    try:
+        return replay.FrameRecorder(path)
+    except OSError as exc:
+        print(f"[Nexus] No se pudo abrir la grabación {path}: {exc}")
         return None
-    return os.path.join(os.path.dirname(getdata), _SENDCOMMAND_FILENAME)
 
 
 def _doors_open(door_l: float, door_r: float, threshold: float = _DOOR_OPEN_THRESHOLD) -> bool:
@@ -134,14 +160,13 @@ def _apply_ocr_metadata(data: Dict[str, Any], ocr_result: Dict[str, Any]) -> Non
         data["StationScheduled"] = ocr_result["scheduled_time"]
 
 
-def _log_ocr_session_event(
+async def _log_ocr_session_event(
     event: str,
     tracker: station_distance.StationDistanceTracker,
     result: Optional[Dict[str, Any]] = None,
     error: Optional[str] = None,
 ) -> None:
-    """Registra captura OCR en el log de sesión V4 activo."""
-    session_log._store.ensure_active_session({"source": "backend_ocr"})
+    """Registra captura OCR en el log de sesión V4 activo (el store, fuera del loop)."""
     payload: Dict[str, Any] = {
         "type": "ocr_capture",
         "t": time.time(),
@@ -162,6 +187,11 @@ def _log_ocr_session_event(
     if error:
         payload["error"] = error
     payload["tracker"] = tracker.debug_payload()
+    await asyncio.to_thread(_append_ocr_session_event, payload)
+
+
+def _append_ocr_session_event(payload: Dict[str, Any]) -> None:
+    session_log._store.ensure_active_session({"source": "backend_ocr"})
     session_log._store.append_active([payload])
 
 
@@ -169,27 +199,28 @@ _BACKEND_TICK_INTERVAL_S = 2.5
 _last_backend_tick_at = 0.0
 
 
-def _log_backend_telemetry_tick(data: Dict[str, Any], profile_id: Optional[str]) -> None:
+def _log_backend_telemetry_tick(frame: TelemetryFrame, profile_id: Optional[str]) -> None:
     """Tick de respaldo desde GetData cuando V4 no vuelca eventos."""
     global _last_backend_tick_at
     if session_log._store.v4_recently_active(within_s=25.0):
         return
-    now = time.time()
+    # Cadencia por el instante del frame: igual en vivo y en replay.
+    now = frame.received_at
     if now - _last_backend_tick_at < _BACKEND_TICK_INTERVAL_S:
         return
     _last_backend_tick_at = now
 
     session_log._store.ensure_active_session({"source": "backend_telemetry"})
-    speed_ms = station_distance.speed_ms_from_telemetry(data)
+    data = frame.data
     payload: Dict[str, Any] = {
         "type": "backend_tick",
         "t": now,
         "wall": datetime.now(timezone.utc).isoformat(),
         "profileId": profile_id,
         "speed": {
-            "ms": round(speed_ms, 4),
+            "ms": round(frame.speed_ms, 4),
             "display": data.get("SpeedDisplay") or data.get("Speed"),
-            "unit": "MPH" if int(float(data.get("SpeedoType") or 1)) == 1 else "km/h",
+            "unit": frame.speed_unit,
         },
         "brake": {
             "combined": data.get("CombinedControl") or data.get("Combined"),
@@ -261,7 +292,7 @@ async def execute_ocr_capture(
                 ocr_raw_m=float(result["distance_m"]),
             )
             if anchored:
-                _log_ocr_session_event(event, tracker, result=result)
+                await _log_ocr_session_event(event, tracker, result=result)
             else:
                 reject_error = "rejected_jump"
                 if (
@@ -270,14 +301,14 @@ async def execute_ocr_capture(
                     and float(result["distance_m"]) < station_distance.MIN_NEW_LEG_ANCHOR_M
                 ):
                     reject_error = "rejected_platform_residual"
-                _log_ocr_session_event(
+                await _log_ocr_session_event(
                     event,
                     tracker,
                     result=result,
                     error=reject_error,
                 )
         else:
-            _log_ocr_session_event(
+            await _log_ocr_session_event(
                 event,
                 tracker,
                 result=result,
@@ -285,7 +316,7 @@ async def execute_ocr_capture(
             )
     except Exception as exc:
         print(f"[OCR] Error ({event}): {exc}")
-        _log_ocr_session_event(event, tracker, error=str(exc))
+        await _log_ocr_session_event(event, tracker, error=str(exc))
         return {"ok": False, "error": str(exc), "event": event}
     finally:
         tracker.mark_ocr_capture_attempted(attempt_time)
@@ -318,10 +349,11 @@ async def execute_ocr_capture(
 def _apply_station_distance(
     data: Dict[str, Any],
     tracker: station_distance.StationDistanceTracker,
+    lua_raw: Optional[float] = None,
 ) -> None:
-    lua_dist = station_distance.normalize_lua_station_distance(
-        float(data.get("StationDistance") or -1),
-    )
+    if lua_raw is None:
+        lua_raw = float(data.get("StationDistance") or -1)
+    lua_dist = station_distance.normalize_lua_station_distance(lua_raw)
     tracked = tracker.distance_m()
 
     if lua_dist is not None:
@@ -358,46 +390,297 @@ def _win_reset_exception_handler(loop: asyncio.AbstractEventLoop) -> None:
 class TelemetryManager:
     def __init__(self, profiles_dir: Optional[str] = None):
         self.active_connections: List[WebSocket] = []
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.evicted_clients = 0
+        self._groups: Dict[ws_protocol.Subscription, ws_protocol.SubscriptionGroup] = {}
+        # Consumidores de /api/telemetry/latest, uno por suscripción.
+        self.latest_channels: Dict[ws_protocol.Subscription, http_stream.LatestChannel] = {}
+        # Modo relay: publicador (proceso ingest) o suscriptor (worker relay).
+        self.relay: Optional[relay.RelayPublisher] = None
+        self.upstream: Optional[relay.RelaySubscriber] = None
+        self._clock = time.monotonic
+        self.telemetry_seq = 0
+        self.state = LastKnownState()
+        self.field_table = telemetry_codec.FieldTable()
         self.active_profiles_path = profiles_dir or _resolve_profiles_dir()
         self.profile_manager = ProfileManager(self.active_profiles_path)
-        self.current_profile: Optional[Dict[str, Any]] = None
-        self.last_payload: Dict[str, Any] = {}
+        self.current_profile = None
+        # Cabecera de INIT codificada (perfiles disponibles, tabla de campos) por codificación.
+        self._init_head: Dict[str, Any] = {}
+        self.init_encodes = 0
         self._profile_sync_key: str = ""
         self._last_profile_sync_at: float = 0.0
 
-    async def connect(self, websocket: WebSocket) -> None:
-        await websocket.accept()
+    @property
+    def current_profile(self) -> Optional[Dict[str, Any]]:
+        return self._current_profile
+
+    @current_profile.setter
+    def current_profile(self, profile: Optional[Dict[str, Any]]) -> None:
+        self._current_profile = profile
+        self.state.note_profile(profile)
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        protocol: Optional[str] = None,
+        encoding: str = telemetry_codec.ENCODING_JSON,
+        subprotocol: Optional[str] = None,
+    ) -> None:
+        await websocket.accept(subprotocol=subprotocol)
+        # Sin await desde el INIT hasta el alta en el bus: sus field_ids y known_fields
+        # son la misma tabla, y ningún frame publicado entretanto se pierde. El INIT
+        # sale por el escritor, antes que cualquier TELEMETRY.
+        client = ClientConnection(websocket, protocol, encoding=encoding, on_evict=self._evict_client)
+        client.offer(self._init_text(encoding))
+        client.known_fields = len(self.field_table)
         self.active_connections.append(websocket)
-        await websocket.send_json(self._build_init_payload())
+        self.clients[websocket] = client
+        client.start()
+
+    def attach_stream(
+        self,
+        sink: http_stream.SseSink,
+        subscription: ws_protocol.Subscription,
+        protocol: Optional[str] = None,
+    ) -> ClientConnection:
+        """Cliente SSE: misma ClientConnection y mismo bus que un WebSocket JSON."""
+        client = ClientConnection(sink, protocol, on_evict=self._evict_client)
+        client.subscribe(subscription)
+        client.offer(self._init_text())
+        self.clients[sink] = client
+        client.start()
+        return client
+
+    def _latest_channel(self, subscription: ws_protocol.Subscription) -> http_stream.LatestChannel:
+        channel = self.latest_channels.get(subscription)
+        if channel is not None:
+            return channel
+        if len(self.latest_channels) >= http_stream.MAX_LATEST_CHANNELS:
+            raise ValueError("too_many_subscriptions")
+        channel = http_stream.LatestChannel(subscription)
+        last = self.state.telemetry.value
+        if last is not None and self.state.telemetry.fresh():
+            channel.seed(last["seq"], _encode_payload(ws_protocol.project(last, subscription.fields)))
+        self.latest_channels[subscription] = channel
+        return channel
+
+    async def latest_telemetry(
+        self,
+        subscription: ws_protocol.Subscription,
+        since: int = 0,
+        wait_s: float = 0.0,
+    ) -> Optional[str]:
+        """Long-poll: primer TELEMETRY del canal con seq > since, o None si vence wait_s."""
+        channel = self._latest_channel(subscription)
+        if since > self.telemetry_seq:
+            since = 0  # seq de un proceso anterior
+        channel.touched_at = self._clock()
+        try:
+            result = await channel.wait(since, wait_s)
+        finally:
+            channel.touched_at = self._clock()
+        return result[1] if result else None
 
-    def _build_init_payload(self) -> Dict[str, Any]:
+    def http_status(self) -> Dict[str, Any]:
         return {
+            "sse": sum(isinstance(ws, http_stream.SseSink) for ws in self.clients),
+            "latest_channels": [c.status() for c in self.latest_channels.values()],
+        }
+
+    def _build_init_payload(self, encoding: str = telemetry_codec.ENCODING_JSON) -> Dict[str, Any]:
+        """INIT como dict (tests y depuración); connect envía _init_text."""
+        return json.loads(self._init_text(encoding))
+
+    def _init_head_text(self, encoding: str) -> str:
+        """Parte estable de INIT: solo se recodifica al recargar perfiles o crecer la tabla de campos."""
+        binary = encoding == telemetry_codec.ENCODING_MSGPACK
+        key = (self.profile_manager.version, len(self.field_table) if binary else 0)
+        cached = self._init_head.get(encoding)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        head: Dict[str, Any] = {
             "type": "INIT",
             "available_profiles": self.profile_manager.get_all_profiles(),
-            "active_profile": self.current_profile,
-            "active_profile_id": self.current_profile.get("id") if self.current_profile else None,
             "isConnected": True,
-            **self.last_payload,
         }
+        if binary:
+            head["encoding"] = encoding
+            head["field_ids"] = self.field_table.ids()
+        text = _encode_payload(head)
+        self._init_head[encoding] = (key, text)
+        self.init_encodes += 1
+        return text
+
+    def _init_text(self, encoding: str = telemetry_codec.ENCODING_JSON) -> str:
+        """
+        INIT = cabecera + ranuras de LastKnownState, cada una ya codificada.
+
+        El perfil activo va en primer nivel (active_profile / active_profile_id);
+        el enlace y el último TELEMETRY, si no han caducado, bajo "link" y "telemetry".
+        """
+        parts = [self._init_head_text(encoding)[:-1]]
+        profile = self.state.profile.encoded(_encode_payload)
+        if profile:
+            parts.append("," + profile[1:-1])
+        for slot in (self.state.link, self.state.telemetry):
+            text = slot.encoded(_encode_payload)
+            if text:
+                parts.append(f',"{slot.name}":{text}')
+        parts.append("}")
+        return "".join(parts)
+
+    def _encode_telemetry(self, message: Dict[str, Any], encoding: str) -> Union[str, bytes]:
+        if encoding == telemetry_codec.ENCODING_MSGPACK:
+            return telemetry_codec.encode_msgpack(self.field_table.pack(message))
+        return _encode_payload(message)
+
+    def _announce_fields(self, client: ClientConnection) -> None:
+        """FIELD_IDS con las claves que el cliente binario aún no conoce (antes del frame)."""
+        if client.known_fields < len(self.field_table):
+            client.offer(_encode_payload({
+                "type": "FIELD_IDS",
+                "field_ids": self.field_table.ids_since(client.known_fields),
+            }))
+            client.known_fields = len(self.field_table)
 
     def disconnect(self, websocket: WebSocket) -> None:
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: dict) -> None:
-        safe = _sanitize(message)
-        self.last_payload.update(safe)
-        for connection in list(self.active_connections):
-            asyncio.create_task(self._safe_send(connection, safe))
-
-    async def _safe_send(self, ws: WebSocket, data: dict) -> None:
+        client = self.clients.pop(websocket, None)
+        if client is not None:
+            client.stop()
+
+    def _evict_client(self, client: ClientConnection, reason: str) -> None:
+        """Consumidor lento: se suelta su cola y se cierra el socket."""
+        self.evicted_clients += 1
+        print(f"[Nexus] Cliente WS expulsado ({reason}): {client.status()['client']}")
+        self.disconnect(client.websocket)
+        asyncio.create_task(self._safe_close(client.websocket))
+
+    async def _safe_close(self, ws: WebSocket) -> None:
         try:
-            await ws.send_json(data)
+            await ws.close(code=CLOSE_CODE_SLOW_CONSUMER)
         except Exception:
             pass
 
-    async def handle_command(self, cmd: dict) -> dict:
+    def send_to(self, websocket: WebSocket, message: Dict[str, Any]) -> None:
+        """Respuesta a una conexión concreta, por su misma cola (un solo escritor por socket)."""
+        client = self.clients.get(websocket)
+        if client is not None:
+            client.offer(_encode_payload(message))
+
+    def clients_status(self) -> List[Dict[str, Any]]:
+        return [client.status() for client in self.clients.values()]
+
+    async def broadcast(self, message: dict, delta: Optional[Dict[str, Any]] = None) -> None:
+        """`delta` (claves cambiadas desde el TELEMETRY anterior) habilita parches para clientes delta."""
+        # Sin copia saneada por frame: ver _encode_payload.
+        safe = message
+        msg_type = safe.get("type")
+        is_telemetry = msg_type == ws_protocol.TELEMETRY
+        if is_telemetry:
+            self.telemetry_seq += 1
+            safe["seq"] = self.telemetry_seq
+            self.state.note_telemetry(safe)
+        elif msg_type == "HEARTBEAT":
+            self.state.note_heartbeat(safe)
+        if self.relay is not None:
+            self.relay.publish(safe, delta)
+
+        if not is_telemetry:
+            text = _encode_payload(safe)
+            for client in list(self.clients.values()):
+                client.offer(text)
+            return
+        self._publish_telemetry(safe, delta)
+
+    async def apply_relayed(self, message: Dict[str, Any], delta: Optional[Dict[str, Any]]) -> None:
+        """Worker relay: mensaje del ingest → bus local (el perfil activo viene en PROFILE_CHANGED)."""
+        if message.get("type") == "PROFILE_CHANGED":
+            self.current_profile = message.get("active_profile")
+        await self.broadcast(message, delta)
+
+    def relay_snapshot(self) -> List[Dict[str, Any]]:
+        """Proceso ingest: lo que necesita un relay recién conectado para su INIT."""
+        messages: List[Dict[str, Any]] = [{
+            "type": "PROFILE_CHANGED",
+            "active_profile": self.current_profile,
+            "active_profile_id": self.current_profile.get("id") if self.current_profile else None,
+        }]
+        if self.state.link.value is not None:
+            messages.append({"type": "HEARTBEAT", **self.state.link.value})
+        if self.state.telemetry.fresh():
+            messages.append(self.state.telemetry.value)  # type: ignore[arg-type]
+        return messages
+
+    def relay_status(self) -> Optional[Dict[str, Any]]:
+        link = self.relay or self.upstream
+        return link.status() if link is not None else None
+
+    def _publish_telemetry(self, message: Dict[str, Any], delta: Optional[Dict[str, Any]]) -> None:
+        """
+        TELEMETRY por grupo de suscripción: cada grupo se muestrea a su max_hz, se
+        proyecta a sus claves y cada variante (completo / keyframe / parche, por
+        codificación) se codifica una sola vez y se comparte entre las conexiones del grupo.
+        Los canales de long-poll entran en el grupo de su suscripción como un cliente más.
+        """
+        now = self._clock()
+        seq = message["seq"]
+        members: Dict[ws_protocol.Subscription, List[Any]] = {}
+        for client in self.clients.values():
+            members.setdefault(client.subscription, []).append(client)
+        for subscription, channel in list(self.latest_channels.items()):
+            if channel.idle(now):
+                del self.latest_channels[subscription]
+            else:
+                members.setdefault(subscription, []).append(channel)
+
+        groups: Dict[ws_protocol.Subscription, ws_protocol.SubscriptionGroup] = {}
+        for subscription, clients in members.items():
+            group = self._groups.get(subscription) or ws_protocol.SubscriptionGroup(subscription)
+            groups[subscription] = group
+            group.note_frame(delta.keys() if delta is not None else None)
+            changes = group.relevant_changes()
+            needs_keyframe = any(c.state.needs_keyframe for c in clients)
+            if not group.should_send(now, changes, needs_keyframe):
+                continue
+            group.mark_sent(now)
+
+            payload = ws_protocol.project(message, subscription.fields)
+            encoded: Dict[Any, Union[str, bytes]] = {}
+            for client in clients:
+                client.prepare_telemetry()
+                kind = client.state.next_send(changes is not None)
+                base = client.last_seq if kind == ws_protocol.SEND_PATCH else None
+                cache_key = (client.encoding, kind, base)
+                data = encoded.get(cache_key)
+                if data is None:
+                    if kind == ws_protocol.SEND_PATCH:
+                        variant = ws_protocol.build_patch(payload, changes or set(), base=base)
+                    elif kind == ws_protocol.SEND_KEYFRAME:
+                        variant = ws_protocol.build_keyframe(payload)
+                    else:
+                        variant = payload
+                    data = self._encode_telemetry(variant, client.encoding)
+                    encoded[cache_key] = data
+                if client.encoding == telemetry_codec.ENCODING_MSGPACK:
+                    self._announce_fields(client)
+                client.last_seq = seq
+                client.offer_telemetry(data)
+        self._groups = groups
+
+    async def handle_command(self, cmd: dict, websocket: Optional[WebSocket] = None) -> dict:
         cmd_type = cmd.get("type")
+        if cmd_type in ("SET_PROTOCOL", "RESYNC", "SUBSCRIBE"):
+            return self._handle_protocol_command(cmd_type, cmd, websocket)
+
+        if self.upstream is not None:
+            # Worker relay: el juego, los perfiles y las sesiones son del ingest.
+            if not self.upstream.send_command(cmd):
+                return {"type": "COMMAND_ACK", "ok": False, "error": "relay_unavailable"}
+            return {"type": "COMMAND_ACK", "ok": True, "action": "relayed"}
+
         if cmd_type == "SELECT_PROFILE":
             profile_id = cmd.get("profile_id")
             if not self.profile_manager.select_manual_profile(profile_id):
@@ -413,7 +696,7 @@ class TelemetryManager:
             except (TypeError, ValueError):
                 return {"type": "COMMAND_ACK", "ok": False, "error": "invalid_value"}
             result = command_bus.dispatch_command(
-                _resolve_send_command_path(),
+                _railworks_paths.send_command_path(),
                 control,
                 value,
                 self.current_profile,
@@ -421,6 +704,8 @@ class TelemetryManager:
             if result.get("ok"):
                 logging.info("COMMAND sent %s=%s", control, result.get("value"))
             else:
+                if result.get("error") in ("send_command_path_unavailable", "write_failed"):
+                    _railworks_paths.invalidate()
                 logging.warning("COMMAND rejected %s: %s", control, result.get("error"))
             return {"type": "COMMAND_ACK", **result}
 
@@ -440,14 +725,15 @@ class TelemetryManager:
         if cmd_type == "SESSION_REGISTER":
             meta_raw = cmd.get("meta")
             register_meta: Dict[str, Any] = (
-                dict(meta_raw) if isinstance(meta_raw, dict) else {}
+                _sanitize(meta_raw) if isinstance(meta_raw, dict) else {}
             )
             register_meta["source"] = register_meta.get("source") or "v4_session"
             session_id = cmd.get("session_id")
+            # El store puede leer cabeceras de disco: fuera del event loop.
             if session_id and isinstance(session_id, str):
-                session_log._store.adopt_session(session_id, register_meta)
+                await asyncio.to_thread(session_log._store.adopt_session, session_id, register_meta)
             else:
-                session_id = session_log._store.ensure_active_session(register_meta)
+                session_id = await asyncio.to_thread(session_log._store.ensure_active_session, register_meta)
             return {
                 "type": "SESSION_ACK",
                 "ok": True,
@@ -463,7 +749,7 @@ class TelemetryManager:
                     "ok": False,
                     "error": "invalid_payload",
                 }
-            saved = session_log._store.append(session_id, events)
+            saved = await asyncio.to_thread(session_log._store.append, session_id, _sanitize(events))
             return {
                 "type": "SESSION_EVENTS_ACK",
                 "ok": saved,
@@ -472,6 +758,53 @@ class TelemetryManager:
 
         return {"type": "COMMAND_ACK", "ok": False, "error": "unknown_command_type"}
 
+    def _handle_protocol_command(
+        self,
+        cmd_type: str,
+        cmd: dict,
+        websocket: Optional[WebSocket],
+    ) -> dict:
+        client = self.clients.get(websocket) if websocket is not None else None
+        if client is None:
+            return {"type": "COMMAND_ACK", "ok": False, "error": "no_connection"}
+        if cmd_type == "SUBSCRIBE":
+            try:
+                subscription = ws_protocol.parse_subscription(cmd)
+            except ValueError as exc:
+                return {"type": "COMMAND_ACK", "ok": False, "error": str(exc)}
+            client.subscribe(subscription)
+            return {
+                "type": "COMMAND_ACK",
+                "ok": True,
+                "action": "subscribed",
+                **subscription.to_dict(),
+            }
+        if cmd_type == "SET_PROTOCOL":
+            protocol = ws_protocol.normalize_protocol(cmd.get("telemetry"))
+            if protocol is None:
+                return {"type": "COMMAND_ACK", "ok": False, "error": "invalid_protocol"}
+            client.state.set_protocol(protocol)
+            return {
+                "type": "COMMAND_ACK",
+                "ok": True,
+                "action": "protocol",
+                "telemetry": protocol,
+                "keyframe_every": client.state.keyframe_every,
+                "seq": self.telemetry_seq,
+            }
+        # RESYNC: keyframe inmediato con el último TELEMETRY; los parches siguientes parten de él.
+        client.state.request_resync()
+        last = self.state.telemetry.value
+        if last is None:
+            return {"type": "COMMAND_ACK", "ok": True, "action": "resync_pending"}
+        client.state.keyframe_sent()
+        client.last_seq = last["seq"]
+        # El frame pendiente es <= este keyframe y saldría detrás con un base viejo.
+        client.discard_telemetry()
+        return ws_protocol.build_keyframe(
+            ws_protocol.project(last, client.subscription.fields),
+        )
+
     async def _broadcast_profile_change(self) -> None:
         await self.broadcast({
             "type": "PROFILE_CHANGED",
@@ -479,14 +812,15 @@ class TelemetryManager:
             "active_profile_id": self.current_profile.get("id") if self.current_profile else None,
         })
 
-    async def sync_auto_profile(self, lua_loco_name: str = "") -> None:
-        now = time.time()
+    async def sync_auto_profile(self, lua_loco_name: str = "", now: Optional[float] = None) -> bool:
+        """False si no se ejecutó por el intervalo mínimo (hay que reintentar)."""
+        now = time.time() if now is None else now
         if now - self._last_profile_sync_at < _PROFILE_SYNC_INTERVAL_S:
-            return
+            return False
         self._last_profile_sync_at = now
 
-        rd = get_raildriver_client()
-        snapshot = rd.snapshot() if rd.available else None
+        # ctypes bloqueante (y la DLL la comparte enrich_cab_telemetry): en un hilo.
+        snapshot = await asyncio.to_thread(_raildriver_snapshot)
         loco_names = snapshot.loco_names if snapshot else []
         if not loco_names and lua_loco_name:
             loco_names = [lua_loco_name]
@@ -495,7 +829,7 @@ class TelemetryManager:
         limits = snapshot.limits_by_name() if snapshot else None
         sync_key = "|".join(loco_names + controller_names[:8])
         if sync_key == self._profile_sync_key and self.current_profile is not None:
-            return
+            return True
 
         resolved = self.profile_manager.resolve_active_profile(
             loco_names=loco_names,
@@ -503,16 +837,22 @@ class TelemetryManager:
             limits_by_name=limits,
         )
         if resolved is None:
-            return
+            return True
 
         profile_id = resolved.get("id")
         current_id = self.current_profile.get("id") if self.current_profile else None
         if profile_id == current_id and sync_key == self._profile_sync_key:
-            return
+            return True
 
         self._profile_sync_key = sync_key
         self.current_profile = resolved
         await self._broadcast_profile_change()
+        return True
+
+
+def _raildriver_snapshot() -> Optional[RailDriverSnapshot]:
+    rd = get_raildriver_client()
+    return rd.snapshot() if rd.available else None
 
 
 manager = TelemetryManager()
@@ -520,7 +860,7 @@ manager = TelemetryManager()
 
 def _purge_send_command_file() -> bool:
     """Elimina SendCommand.txt + flag huérfanos (bloquean mandos del jugador en TSC)."""
-    purged = command_bus.purge_lua_commands(_resolve_send_command_path())
+    purged = command_bus.purge_lua_commands(_railworks_paths.send_command_path())
     if purged:
         logging.info("Purged stale SendCommand / NexusApplyCommands.flag")
     return purged
@@ -533,10 +873,31 @@ async def lifespan(app: FastAPI):
     ocr_status = "disponible" if ocr_hud.is_available() else "no disponible"
     print(f"[Nexus] Perfiles: {manager.active_profiles_path} ({profile_count} cargados)")
     print(f"[Nexus] OCR: {ocr_status}")
-    if _purge_send_command_file():
-        print("[Nexus] SendCommand.txt huérfano eliminado al arranque")
-    asyncio.create_task(telemetry_reader())
+    role = relay.role_from_env()
+    if role == relay.ROLE_RELAY:
+        manager.upstream = relay.RelaySubscriber(relay.addr_from_env(), manager.apply_relayed)
+        print(f"[Nexus] Relay: suscrito al ingest en {manager.upstream.status()['addr']}")
+        asyncio.create_task(manager.upstream.run())
+    else:
+        if _purge_send_command_file():
+            print("[Nexus] SendCommand.txt huérfano eliminado al arranque")
+        if role == relay.ROLE_INGEST:
+            publisher = relay.RelayPublisher(
+                relay.addr_from_env(),
+                encode=_encode_payload,
+                on_command=manager.handle_command,
+                snapshot=manager.relay_snapshot,
+            )
+            await publisher.start()
+            manager.relay = publisher
+            print(f"[Nexus] Ingest: publicando para relays en {publisher.status()['addr']}")
+        asyncio.create_task(telemetry_reader())
     yield
+    if manager.relay is not None:
+        await manager.relay.stop()
+        manager.relay = None
+    # Lo encolado en el escritor de sesiones, a disco (fuera del event loop).
+    await asyncio.to_thread(session_log._store.close)
 
 
 app = FastAPI(title="Nexus v3 Engine", lifespan=lifespan)
@@ -550,155 +911,332 @@ app.add_middleware(
 )
 
 
+class TelemetryProcessor:
+    """Etapas del frame GetData: parse → enrich → track → publish (+ ramas log/perfil)."""
+
+    def __init__(self, telemetry_manager: "TelemetryManager"):
+        self.manager = telemetry_manager
+        self.station_tracker = station_distance.StationDistanceTracker()
+        self.line_parser = CompiledLineParser()
+        self.cab_subscription = FrameSubscription("enrich", CAB_INPUT_KEYS, refresh_s=_CAB_REFRESH_S)
+        self.profile_subscription = FrameSubscription(
+            "profile_sync", ("LocoName",), refresh_s=_PROFILE_REFRESH_S,
+        )
+        self.delta_tracker = DeltaTracker()
+        self.last_game_telemetry_at = 0.0
+        self._last_published_at = 0.0
+        self.published = 0
+        self.publish_skipped = 0
+        self._ocr_door_was_open = False
+        self._last_active_cab: Optional[int] = None
+        self._last_reversal: Optional[float] = None
+        self._stationary_since: Optional[float] = None
+
+    def build_pipeline(self) -> TelemetryPipeline:
+        # Un frame descartado por coalescencia cede sus claves cambiadas al siguiente.
+        merge = TelemetryFrame.coalesce
+        return (
+            TelemetryPipeline()
+            .add_stage("parse", self.parse)
+            .add_stage("enrich", self.enrich, merge=merge)
+            .add_stage("track", self.track, merge=merge)
+            .add_stage("publish", self.publish, merge=merge)
+            .add_stage("session_log", self.log_session, after="track", merge=merge)
+            .add_stage("profile_sync", self.sync_profile, after="track", merge=merge)
+        )
+
+    async def process(self, raw: getdata_watcher.RawFrame) -> TelemetryFrame:
+        """Todas las etapas en serie, sin colas: replay determinista y benchmarks."""
+        frame = await self.parse(raw)
+        frame = await self.enrich(frame)
+        frame = await self.track(frame)
+        await self.publish(frame)
+        await self.log_session(frame)
+        await self.sync_profile(frame)
+        return frame
+
+    async def parse(self, raw: getdata_watcher.RawFrame) -> TelemetryFrame:
+        self.last_game_telemetry_at = raw.received_at
+        return TelemetryFrame.from_record(self.line_parser.parse(raw.line), raw.received_at)
+
+    async def enrich(self, frame: TelemetryFrame) -> TelemetryFrame:
+        if not self.cab_subscription.wants(frame):
+            reapply_cab_fields(frame, _cab_inference_state)
+            return frame
+        # RailDriver64.dll es ctypes bloqueante: fuera del event loop.
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, enrich_cab_telemetry, frame, _cab_inference_state)
+        return frame
+
+    async def track(self, frame: TelemetryFrame) -> TelemetryFrame:
+        global _last_telemetry_data
+        now = frame.received_at
+        data = frame.data
+        station_tracker = self.station_tracker
+
+        doors_open_now = _doors_open(frame.door_l, frame.door_r)
+        if doors_open_now:
+            station_tracker.note_doors_opened()
+        door_just_closed = self._ocr_door_was_open and not doors_open_now
+        self._ocr_door_was_open = doors_open_now
+
+        speed_ms = frame.speed_ms
+        if speed_ms < station_distance.INITIAL_ANCHOR_MAX_SPEED_MS:
+            if self._stationary_since is None:
+                self._stationary_since = now
+        else:
+            self._stationary_since = None
+
+        station_tracker.integrate(speed_ms, now)
+        if frame.lua_station_raw > 0:
+            station_tracker.sync_lua_distance(
+                frame.lua_station_raw,
+                now=now,
+                speed_ms=speed_ms,
+            )
+        station_tracker.maybe_record_sample(now, speed_ms)
+
+        if station_distance.should_clear_on_turnaround(
+            speed_ms=speed_ms,
+            tracked_dist_m=station_tracker.distance_m(),
+            active_cab=frame.active_cab,
+            reversal=frame.reversal,
+            last_active_cab=self._last_active_cab,
+            last_reversal=self._last_reversal,
+        ):
+            station_tracker.clear()
+        self._last_active_cab = frame.active_cab
+        self._last_reversal = frame.reversal
+
+        if station_distance.should_clear_on_departure_intent(
+            speed_ms=speed_ms,
+            tracked_dist_m=station_tracker.distance_m(),
+            combined_control=frame.combined_control,
+        ):
+            station_tracker.clear()
+
+        _last_telemetry_data = data
+
+        if ocr_hud.is_available() and not _ocr_is_capturing:
+            if door_just_closed:
+                asyncio.create_task(
+                    execute_ocr_capture("door_anchor", speed_ms=speed_ms, capture_time=now),
+                )
+            elif station_tracker.should_request_initial_anchor(
+                speed_ms,
+                now,
+                doors_open=doors_open_now,
+                stationary_since=self._stationary_since,
+            ):
+                asyncio.create_task(
+                    execute_ocr_capture("initial_anchor", speed_ms=speed_ms, capture_time=now),
+                )
+            elif station_tracker.should_request_near_correction(speed_ms, now):
+                asyncio.create_task(
+                    execute_ocr_capture("near_correction", speed_ms=speed_ms, capture_time=now),
+                )
+            elif (
+                not doors_open_now
+                and station_tracker.should_request_mid_leg_correction(speed_ms, now)
+            ):
+                asyncio.create_task(
+                    execute_ocr_capture("mid_leg_correction", speed_ms=speed_ms, capture_time=now),
+                )
+
+        _apply_ocr_metadata(data, _ocr_last_result)
+        _apply_station_distance(data, station_tracker, frame.lua_station_raw)
+        return frame
+
+    async def publish(self, frame: TelemetryFrame) -> None:
+        frame.delta = self.delta_tracker.delta(frame)
+        if (
+            frame.delta == {}
+            and frame.received_at - self._last_published_at < _PUBLISH_KEEPALIVE_S
+        ):
+            self.publish_skipped += 1
+            return
+        self._last_published_at = frame.received_at
+        self.published += 1
+        await self.manager.broadcast({
+            "type": "TELEMETRY",
+            **frame.data,
+            "timestamp": time.time(),
+            "gameLinked": True,
+        }, delta=frame.delta)
+
+    async def log_session(self, frame: TelemetryFrame) -> None:
+        # Escritura a disco en el executor: un disco lento no retrasa publish.
+        profile = self.manager.current_profile
+        profile_id = profile.get("id") if profile else None
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, _log_backend_telemetry_tick, frame, profile_id)
+
+    async def sync_profile(self, frame: TelemetryFrame) -> None:
+        # Sin perfil activo se sigue intentando (RailDriver puede tardar en responder).
+        # El cambio solo se da por consumido si la sincronización no se saltó por
+        # el intervalo mínimo; si no, se reintenta en el siguiente frame.
+        if not self.profile_subscription.due(frame) and self.manager.current_profile is not None:
+            return
+        if await self.manager.sync_auto_profile(frame.loco_name, now=frame.received_at):
+            self.profile_subscription.ran(frame)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "published": self.published,
+            "publish_skipped": self.publish_skipped,
+            "subscriptions": {
+                sub.name: sub.status()
+                for sub in (self.cab_subscription, self.profile_subscription)
+            },
+        }
+
+
+_telemetry_pipeline: Optional[TelemetryPipeline] = None
+_telemetry_processor: Optional[TelemetryProcessor] = None
+FrameWatcher = Union[
+    getdata_watcher.GetDataWatcher,
+    shm_transport.ShmRingWatcher,
+    replay.ReplayWatcher,
+]
+_frame_watcher: Optional[FrameWatcher] = None
+
+
+def _create_frame_watcher(
+    queue: "asyncio.Queue[getdata_watcher.RawFrame]",
+    loop: asyncio.AbstractEventLoop,
+    recorder: Optional[replay.FrameRecorder] = None,
+) -> FrameWatcher:
+    """Watcher según transporte: replay, anillo shm opcional o GetData.txt (fallback)."""
+    replay_path = _replay_path()
+    if replay_path:
+        return replay.ReplayWatcher(replay_path, queue, speed=replay.replay_speed_from_env())
+    cadence = getdata_watcher.AdaptiveCadence(stale_s=_GAME_LINK_STALE_S)
+    # Grabar en el watcher, antes de que la cola del pipeline descarte frames.
+    on_frame = recorder.record_frame if recorder is not None else None
+    if _telemetry_transport() == "shm":
+        return shm_transport.ShmRingWatcher(
+            _resolve_shm_path, queue, loop,
+            cadence=cadence, on_missing=_railworks_paths.invalidate, on_frame=on_frame,
+        )
+    return getdata_watcher.GetDataWatcher(
+        _railworks_paths.getdata_path, queue, loop,
+        cadence=cadence, on_missing=_railworks_paths.invalidate, on_frame=on_frame,
+    )
+
+
 async def telemetry_reader() -> None:
-    """Bucle de sondeo de GetData.txt; OCR al cerrar puertas y corrección única cerca de estación."""
-    global _active_station_tracker, _last_telemetry_data
-    sync_counter = 0
-    last_mtime = 0.0
-    last_game_telemetry_at = 0.0
-    ocr_door_was_open = False
-    station_tracker = station_distance.StationDistanceTracker()
-    _active_station_tracker = station_tracker
-    last_active_cab: Optional[int] = None
-    last_reversal: Optional[float] = None
-    stationary_since: Optional[float] = None
-
-    while True:
-        try:
-            now = time.time()
-            active_path = _resolve_getdata_path()
-
-            if active_path and os.path.exists(active_path):
-                mtime = os.path.getmtime(active_path)
-                if mtime > last_mtime:
-                    last_mtime = mtime
-                    with open(active_path, "r", encoding="utf-8") as f:
-                        line = f.readline()
-                    if line:
-                        last_game_telemetry_at = now
-                        data = parse_telemetry_line(line)
-                        door_l = float(data.get("DoorL") or 0.0)
-                        door_r = float(data.get("DoorR") or 0.0)
-
-                        doors_open_now = _doors_open(door_l, door_r)
-                        if doors_open_now:
-                            station_tracker.note_doors_opened()
-                        door_just_closed = ocr_door_was_open and not doors_open_now
-                        ocr_door_was_open = doors_open_now
-
-                        speed_ms = station_distance.speed_ms_from_telemetry(data)
-                        if speed_ms < station_distance.INITIAL_ANCHOR_MAX_SPEED_MS:
-                            if stationary_since is None:
-                                stationary_since = now
-                        else:
-                            stationary_since = None
-
-                        lua_station_raw = float(data.get("StationDistance") or -1)
-                        station_tracker.integrate(speed_ms, now)
-                        if lua_station_raw > 0:
-                            station_tracker.sync_lua_distance(
-                                lua_station_raw,
-                                now=now,
-                                speed_ms=speed_ms,
-                            )
-                        station_tracker.maybe_record_sample(now, speed_ms)
-
-                        enrich_cab_telemetry(data, _cab_inference_state)
-
-                        active_cab = _telemetry_int(data, "ActiveCab", default=1)
-                        reversal = _telemetry_float_from_keys(data, "Reversal", "Reverser")
-                        if station_distance.should_clear_on_turnaround(
-                            speed_ms=speed_ms,
-                            tracked_dist_m=station_tracker.distance_m(),
-                            active_cab=active_cab,
-                            reversal=reversal,
-                            last_active_cab=last_active_cab,
-                            last_reversal=last_reversal,
-                        ):
-                            station_tracker.clear()
-                        last_active_cab = active_cab
-                        last_reversal = reversal
-
-                        combined_control = _telemetry_float_from_keys(
-                            data, "CombinedControl", "Combined",
-                        )
-                        if station_distance.should_clear_on_departure_intent(
-                            speed_ms=speed_ms,
-                            tracked_dist_m=station_tracker.distance_m(),
-                            combined_control=combined_control,
-                        ):
-                            station_tracker.clear()
-
-                        _last_telemetry_data = data
-
-                        if ocr_hud.is_available() and not _ocr_is_capturing:
-                            if door_just_closed:
-                                asyncio.create_task(
-                                    execute_ocr_capture("door_anchor", speed_ms=speed_ms, capture_time=now),
-                                )
-                            elif station_tracker.should_request_initial_anchor(
-                                speed_ms,
-                                now,
-                                doors_open=doors_open_now,
-                                stationary_since=stationary_since,
-                            ):
-                                asyncio.create_task(
-                                    execute_ocr_capture("initial_anchor", speed_ms=speed_ms, capture_time=now),
-                                )
-                            elif station_tracker.should_request_near_correction(speed_ms, now):
-                                asyncio.create_task(
-                                    execute_ocr_capture("near_correction", speed_ms=speed_ms, capture_time=now),
-                                )
-                            elif (
-                                not doors_open_now
-                                and station_tracker.should_request_mid_leg_correction(speed_ms, now)
-                            ):
-                                asyncio.create_task(
-                                    execute_ocr_capture("mid_leg_correction", speed_ms=speed_ms, capture_time=now),
-                                )
-
-                        _apply_ocr_metadata(data, _ocr_last_result)
-                        _apply_station_distance(data, station_tracker)
-
-                        profile_id = (
-                            manager.current_profile.get("id")
-                            if manager.current_profile else None
-                        )
-                        _log_backend_telemetry_tick(data, profile_id)
-
-                        await manager.sync_auto_profile(str(data.get("LocoName") or ""))
-
-                        await manager.broadcast({
-                            "type": "TELEMETRY",
-                            **data,
-                            "timestamp": time.time(),
-                            "gameLinked": True,
-                        })
-                    sync_counter += 1
-                elif sync_counter % _HEARTBEAT_EVERY_N == 0:
-                    game_linked = (now - last_game_telemetry_at) <= _GAME_LINK_STALE_S
+    """Watcher de GetData.txt → pipeline por etapas; HEARTBEAT si no llegan frames."""
+    global _active_station_tracker, _telemetry_pipeline, _telemetry_processor, _frame_watcher
+    recorder = _create_frame_recorder()
+    processor = TelemetryProcessor(manager)
+    _telemetry_processor = processor
+    _active_station_tracker = processor.station_tracker
+    pipeline = processor.build_pipeline()
+    _telemetry_pipeline = pipeline
+
+    watcher = _create_frame_watcher(pipeline.inbox, asyncio.get_running_loop(), recorder)
+    _frame_watcher = watcher
+    pipeline.start()
+    watcher.start()
+
+    try:
+        while True:
+            await asyncio.sleep(_HEARTBEAT_INTERVAL_S)
+            try:
+                if recorder is not None:
+                    recorder.flush()
+                now = time.time()
+                idle_s = now - processor.last_game_telemetry_at
+                if idle_s >= _HEARTBEAT_INTERVAL_S:
                     await manager.broadcast({
                         "type": "HEARTBEAT",
                         "timestamp": now,
-                        "gameLinked": game_linked,
+                        "gameLinked": idle_s <= _GAME_LINK_STALE_S,
                     })
-                    sync_counter += 1
-                else:
-                    sync_counter += 1
-            elif sync_counter % _HEARTBEAT_EVERY_N == 0:
-                await manager.broadcast({
-                    "type": "HEARTBEAT",
-                    "timestamp": now,
-                    "gameLinked": False,
-                })
-                sync_counter += 1
-            else:
-                sync_counter += 1
+            except Exception as exc:
+                print(f"[Nexus] Error en telemetry_reader: {exc}")
+    finally:
+        watcher.stop()
+        await pipeline.stop()
+        if recorder is not None:
+            recorder.close()
+
 
-            await asyncio.sleep(_POLL_INTERVAL_S)
-        except Exception as exc:
-            print(f"[Nexus] Error en telemetry_reader: {exc}")
-            await asyncio.sleep(0.5)
+@app.get("/api/telemetry/status")
+async def telemetry_status():
+    """Estado del lector: fuente activa, frames rotos y latencia por etapa del pipeline."""
+    pipeline = _telemetry_pipeline
+    watcher = _frame_watcher
+    return {
+        "running": pipeline is not None,
+        "transport": _telemetry_transport(),
+        "paths": _railworks_paths.status(),
+        "reader": watcher.status() if watcher else None,
+        "stages": pipeline.status() if pipeline else {},
+        "processor": _telemetry_processor.status() if _telemetry_processor else None,
+        "clients": manager.clients_status(),
+        "evicted_clients": manager.evicted_clients,
+        "encoders": {"json": telemetry_codec.encoder_name(), "msgpack": telemetry_codec.MSGPACK_OK},
+        "field_ids": len(manager.field_table),
+        "init_encodes": manager.init_encodes,
+        "last_state": manager.state.status(),
+        "http": manager.http_status(),
+        "relay": manager.relay_status(),
+        # Worker relay: los logs de sesión son del ingest (ver _ingest_only).
+        "session_log": session_log._store.status() if manager.upstream is None else None,
+    }
+
+
+@app.get("/api/telemetry/stream")
+async def telemetry_stream(
+    request: Request,
+    fields: str = "",
+    max_hz: Optional[float] = None,
+    telemetry: Optional[str] = None,
+):
+    """SSE: INIT y después TELEMETRY (y el resto de mensajes del bus), un evento `data:` por mensaje."""
+    try:
+        subscription = http_stream.parse_http_subscription(fields, max_hz)
+    except ValueError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
+    sink = http_stream.SseSink(request.client)
+    manager.attach_stream(sink, subscription, protocol=telemetry)
+
+    async def events():
+        try:
+            async for chunk in sink.events():
+                yield chunk
+        finally:
+            manager.disconnect(sink)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/telemetry/latest")
+async def telemetry_latest(
+    since: int = 0,
+    fields: str = "",
+    max_hz: Optional[float] = None,
+    wait: float = http_stream.LONGPOLL_WAIT_S,
+):
+    """Long-poll: TELEMETRY con seq > since; 204 si no llega ninguno en `wait` segundos."""
+    try:
+        subscription = http_stream.parse_http_subscription(fields, max_hz)
+        text = await manager.latest_telemetry(
+            subscription,
+            since=since,
+            wait_s=min(max(wait, 0.0), http_stream.MAX_LONGPOLL_WAIT_S),
+        )
+    except ValueError as exc:
+        status = 429 if str(exc) == "too_many_subscriptions" else 400
+        return JSONResponse({"error": str(exc)}, status_code=status)
+    if text is None:
+        return Response(status_code=204)
+    return Response(text, media_type="application/json")
 
 
 @app.get("/api/station/distance-debug")
@@ -710,9 +1248,23 @@ async def station_distance_debug():
     return tracker.debug_payload()
 
 
+def _ingest_only() -> Optional[JSONResponse]:
+    """
+    Worker relay: 409 en los endpoints con estado en disco o del juego (logs de
+    sesión, brake_log, OCR). Varios procesos escribiendo y archivando los mismos
+    archivos se pisarían; eso solo lo hace el ingest (NEXUS_PORT propio).
+    """
+    if manager.upstream is None:
+        return None
+    return JSONResponse({"ok": False, "error": "ingest_only"}, status_code=409)
+
+
 @app.post("/api/ocr/capture")
 async def manual_ocr_capture():
     """Ancla manualmente la distancia OCR (p. ej. paso por waypoint sin parada)."""
+    refused = _ingest_only()
+    if refused is not None:
+        return refused
     speed_ms = station_distance.speed_ms_from_telemetry(_last_telemetry_data)
     return await execute_ocr_capture(
         "manual_anchor",
@@ -724,6 +1276,9 @@ async def manual_ocr_capture():
 @app.get("/api/ocr/debug")
 async def ocr_debug():
     """Captura la región OCR y devuelve imágenes de depuración + resultado parseado."""
+    refused = _ingest_only()
+    if refused is not None:
+        return refused
     if not ocr_hud.is_available():
         return {"error": "OCR no disponible (mss/pytesseract no instalados)"}
 
@@ -764,6 +1319,9 @@ async def ocr_debug():
 @app.post("/api/brake/event")
 async def post_brake_event(request: Request):
     """Registra un evento de frenado real capturado por el frontend."""
+    refused = _ingest_only()
+    if refused is not None:
+        return refused
     try:
         raw_body = await request.body()
         body = json.loads(raw_body.decode("utf-8"))
@@ -793,8 +1351,24 @@ async def get_brake_stats(profile: str = ""):
     return brake_log.get_stats(profile=profile or None)
 
 
+# Async solo por request.json(): lo que toca el store (y el disco) va en un hilo.
+def _start_rest_session(merged_meta: Dict[str, Any]) -> str:
+    session_id = session_log._store.open_or_attach(merged_meta)
+    session_log._store.append(session_id, [{
+        "type": "session_start",
+        "t": time.time(),
+        "wall": datetime.now(timezone.utc).isoformat(),
+        "meta": merged_meta,
+        "origin": "rest_start",
+    }])
+    return session_id
+
+
 @app.post("/api/debug/session/start")
 async def debug_session_start(request: Request):
+    refused = _ingest_only()
+    if refused is not None:
+        return refused
     try:
         body = await request.json()
     except Exception:
@@ -804,38 +1378,37 @@ async def debug_session_start(request: Request):
     meta = body.get("meta") if isinstance(body.get("meta"), dict) else {}
     if not meta:
         meta = {k: v for k, v in body.items() if k not in ("meta", "session_id")}
-    merged_meta = dict(meta if isinstance(meta, dict) else {})
+    merged_meta = _sanitize(dict(meta if isinstance(meta, dict) else {}))
     merged_meta["source"] = merged_meta.get("source") or "v4_session"
-    session_id = session_log._store.open_or_attach(merged_meta)
-    session_log._store.append(session_id, [{
-        "type": "session_start",
-        "t": time.time(),
-        "wall": datetime.now(timezone.utc).isoformat(),
-        "meta": merged_meta,
-        "origin": "rest_start",
-    }])
+    session_id = await asyncio.to_thread(_start_rest_session, merged_meta)
     return {"ok": True, "session_id": session_id}
 
 
 @app.patch("/api/debug/session/{session_id}/meta")
 async def debug_session_meta(session_id: str, request: Request):
+    refused = _ingest_only()
+    if refused is not None:
+        return refused
     try:
         body = await request.json()
     except Exception:
         body = {}
-    patch = body if isinstance(body, dict) else {}
-    saved = session_log._store.update_meta(session_id, patch)
+    patch = _sanitize(body) if isinstance(body, dict) else {}
+    saved = await asyncio.to_thread(session_log._store.update_meta, session_id, patch)
     return {"ok": saved}
 
 
 @app.post("/api/debug/session/{session_id}/events")
 async def debug_session_events(session_id: str, request: Request):
+    refused = _ingest_only()
+    if refused is not None:
+        return refused
     try:
         body = await request.json()
         events = body.get("events") if isinstance(body, dict) else []
         if not isinstance(events, list):
             events = []
-        saved = session_log._store.append(session_id, events)
+        saved = await asyncio.to_thread(session_log._store.append, session_id, _sanitize(events))
         return {"ok": saved}
     except Exception as exc:
         return {"ok": False, "error": str(exc)}
@@ -843,38 +1416,113 @@ async def debug_session_events(session_id: str, request: Request):
 
 @app.post("/api/debug/session/{session_id}/end")
 async def debug_session_end(session_id: str, request: Request):
+    refused = _ingest_only()
+    if refused is not None:
+        return refused
     try:
         body = await request.json()
         summary = body.get("summary") if isinstance(body, dict) else None
-        saved = session_log._store.end(session_id, summary if isinstance(summary, dict) else None)
+        saved = await asyncio.to_thread(
+            session_log._store.end,
+            session_id,
+            _sanitize(summary) if isinstance(summary, dict) else None,
+        )
         return {"ok": saved}
     except Exception as exc:
         return {"ok": False, "error": str(exc)}
 
 
+# Sin async: leen disco (y esperan al escritor), así que van al threadpool.
 @app.get("/api/debug/sessions")
-async def debug_sessions_list():
+def debug_sessions_list():
+    refused = _ingest_only()
+    if refused is not None:
+        return refused
     return {"sessions": session_log._store.list_sessions()}
 
 
+def _session_types(raw: Optional[str]) -> Optional[List[str]]:
+    """`?type=tick,ocr_capture` → lista de tipos (None = todos)."""
+    if not raw:
+        return None
+    return [t.strip() for t in raw.split(",") if t.strip()] or None
+
+
 @app.get("/api/debug/sessions/{session_id}")
-async def debug_session_get(session_id: str):
-    data = session_log._store.get(session_id)
+def debug_session_get(
+    session_id: str,
+    tail: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: Optional[int] = None,
+    event_type: Optional[str] = Query(None, alias="type"),
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+):
+    """
+    Sin parámetros: la sesión completa. `?tail=N`: los últimos N eventos (sesión
+    en curso: desde memoria). `?after=&limit=&type=&since=&until=`: una página
+    por cursor con filtros; la respuesta trae `next` y `has_more`.
+    """
+    refused = _ingest_only()
+    if refused is not None:
+        return refused
+    types = _session_types(event_type)
+    if after is not None or limit is not None or types or since is not None or until is not None:
+        data = session_log._store.page(
+            session_id,
+            after=after or 0,
+            limit=limit or session_log.PAGE_LIMIT,
+            types=types,
+            since=since,
+            until=until,
+        )
+    else:
+        data = session_log._store.get(session_id, tail=tail)
     if data is None:
         return {"error": "not_found"}
     return data
 
 
+@app.get("/api/debug/sessions/{session_id}/export")
+def debug_session_export(
+    session_id: str,
+    event_type: Optional[str] = Query(None, alias="type"),
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+):
+    """NDJSON en streaming: cabecera en la primera línea y luego un evento por línea."""
+    refused = _ingest_only()
+    if refused is not None:
+        return refused
+    chunks = session_log._store.export(session_id, _session_types(event_type), since, until)
+    if chunks is None:
+        return {"error": "not_found"}
+    return StreamingResponse(
+        chunks,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="session_{session_id}.ndjson"'},
+    )
+
+
 @app.websocket("/ws/telemetry")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    encoding, subprotocol = telemetry_codec.negotiate_encoding(
+        websocket.query_params.get("encoding"),
+        websocket.scope.get("subprotocols") or (),
+    )
+    await manager.connect(
+        websocket,
+        protocol=websocket.query_params.get("telemetry"),
+        encoding=encoding,
+        subprotocol=subprotocol,
+    )
     try:
         while True:
             try:
                 cmd = await websocket.receive_json()
-                ack = await manager.handle_command(cmd)
+                ack = await manager.handle_command(cmd, websocket)
                 if ack:
-                    await websocket.send_json(_sanitize(ack))
+                    manager.send_to(websocket, ack)
             except WebSocketDisconnect:
                 break
             except Exception:
@@ -886,12 +1534,15 @@ async def websocket_endpoint(websocket: WebSocket):
 if __name__ == "__main__":
     import uvicorn
 
+    # reload obliga a un solo proceso: con NEXUS_WORKERS > 1 (workers relay) se desactiva.
+    workers = relay.workers_from_env()
+    reload_options: Dict[str, Any] = {"reload": True, "reload_dirs": ["."]} if workers == 1 else {}
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
-        port=8000,
-        reload=True,
-        reload_dirs=["."],
+        port=int(os.environ.get("NEXUS_PORT", "8000")),
+        workers=workers,
+        **reload_options,
         loop="asyncio",
         ws_ping_interval=20,
         ws_ping_timeout=20,
@@ -0,0 +1,272 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import getdata_watcher
+from core.parser import parse_telemetry_line
+
+
+def _lua_write(path: str, line: str) -> None:
+    """Emula WriteData() del plugin: io.open(..., "w") + write + close."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(line)
+
+
+class TestPutLatest(unittest.TestCase):
+    def test_keeps_only_latest(self):
+        async def run():
+            queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+            getdata_watcher.put_latest(queue, getdata_watcher.RawFrame(1.0, "a"))
+            getdata_watcher.put_latest(queue, getdata_watcher.RawFrame(2.0, "b"))
+            self.assertEqual(queue.qsize(), 1)
+            return queue.get_nowait()
+
+        self.assertEqual(asyncio.run(run()).line, "b")
+
+
+class TestFrameValidator(unittest.TestCase):
+    FULL = "SpeedoType:1|CurrentSpeed:10.0||NexusLuaVersion:3|SimulationTime:12.50"
+
+    def test_accepts_frame_with_sentinel(self):
+        validator = getdata_watcher.FrameValidator()
+        self.assertEqual(validator.read_valid(lambda: self.FULL), self.FULL)
+        self.assertTrue(validator.has_sentinel)
+        self.assertEqual(validator.status()["ok"], 1)
+
+    def test_retries_torn_frame_within_tick(self):
+        validator = getdata_watcher.FrameValidator()
+        validator.accept(self.FULL)
+        reads = iter([self.FULL[:20], self.FULL])
+        line = validator.read_valid(lambda: next(reads), delay_s=0.0)
+        self.assertEqual(line, self.FULL)
+        self.assertEqual(validator.torn_reads, 1)
+        self.assertEqual(validator.recovered, 1)
+
+    def test_drops_frame_that_stays_torn(self):
+        validator = getdata_watcher.FrameValidator()
+        validator.accept(self.FULL)
+        reads = iter([self.FULL[:10], self.FULL[:15], self.FULL[:20], self.FULL[:25]])
+        self.assertIsNone(validator.read_valid(lambda: next(reads), retries=3, delay_s=0.0))
+        self.assertEqual(validator.dropped, 1)
+        self.assertEqual(validator.torn_reads, 4)
+
+    def test_stable_line_without_sentinel_is_new_layout(self):
+        validator = getdata_watcher.FrameValidator()
+        validator.accept(self.FULL)
+        legacy = "SpeedoType:1|CurrentSpeed:10.0"
+        self.assertEqual(validator.read_valid(lambda: legacy, delay_s=0.0), legacy)
+        self.assertEqual(validator.layout_changes, 1)
+        self.assertFalse(validator.has_sentinel)
+
+    def test_token_count_without_sentinel(self):
+        validator = getdata_watcher.FrameValidator()
+        validator.accept("A:1|B:2|C:3")
+        self.assertTrue(validator.is_complete("A:1|B:2|C:4"))
+        self.assertFalse(validator.is_complete("A:1|B:2"))
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAdaptiveCadence(unittest.TestCase):
+    def test_fast_while_frames_arrive(self):
+        clock = _FakeClock()
+        cadence = getdata_watcher.AdaptiveCadence(fast_s=0.01, max_s=1.0, stale_s=4.0, clock=clock)
+        for _ in range(10):
+            clock.now += 0.01
+            cadence.note_frame()
+            self.assertEqual(cadence.next_interval(), 0.01)
+        self.assertFalse(cadence.backing_off)
+
+    def test_backs_off_when_stale_and_snaps_back(self):
+        clock = _FakeClock()
+        cadence = getdata_watcher.AdaptiveCadence(fast_s=0.01, max_s=1.0, stale_s=4.0, clock=clock)
+        clock.now = 5.0
+        intervals = [cadence.next_interval() for _ in range(10)]
+        self.assertEqual(intervals[0], 0.02)
+        self.assertEqual(intervals[-1], 1.0)
+        status = cadence.status()
+        self.assertTrue(status["backing_off"])
+        self.assertEqual(status["target_hz"], 1.0)
+        cadence.note_frame()
+        self.assertEqual(cadence.next_interval(), 0.01)
+        self.assertEqual(cadence.status()["target_hz"], 100.0)
+
+    def test_polling_source_uses_cadence(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, "GetData.txt")
+            _lua_write(path, "Speed:1")
+            clock = _FakeClock()
+            cadence = getdata_watcher.AdaptiveCadence(fast_s=0.001, max_s=0.004, stale_s=1.0, clock=clock)
+            clock.now = 10.0
+            source = getdata_watcher.PollingSource(path, cadence=cadence)
+            self.assertFalse(source.wait(0.05))
+            self.assertEqual(cadence.interval_s, 0.004)
+            _lua_write(path, "Speed:2")
+            os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+            self.assertTrue(source.wait(0.5))
+            self.assertEqual(cadence.interval_s, 0.001)
+        finally:
+            shutil.rmtree(tmp)
+
+
+class TestChangeSources(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "GetData.txt")
+        _lua_write(self.path, "Speed:1|SimulationTime:1.00")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_polling_detects_write(self):
+        source = getdata_watcher.PollingSource(self.path, interval_s=0.001)
+        self.assertFalse(source.wait(0.01))
+        time.sleep(0.01)
+        _lua_write(self.path, "Speed:2|SimulationTime:2.00")
+        os.utime(self.path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+        self.assertTrue(source.wait(0.5))
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify solo en Linux")
+    def test_inotify_detects_write_and_ignores_other_files(self):
+        source = getdata_watcher.InotifySource(self.path)
+        try:
+            self.assertFalse(source.wait(0.01))
+            _lua_write(os.path.join(self.tmp, "SendCommand.txt"), "Throttle:1")
+            self.assertFalse(source.wait(0.05))
+            _lua_write(self.path, "Speed:2|SimulationTime:2.00")
+            self.assertTrue(source.wait(0.5))
+        finally:
+            source.close()
+
+    def test_change_source_requires_wait(self):
+        with self.assertRaises(TypeError):
+            getdata_watcher.ChangeSource(self.path)
+
+    def test_factory_honours_forced_polling(self):
+        source = getdata_watcher.create_change_source(self.path, prefer="polling")
+        self.assertIsInstance(source, getdata_watcher.PollingSource)
+
+
+class TestGetDataWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "GetData.txt")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_emits_initial_and_new_frames(self):
+        _lua_write(self.path, "Speed:10|SimulationTime:1.00")
+
+        async def run():
+            queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+            watcher = getdata_watcher.GetDataWatcher(
+                lambda: self.path,
+                queue,
+                asyncio.get_running_loop(),
+            )
+            watcher.start()
+            try:
+                first = await asyncio.wait_for(queue.get(), timeout=2.0)
+                await asyncio.sleep(0.02)
+                _lua_write(self.path, "Speed:20|SimulationTime:2.00")
+                second = await asyncio.wait_for(queue.get(), timeout=2.0)
+            finally:
+                watcher.stop()
+            return first, second
+
+        first, second = asyncio.run(run())
+        self.assertEqual(parse_telemetry_line(first.line)["Speed"], 10.0)
+        self.assertEqual(parse_telemetry_line(second.line)["Speed"], 20.0)
+
+    def test_event_driven_source_reports_no_poll_cadence(self):
+        _lua_write(self.path, "Speed:10|SimulationTime:1.00")
+
+        class _EventSource(getdata_watcher.PollingSource):
+            name = "fake-events"
+            event_driven = True
+
+        def factory(path, cadence=None):
+            return _EventSource(path, interval_s=0.001)
+
+        async def run():
+            queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+            watcher = getdata_watcher.GetDataWatcher(
+                lambda: self.path,
+                queue,
+                asyncio.get_running_loop(),
+                source_factory=factory,
+            )
+            watcher.start()
+            try:
+                await asyncio.wait_for(queue.get(), timeout=2.0)
+                return watcher.status()["cadence"]
+            finally:
+                watcher.stop()
+
+        cadence = asyncio.run(run())
+        self.assertEqual(cadence["mode"], "event-driven")
+        self.assertIsNone(cadence["target_hz"])
+        self.assertLess(cadence["idle_s"], 1.0)
+
+    def test_waits_for_missing_file(self):
+        async def run():
+            queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+            watcher = getdata_watcher.GetDataWatcher(
+                lambda: self.path if os.path.exists(self.path) else None,
+                queue,
+                asyncio.get_running_loop(),
+            )
+            watcher.start()
+            try:
+                await asyncio.sleep(0.05)
+                self.assertTrue(queue.empty())
+                self.assertIsNone(watcher.source_name)
+            finally:
+                watcher.stop()
+
+        asyncio.run(run())
+
+    def test_on_frame_sees_frames_the_queue_drops(self):
+        _lua_write(self.path, "Speed:0|SimulationTime:0.00")
+        seen = []
+
+        async def run():
+            queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+            watcher = getdata_watcher.GetDataWatcher(
+                lambda: self.path,
+                queue,
+                asyncio.get_running_loop(),
+                on_frame=seen.append,
+            )
+            watcher.start()
+            try:
+                for i in range(1, 4):
+                    await asyncio.sleep(0.05)
+                    _lua_write(self.path, f"Speed:{i}|SimulationTime:{i}.00")
+                await asyncio.sleep(0.1)
+            finally:
+                watcher.stop()
+            return queue
+
+        queue = asyncio.run(run())
+        self.assertEqual([parse_telemetry_line(r.line)["Speed"] for r in seen], [0.0, 1.0, 2.0, 3.0])
+        self.assertEqual(queue.qsize(), 1)
+        self.assertEqual(parse_telemetry_line(queue.get_nowait().line)["Speed"], 3.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
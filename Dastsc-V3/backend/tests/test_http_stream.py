@@ -0,0 +1,72 @@
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import http_stream
+from core.ws_protocol import Subscription
+
+
+class TestParseHttpSubscription(unittest.TestCase):
+    def test_fields_and_rate_cap(self):
+        sub = http_stream.parse_http_subscription("CurrentSpeed, Throttle,", 50)
+        self.assertEqual(sub.fields, frozenset({"CurrentSpeed", "Throttle"}))
+        self.assertEqual(sub.max_hz, http_stream.DEFAULT_HTTP_MAX_HZ)
+        self.assertEqual(http_stream.parse_http_subscription("*", 2), Subscription(None, 2.0))
+
+    def test_cap_from_env_and_invalid_rate(self):
+        with patch.dict(os.environ, {"NEXUS_HTTP_TELEMETRY_MAX_HZ": "4"}):
+            self.assertEqual(http_stream.parse_http_subscription("", None).max_hz, 4.0)
+        with self.assertRaises(ValueError):
+            http_stream.parse_http_subscription("", -1)
+
+
+class TestSseSink(unittest.TestCase):
+    def test_events_until_close(self):
+        async def run():
+            sink = http_stream.SseSink()
+            await sink.send_text('{"type": "INIT"}')
+            await sink.send_text('{"type": "TELEMETRY"}')
+            await sink.close(1013)
+            return [chunk async for chunk in sink.events()], sink.closed_with
+
+        chunks, code = asyncio.run(run())
+        self.assertEqual(chunks, ['data: {"type": "INIT"}\n\n', 'data: {"type": "TELEMETRY"}\n\n'])
+        self.assertEqual(code, 1013)
+
+
+class TestLatestChannel(unittest.TestCase):
+    def test_wait_returns_newer_frame_or_times_out(self):
+        async def run():
+            channel = http_stream.LatestChannel(Subscription())
+            timed_out = await channel.wait(0, 0.01)
+            waiter = asyncio.create_task(channel.wait(0, 1.0))
+            await asyncio.sleep(0)
+            channel.last_seq = 7
+            channel.offer_telemetry('{"seq": 7}')
+            newer = await waiter
+            immediate = await channel.wait(3, 0.0)
+            stale = await channel.wait(7, 0.0)
+            return timed_out, newer, immediate, stale, channel.status()
+
+        timed_out, newer, immediate, stale, status = asyncio.run(run())
+        self.assertIsNone(timed_out)
+        self.assertEqual(newer, (7, '{"seq": 7}'))
+        self.assertEqual(immediate, (7, '{"seq": 7}'))
+        self.assertIsNone(stale)
+        self.assertEqual(status["served"], 2)
+        self.assertEqual(status["waiters"], 0)
+
+    def test_idle_only_without_waiters(self):
+        channel = http_stream.LatestChannel(Subscription())
+        channel.touched_at = 0.0
+        self.assertTrue(channel.idle(http_stream.LATEST_IDLE_S + 1))
+        channel.waiters = 1
+        self.assertFalse(channel.idle(http_stream.LATEST_IDLE_S + 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.last_state import LastKnownState, StateSlot
+
+
+class TestStateSlot(unittest.TestCase):
+    def setUp(self):
+        self.now = [0.0]
+        self.calls = 0
+
+    def _encode(self, value):
+        self.calls += 1
+        return json.dumps(value)
+
+    def test_encodes_once_per_value(self):
+        slot = StateSlot("x", clock=lambda: self.now[0])
+        self.assertIsNone(slot.encoded(self._encode))
+        slot.set({"a": 1})
+        self.assertEqual(slot.encoded(self._encode), '{"a": 1}')
+        slot.encoded(self._encode)
+        self.assertEqual(self.calls, 1)
+        slot.set({"a": 2})
+        self.assertEqual(slot.encoded(self._encode), '{"a": 2}')
+        self.assertEqual(self.calls, 2)
+
+    def test_age_and_size_bounds(self):
+        slot = StateSlot("x", max_age_s=5.0, max_bytes=16, clock=lambda: self.now[0])
+        slot.set({"a": 1})
+        self.now[0] = 6.0
+        self.assertIsNone(slot.encoded(self._encode))
+        self.assertEqual(slot.status()["age_s"], 6.0)
+        slot.set({"long": "x" * 32})
+        self.assertIsNone(slot.encoded(self._encode))
+        self.assertEqual(slot.oversize, 1)
+
+
+class TestLastKnownState(unittest.TestCase):
+    def test_link_rewritten_only_on_transition(self):
+        state = LastKnownState()
+        state.note_telemetry({"type": "TELEMETRY", "timestamp": 1.0})
+        version = state.link.version
+        state.note_telemetry({"type": "TELEMETRY", "timestamp": 2.0})
+        self.assertEqual(state.link.version, version)
+        state.note_heartbeat({"type": "HEARTBEAT", "timestamp": 9.0, "gameLinked": False})
+        state.note_telemetry({"type": "TELEMETRY", "timestamp": 10.0})
+        self.assertEqual(state.link.value, {"gameLinked": True, "timestamp": 10.0})
+
+    def test_profile_slot(self):
+        state = LastKnownState()
+        state.note_profile({"id": "class323", "name": "Class 323"})
+        self.assertEqual(state.profile.value["active_profile_id"], "class323")
+        state.note_profile(None)
+        self.assertEqual(state.profile.value, {"active_profile": None, "active_profile_id": None})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,10 +2,12 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import asyncio
 import json
 import math
 import shutil
 import tempfile
+import threading
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -17,12 +19,32 @@ from main import (
     _apply_ocr_metadata,
     _apply_station_distance,
     _doors_open,
-    _resolve_getdata_path,
     _resolve_profiles_dir,
     _sanitize,
 )
+from core import http_stream, telemetry_codec
+from core.getdata_watcher import RawFrame
 from core.station_distance import StationDistanceTracker
 
+_PREV_LOG_DIR = None
+_LOG_DIR = None
+
+
+def setUpModule():
+    # El procesador y los endpoints de sesión escriben logs: fuera del repo.
+    global _PREV_LOG_DIR, _LOG_DIR
+    _PREV_LOG_DIR = os.environ.get("NEXUS_V4_LOG_DIR")
+    _LOG_DIR = tempfile.mkdtemp()
+    os.environ["NEXUS_V4_LOG_DIR"] = _LOG_DIR
+
+
+def tearDownModule():
+    if _PREV_LOG_DIR is None:
+        os.environ.pop("NEXUS_V4_LOG_DIR", None)
+    else:
+        os.environ["NEXUS_V4_LOG_DIR"] = _PREV_LOG_DIR
+    shutil.rmtree(_LOG_DIR, ignore_errors=True)
+
 
 class TestMainHelpers(unittest.TestCase):
     def test_sanitize_finite_float(self):
@@ -55,23 +77,6 @@ class TestMainHelpers(unittest.TestCase):
         resolved = _resolve_profiles_dir(["/nonexistent/path/xyz"])
         self.assertEqual(resolved, main._DEFAULT_PROFILES_DIR)
 
-    def test_resolve_getdata_path(self):
-        base = tempfile.mkdtemp()
-        try:
-            plugin = os.path.join(base, "plugin.txt")
-            alt = os.path.join(base, "alt.txt")
-            with open(plugin, "w", encoding="utf-8") as f:
-                f.write("test")
-            self.assertEqual(_resolve_getdata_path(plugin, alt), plugin)
-            os.remove(plugin)
-            with open(alt, "w", encoding="utf-8") as f:
-                f.write("test")
-            self.assertEqual(_resolve_getdata_path(plugin, alt), alt)
-            os.remove(alt)
-            self.assertIsNone(_resolve_getdata_path(plugin, alt))
-        finally:
-            shutil.rmtree(base)
-
     def test_doors_open(self):
         self.assertFalse(_doors_open(0.0, 0.0))
         self.assertTrue(_doors_open(0.6, 0.0))
@@ -106,6 +111,28 @@ class TestMainHelpers(unittest.TestCase):
         self.assertGreater(data["StationTraveledM"], 0)
 
 
+class _FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.binary = []
+
+    async def accept(self, subprotocol=None):
+        self.subprotocol = subprotocol
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        self.binary.append(data)
+        self.sent.append({"type": "<binary>"})
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
 class TestTelemetryManager(unittest.TestCase):
     def setUp(self):
         self.test_dir = tempfile.mkdtemp()
@@ -135,12 +162,468 @@ class TestTelemetryManager(unittest.TestCase):
         import asyncio
         asyncio.run(self._test_select_profile())
 
+    def test_init_head_is_encoded_once_per_profile_reload(self):
+        async def run():
+            first = [_FakeWebSocket() for _ in range(3)]
+            for ws in first:
+                await self.manager.connect(ws)
+            await self.manager.broadcast({"type": "HEARTBEAT", "timestamp": 1.0, "gameLinked": False})
+            after_heartbeat = _FakeWebSocket()
+            await self.manager.connect(after_heartbeat)
+            encodes_before_reload = self.manager.init_encodes
+            self.manager.profile_manager.load_profiles()
+            late = _FakeWebSocket()
+            await self.manager.connect(late)
+            await asyncio.sleep(0.01)
+            return first, after_heartbeat, encodes_before_reload, late
+
+        first, after_heartbeat, encodes_before_reload, late = asyncio.run(run())
+        self.assertEqual(encodes_before_reload, 1)
+        self.assertEqual(self.manager.init_encodes, 2)
+        self.assertTrue(all(ws.sent[0] == first[0].sent[0] for ws in first))
+        self.assertEqual(after_heartbeat.sent[0]["link"], {"gameLinked": False, "timestamp": 1.0})
+        self.assertEqual(len(late.sent[0]["available_profiles"]), 1)
+
+    def test_init_keeps_state_in_separate_slots(self):
+        async def run():
+            await self.manager.broadcast({"type": "TELEMETRY", "Speed": 5.0, "timestamp": 2.0})
+            await self.manager.handle_command({"type": "SELECT_PROFILE", "profile_id": "test"})
+            await self.manager.broadcast({"type": "HEARTBEAT", "timestamp": 3.0, "gameLinked": True})
+            return self.manager._build_init_payload()
+
+        init = asyncio.run(run())
+        self.assertEqual(init["type"], "INIT")
+        self.assertNotIn("seq", init)
+        self.assertNotIn("Speed", init)
+        self.assertEqual(init["active_profile_id"], "test")
+        self.assertEqual(init["telemetry"]["Speed"], 5.0)
+        self.assertEqual(init["telemetry"]["seq"], 1)
+        self.assertEqual(init["link"]["timestamp"], 3.0)
+
+    def test_init_drops_stale_telemetry(self):
+        clock = [0.0]
+        self.manager.state = main.LastKnownState(clock=lambda: clock[0])
+        asyncio.run(self.manager.broadcast({"type": "TELEMETRY", "Speed": 5.0}))
+        self.assertIn("telemetry", self.manager._build_init_payload())
+        clock[0] = 60.0
+        init = self.manager._build_init_payload()
+        self.assertNotIn("telemetry", init)
+        self.assertTrue(init["link"]["gameLinked"])
+
+    def test_delta_clients_get_keyframe_then_patches(self):
+        async def run():
+            full, delta = _FakeWebSocket(), _FakeWebSocket()
+            await self.manager.connect(full)
+            await self.manager.connect(delta, protocol="delta")
+            await self.manager.broadcast({"type": "TELEMETRY", "Speed": 1.0, "Throttle": 0.5}, delta=None)
+            await asyncio.sleep(0.01)
+            await self.manager.broadcast({"type": "TELEMETRY", "Speed": 2.0, "Throttle": 0.5},
+                                         delta={"Speed": 2.0})
+            await asyncio.sleep(0.01)
+            return full.sent, delta.sent
+
+        full_sent, delta_sent = asyncio.run(run())
+        self.assertEqual([m.get("seq") for m in full_sent[1:]], [1, 2])
+        self.assertEqual(full_sent[2]["Throttle"], 0.5)
+        self.assertTrue(delta_sent[1]["keyframe"])
+        self.assertEqual(delta_sent[2]["type"], "TELEMETRY_DELTA")
+        self.assertEqual(delta_sent[2]["base"], 1)
+        self.assertEqual(delta_sent[2]["changes"], {"Speed": 2.0})
+
+    def test_broadcast_encodes_once_for_all_clients(self):
+        async def run():
+            clients = [_FakeWebSocket() for _ in range(3)]
+            for ws in clients:
+                await self.manager.connect(ws)
+            with patch("main.encode_json", wraps=main.encode_json) as encode:
+                await self.manager.broadcast({"type": "TELEMETRY", "Speed": 1.0})
+            await asyncio.sleep(0.01)
+            return clients, encode.call_count
+
+        clients, calls = asyncio.run(run())
+        self.assertEqual(calls, 1)
+        self.assertTrue(all(ws.sent[-1]["Speed"] == 1.0 for ws in clients))
+
+    def test_slow_client_is_evicted_and_closed(self):
+        async def run():
+            ws = _FakeWebSocket()
+            await self.manager.connect(ws)
+            client = self.manager.clients[ws]
+            client.stop()  # escritor parado: simula un cliente que no consume
+            client.max_dropped_streak = 5
+            for i in range(10):
+                await self.manager.broadcast({"type": "TELEMETRY", "Speed": float(i)})
+            await asyncio.sleep(0.01)
+            return ws
+
+        ws = asyncio.run(run())
+        self.assertNotIn(ws, self.manager.active_connections)
+        self.assertEqual(self.manager.evicted_clients, 1)
+        self.assertEqual(ws.closed_with, 1013)
+
+    @patch("main.encode_json", side_effect=lambda obj: json.dumps(obj, allow_nan=False))
+    def test_broadcast_falls_back_to_sanitize_on_nan(self, _encode):
+        async def run():
+            ws = _FakeWebSocket()
+            await self.manager.connect(ws)
+            await self.manager.broadcast({"type": "PROFILE_CHANGED", "active_profile": {"x": float("inf")}})
+            await asyncio.sleep(0.01)
+            return ws.sent
+
+        sent = asyncio.run(run())
+        self.assertEqual(sent[-1]["active_profile"]["x"], 0.0)
+
+    def test_profile_changed_is_finite_with_either_encoder(self):
+        with open(os.path.join(self.test_dir, "nan.json"), "w", encoding="utf-8") as f:
+            f.write('{"name": "NaN Loco", "maxSpeed": NaN}')
+        self.manager.profile_manager.load_profiles()
+
+        async def run():
+            ws = _FakeWebSocket()
+            await self.manager.connect(ws)
+            await self.manager.handle_command({"type": "SELECT_PROFILE", "profile_id": "nan"})
+            await asyncio.sleep(0.01)
+            return [m for m in ws.sent if m["type"] == "PROFILE_CHANGED"][-1]
+
+        for orjson_ok in (telemetry_codec.ORJSON_OK, False):
+            with patch.object(telemetry_codec, "ORJSON_OK", orjson_ok):
+                changed = asyncio.run(run())
+            self.assertEqual(changed["active_profile"]["maxSpeed"], 0.0)
+
+    @unittest.skipUnless(telemetry_codec.MSGPACK_OK, "msgpack no instalado")
+    def test_msgpack_client_gets_field_ids_then_binary_frames(self):
+        import msgpack
+
+        async def run():
+            text_ws, binary_ws = _FakeWebSocket(), _FakeWebSocket()
+            await self.manager.connect(text_ws)
+            await self.manager.connect(binary_ws, encoding="msgpack", subprotocol="nexus.msgpack")
+            await self.manager.broadcast({"type": "TELEMETRY", "CurrentSpeed": 12.5, "timestamp": 1.0})
+            await asyncio.sleep(0.01)
+            return text_ws, binary_ws
+
+        text_ws, binary_ws = asyncio.run(run())
+        self.assertNotIn("field_ids", text_ws.sent[0])
+        self.assertEqual(text_ws.sent[-1]["CurrentSpeed"], 12.5)
+        init, fields, frame = binary_ws.sent
+        self.assertEqual(binary_ws.subprotocol, "nexus.msgpack")
+        self.assertEqual(init["encoding"], "msgpack")
+        self.assertEqual(fields["type"], "FIELD_IDS")
+        names = {v: k for k, v in {**init["field_ids"], **fields["field_ids"]}.items()}
+        self.assertEqual(frame["type"], "<binary>")
+        decoded = {names[k]: v for k, v in msgpack.unpackb(binary_ws.binary[0], strict_map_key=False).items()}
+        self.assertEqual(decoded["CurrentSpeed"], 12.5)
+        self.assertEqual(decoded["seq"], 1)
+
+    @unittest.skipUnless(telemetry_codec.MSGPACK_OK, "msgpack no instalado")
+    def test_frames_published_while_connecting_reach_the_client(self):
+        import msgpack
+
+        class _SlowWebSocket(_FakeWebSocket):
+            async def send_text(self, text):
+                await asyncio.sleep(0.005)
+                await super().send_text(text)
+
+        async def run():
+            ws = _SlowWebSocket()
+            connecting = asyncio.create_task(
+                self.manager.connect(ws, encoding="msgpack", subprotocol="nexus.msgpack")
+            )
+            await asyncio.sleep(0)
+            await self.manager.broadcast({"type": "TELEMETRY", "NewKey": 3.0, "timestamp": 1.0})
+            await connecting
+            await asyncio.sleep(0.05)
+            return ws
+
+        ws = asyncio.run(run())
+        known = {}
+        for message in ws.sent:
+            known.update(message.get("field_ids") or {})
+        names = {v: k for k, v in known.items()}
+        self.assertEqual(ws.sent[0]["type"], "INIT")
+        self.assertEqual(len(ws.binary), 1)
+        decoded = {names[k]: v for k, v in msgpack.unpackb(ws.binary[0], strict_map_key=False).items()}
+        self.assertEqual(decoded["NewKey"], 3.0)
+
+    def test_session_events_are_sanitized(self):
+        with patch("main.session_log._store") as store:
+            store.append.return_value = True
+            asyncio.run(self.manager.handle_command({
+                "type": "SESSION_EVENTS",
+                "session_id": "abc",
+                "events": [{"type": "tick", "speed": float("nan")}],
+            }))
+        events = store.append.call_args[0][1]
+        self.assertEqual(events[0]["speed"], 0.0)
+
+    def test_session_commands_touch_the_store_off_the_event_loop(self):
+        threads = []
+
+        def record(*args):
+            threads.append(threading.get_ident())
+            return True
+
+        async def run():
+            with patch("main.session_log._store") as store:
+                store.append.side_effect = record
+                store.adopt_session.side_effect = record
+                await self.manager.handle_command({"type": "SESSION_REGISTER", "session_id": "abc"})
+                await self.manager.handle_command({"type": "SESSION_EVENTS", "session_id": "abc", "events": []})
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(run())
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(loop_thread, threads)
+
+    def test_subscribe_projects_and_rate_limits(self):
+        clock = [0.0]
+        self.manager._clock = lambda: clock[0]
+
+        async def run():
+            overlay_a, overlay_b, full = _FakeWebSocket(), _FakeWebSocket(), _FakeWebSocket()
+            for ws in (overlay_a, overlay_b, full):
+                await self.manager.connect(ws)
+            for ws in (overlay_a, overlay_b):
+                ack = await self.manager.handle_command(
+                    {"type": "SUBSCRIBE", "fields": ["CurrentSpeed"], "max_hz": 10}, ws,
+                )
+                self.assertTrue(ack["ok"])
+            with patch("main.encode_json", wraps=main.encode_json) as encode:
+                for i, t in enumerate((0.0, 0.05, 0.1)):
+                    clock[0] = t
+                    await self.manager.broadcast(
+                        {"type": "TELEMETRY", "CurrentSpeed": float(i), "Throttle": 0.5},
+                        delta={"CurrentSpeed": float(i)} if i else None,
+                    )
+                    await asyncio.sleep(0.01)
+            return overlay_a.sent[1:], overlay_b.sent[1:], full.sent[1:], encode.call_count
+
+        overlay_a, overlay_b, full, encodes = asyncio.run(run())
+        self.assertEqual(len(full), 3)
+        self.assertEqual([m["CurrentSpeed"] for m in overlay_a], [0.0, 2.0])
+        self.assertNotIn("Throttle", overlay_a[0])
+        self.assertEqual(overlay_a, overlay_b)
+        # 3 frames completos + 2 del grupo overlay (compartidos entre sus dos clientes).
+        self.assertEqual(encodes, 5)
+
+    def test_subscribe_rejects_bad_rate(self):
+        async def run():
+            ws = _FakeWebSocket()
+            await self.manager.connect(ws)
+            return await self.manager.handle_command({"type": "SUBSCRIBE", "max_hz": -1}, ws)
+
+        self.assertEqual(asyncio.run(run())["error"], "invalid_max_hz")
+
+    def test_http_consumers_share_the_group_encode(self):
+        clock = [0.0]
+        self.manager._clock = lambda: clock[0]
+        subscription = http_stream.parse_http_subscription("CurrentSpeed", 10)
+
+        async def run():
+            ws = _FakeWebSocket()
+            await self.manager.connect(ws)
+            await self.manager.handle_command(
+                {"type": "SUBSCRIBE", "fields": ["CurrentSpeed"], "max_hz": 10}, ws,
+            )
+            sink = http_stream.SseSink()
+            self.manager.attach_stream(sink, subscription)
+            poll = asyncio.create_task(self.manager.latest_telemetry(subscription, wait_s=1.0))
+            await asyncio.sleep(0)
+            with patch("main.encode_json", wraps=main.encode_json) as encode:
+                await self.manager.broadcast({"type": "TELEMETRY", "CurrentSpeed": 3.0, "Throttle": 0.5})
+            polled = json.loads(await poll)
+            await asyncio.sleep(0.01)
+            events = sink.events()
+            chunks = [await events.__anext__() for _ in range(2)]
+            stale = await self.manager.latest_telemetry(subscription, since=1)
+            clock[0] = http_stream.LATEST_IDLE_S + 1
+            await self.manager.broadcast({"type": "TELEMETRY", "CurrentSpeed": 4.0})
+            return ws.sent[1:], polled, chunks, stale, encode.call_count
+
+        ws_sent, polled, chunks, stale, encodes = asyncio.run(run())
+        self.assertEqual(encodes, 1)
+        self.assertEqual(ws_sent, [polled])
+        self.assertEqual(polled, {"type": "TELEMETRY", "seq": 1, "CurrentSpeed": 3.0})
+        self.assertEqual(json.loads(chunks[0][len("data: "):])["type"], "INIT")
+        self.assertEqual(json.loads(chunks[1][len("data: "):]), polled)
+        self.assertIsNone(stale)
+        self.assertEqual(self.manager.latest_channels, {})
+        self.assertEqual(self.manager.http_status()["sse"], 1)
+
+    def test_relay_modes(self):
+        published = []
+        upstream = MagicMock()
+        upstream.send_command.side_effect = [True, False]
+
+        async def run():
+            self.manager.relay = MagicMock(publish=lambda m, d: published.append((m["type"], d)))
+            await self.manager.broadcast({"type": "TELEMETRY", "Speed": 1.0}, delta={"Speed": 1.0})
+            self.manager.relay = None
+
+            self.manager.upstream = upstream
+            await self.manager.apply_relayed(
+                {"type": "PROFILE_CHANGED", "active_profile": {"id": "test"}, "active_profile_id": "test"},
+                None,
+            )
+            ws = _FakeWebSocket()
+            await self.manager.connect(ws)
+            relayed = await self.manager.handle_command({"type": "SELECT_PROFILE", "profile_id": "x"}, ws)
+            down = await self.manager.handle_command({"type": "OCR_CAPTURE"}, ws)
+            local = await self.manager.handle_command({"type": "SET_PROTOCOL", "telemetry": "delta"}, ws)
+            await asyncio.sleep(0.01)
+            return ws.sent[0], relayed, down, local
+
+        init, relayed, down, local = asyncio.run(run())
+        self.assertEqual(published, [("TELEMETRY", {"Speed": 1.0})])
+        self.assertEqual(init["active_profile_id"], "test")
+        self.assertEqual(relayed["action"], "relayed")
+        self.assertEqual(down["error"], "relay_unavailable")
+        self.assertTrue(local["ok"])
+        upstream.send_command.assert_any_call({"type": "SELECT_PROFILE", "profile_id": "x"})
+        snapshot = self.manager.relay_snapshot()
+        self.assertEqual([m["type"] for m in snapshot], ["PROFILE_CHANGED", "HEARTBEAT", "TELEMETRY"])
+
+    def test_protocol_commands(self):
+        async def run():
+            ws = _FakeWebSocket()
+            await self.manager.connect(ws)
+            pending = await self.manager.handle_command({"type": "RESYNC"}, ws)
+            ack = await self.manager.handle_command({"type": "SET_PROTOCOL", "telemetry": "delta"}, ws)
+            bad = await self.manager.handle_command({"type": "SET_PROTOCOL", "telemetry": "xml"}, ws)
+            await self.manager.broadcast({"type": "TELEMETRY", "Speed": 3.0})
+            resync = await self.manager.handle_command({"type": "RESYNC"}, ws)
+            return pending, ack, bad, resync
+
+        pending, ack, bad, resync = asyncio.run(run())
+        self.assertEqual(pending["action"], "resync_pending")
+        self.assertEqual(ack["telemetry"], "delta")
+        self.assertEqual(bad["error"], "invalid_protocol")
+        self.assertTrue(resync["keyframe"])
+        self.assertEqual(resync["seq"], 1)
+        self.assertEqual(resync["Speed"], 3.0)
+
+    def test_resync_drops_pending_frame(self):
+        async def run():
+            ws = _FakeWebSocket()
+            await self.manager.connect(ws, protocol="delta")
+            client = self.manager.clients[ws]
+            client.stop()  # escritor parado: los frames se quedan en el hueco
+            await self.manager.broadcast({"type": "TELEMETRY", "Speed": 1.0}, delta=None)
+            await self.manager.broadcast({"type": "TELEMETRY", "Speed": 2.0}, delta={"Speed": 2.0})
+            resync = await self.manager.handle_command({"type": "RESYNC"}, ws)
+            self.manager.send_to(ws, resync)
+            client._task = None
+            client.start()
+            await asyncio.sleep(0.01)
+            await self.manager.broadcast({"type": "TELEMETRY", "Speed": 3.0}, delta={"Speed": 3.0})
+            await asyncio.sleep(0.01)
+            return ws.sent[1:]
+
+        sent = asyncio.run(run())
+        self.assertEqual([(m["type"], m["seq"]) for m in sent],
+                         [("TELEMETRY", 2), ("TELEMETRY_DELTA", 3)])
+        self.assertTrue(sent[0]["keyframe"])
+        self.assertEqual(sent[1]["base"], 2)
+
     def test_handle_invalid_profile(self):
         import asyncio
         asyncio.run(self.manager.handle_command({"type": "SELECT_PROFILE", "profile_id": "missing"}))
         self.assertIsNone(self.manager.current_profile)
 
 
+class TestTelemetryProcessor(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.processor = main.TelemetryProcessor(TelemetryManager(profiles_dir=self.test_dir))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    @patch("main.ocr_hud.is_available", return_value=False)
+    def test_parse_and_track_stages(self, _available):
+        async def run():
+            raw = RawFrame(100.0, "SpeedoType:1|CurrentSpeed:10.0|StationDistance:1500|DoorL:0|DoorR:0")
+            frame = await self.processor.parse(raw)
+            return await self.processor.track(frame)
+
+        frame = asyncio.run(run())
+        self.assertEqual(self.processor.last_game_telemetry_at, 100.0)
+        self.assertEqual(frame.speed_ms, 10.0)
+        self.assertEqual(frame.data["StationDistanceSource"], "lua")
+        self.assertEqual(frame.data["StationDistance"], 1500.0)
+
+    @patch("main._log_backend_telemetry_tick")
+    @patch("main.ocr_hud.is_available", return_value=False)
+    def test_replay_is_deterministic(self, _available, _log_tick):
+        capture = os.path.join(self.test_dir, "capture.log")
+        clock = [0.0]
+        recorder = main.replay.FrameRecorder(capture, clock=lambda: clock[0])
+        for i in range(20):
+            recorder.record(f"SpeedoType:1|CurrentSpeed:{10 + i}.0|DoorL:0|DoorR:0")
+            clock[0] += 0.1
+        recorder.close()
+
+        def run_once():
+            processor = main.TelemetryProcessor(TelemetryManager(profiles_dir=self.test_dir))
+            asyncio.run(main.replay.ReplaySource(capture, speed=0).run(processor.process))
+            return processor.station_tracker._odometer_m
+
+        first = run_once()
+        self.assertGreater(first, 0.0)
+        self.assertEqual(first, run_once())
+
+    @patch("main.enrich_cab_telemetry")
+    def test_enrich_skips_frames_without_cab_changes(self, enrich):
+        async def run():
+            base = "SpeedoType:1|CurrentSpeed:10.0|ActiveCab:1|SimulationTime:{}"
+            for i in range(3):
+                frame = await self.processor.parse(RawFrame(100.0 + i * 0.1, base.format(i)))
+                await self.processor.enrich(frame)
+
+        asyncio.run(run())
+        self.assertEqual(enrich.call_count, 1)
+        self.assertEqual(self.processor.cab_subscription.skipped, 2)
+
+    @patch("main.get_raildriver_client", return_value=MagicMock(available=False))
+    def test_loco_change_inside_sync_interval_is_retried(self, _rd):
+        manager = self.processor.manager
+        manager.current_profile = {"id": "a"}
+        resolve = MagicMock(return_value={"id": "a"})
+        manager.profile_manager.resolve_active_profile = resolve
+
+        async def run():
+            for t, loco in ((30.0, "A"), (31.0, "B"), (31.5, "B"), (32.1, "B"), (32.2, "B")):
+                frame = await self.processor.parse(RawFrame(t, f"LocoName:{loco}|SimulationTime:{t}"))
+                await self.processor.sync_profile(frame)
+
+        asyncio.run(run())
+        self.assertEqual([c.kwargs["loco_names"] for c in resolve.call_args_list], [["A"], ["B"]])
+        self.assertEqual(manager._last_profile_sync_at, 32.1)
+
+    def test_raildriver_snapshot_runs_off_the_event_loop(self):
+        threads = []
+        rd = MagicMock(available=True)
+        rd.snapshot.side_effect = lambda: threads.append(threading.get_ident())
+        manager = self.processor.manager
+        manager.profile_manager.resolve_active_profile = MagicMock(return_value=None)
+
+        async def run():
+            await manager.sync_auto_profile("A", now=100.0)
+            return threading.get_ident()
+
+        with patch("main.get_raildriver_client", return_value=rd):
+            loop_thread = asyncio.run(run())
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], loop_thread)
+
+    def test_pipeline_stages(self):
+        status = self.processor.build_pipeline().status()
+        self.assertEqual(
+            list(status),
+            ["parse", "enrich", "track", "publish", "session_log", "profile_sync"],
+        )
+
+
 def _suppress_create_task(coro):
     if hasattr(coro, "close"):
         coro.close()
@@ -189,6 +672,17 @@ class TestBrakeApi(unittest.TestCase):
         self.assertTrue(body["rejected"])
 
 
+class TestTelemetryHttpApi(unittest.TestCase):
+    @patch("main.asyncio.create_task", side_effect=_suppress_create_task)
+    def test_latest_rejects_bad_rate(self, _mock_task):
+        with TestClient(main.app) as client:
+            res = client.get("/api/telemetry/latest", params={"max_hz": -1, "wait": 0})
+            status = client.get("/api/telemetry/status").json()
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res.json(), {"error": "invalid_max_hz"})
+        self.assertIn("latest_channels", status["http"])
+
+
 class TestOcrCaptureApi(unittest.TestCase):
     @patch("main.asyncio.create_task", side_effect=_suppress_create_task)
     @patch("main.ocr_hud.is_available", return_value=True)
@@ -216,5 +710,45 @@ class TestOcrCaptureApi(unittest.TestCase):
             main._last_telemetry_data = {}
 
 
+class TestSessionLogApi(unittest.TestCase):
+    @patch("main.asyncio.create_task", side_effect=_suppress_create_task)
+    def test_paged_and_exported_reads(self, _mock_task):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        with patch.dict(os.environ, {"NEXUS_V4_LOG_DIR": tmp}), \
+                patch.object(main.session_log, "_store", main.session_log.SessionLogStore()):
+            store = main.session_log._store
+            sid = store.start({})
+            store.append(sid, [{"type": "tick", "t": float(n), "n": n} for n in range(4)])
+            with TestClient(main.app) as client:
+                page = client.get(f"/api/debug/sessions/{sid}", params={"after": 1, "limit": 2}).json()
+                full = client.get(f"/api/debug/sessions/{sid}").json()
+                export = client.get(f"/api/debug/sessions/{sid}/export", params={"type": "tick", "since": 2})
+        self.assertEqual([e["n"] for e in page["events"]], [1, 2])
+        self.assertEqual((page["next"], page["has_more"]), (3, True))
+        self.assertEqual(len(full["events"]), 4)
+        self.assertNotIn("next", full)
+        self.assertEqual(export.headers["content-type"], "application/x-ndjson")
+        lines = export.text.splitlines()
+        self.assertEqual([json.loads(line)["n"] for line in lines[1:]], [2, 3])
+
+
+    @patch("main.asyncio.create_task", side_effect=_suppress_create_task)
+    def test_relay_worker_refuses_disk_state(self, _mock_task):
+        with TestClient(main.app) as client, patch.object(main.manager, "upstream", MagicMock()):
+            responses = [
+                client.post("/api/debug/session/start", json={}),
+                client.post("/api/debug/session/x/events", json={"events": []}),
+                client.get("/api/debug/sessions"),
+                client.get("/api/debug/sessions/x/export"),
+                client.post("/api/brake/event", json={}),
+                client.post("/api/ocr/capture"),
+            ]
+            status = client.get("/api/telemetry/status").json()
+        for res in responses:
+            self.assertEqual((res.status_code, res.json()), (409, {"ok": False, "error": "ingest_only"}))
+        self.assertIsNone(status["session_log"])
+
+
 if __name__ == "__main__":
     unittest.main()
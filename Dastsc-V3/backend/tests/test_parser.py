@@ -60,5 +60,53 @@ class TestParser(unittest.TestCase):
         self.assertEqual(result["Signal"], "Green")
 
 
+class TestCompiledLineParser(unittest.TestCase):
+    LINE_A = "SpeedoType:1|CurrentSpeed:10.0000||Signal:Red|NexusLuaVersion:3|SimulationTime:1.00"
+    LINE_B = "SpeedoType:1|CurrentSpeed:12.5000||Signal:Red|NexusLuaVersion:3|SimulationTime:1.10"
+
+    def test_matches_generic_parser(self):
+        compiled = parser.CompiledLineParser()
+        for line in (self.LINE_A, self.LINE_B, "Meta:1:2|Inf:inf|Empty:"):
+            self.assertEqual(compiled.parse(line).as_dict(), parser.parse_telemetry_line(line))
+
+    def test_only_changed_slots_are_reparsed(self):
+        compiled = parser.CompiledLineParser()
+        first = compiled.parse(self.LINE_A)
+        self.assertEqual(len(first.changed), len(first.keys))
+        second = compiled.parse(self.LINE_B)
+        self.assertIs(second, first)
+        self.assertEqual(second.changed_keys(), ["CurrentSpeed", "SimulationTime"])
+        self.assertEqual(second.get("CurrentSpeed"), 12.5)
+        self.assertEqual(compiled.relearns, 1)
+
+    def test_identical_line_reports_no_changes(self):
+        compiled = parser.CompiledLineParser()
+        compiled.parse(self.LINE_A)
+        self.assertEqual(list(compiled.parse(self.LINE_A).changed), [])
+
+    def test_relearns_when_key_set_changes(self):
+        compiled = parser.CompiledLineParser()
+        compiled.parse(self.LINE_A)
+        changed_layout = self.LINE_A.replace("Signal:Red", "Aspect:Red")
+        record = compiled.parse(changed_layout)
+        self.assertEqual(compiled.relearns, 2)
+        self.assertEqual(record.get("Aspect"), "Red")
+        self.assertIsNone(record.get("Signal"))
+        longer = compiled.parse(self.LINE_B + "|Extra:1")
+        self.assertEqual(compiled.relearns, 3)
+        self.assertEqual(longer.get("Extra"), 1.0)
+
+    def test_as_dict_is_independent_copy(self):
+        compiled = parser.CompiledLineParser()
+        data = compiled.parse(self.LINE_A).as_dict()
+        data["CurrentSpeed"] = 99.0
+        self.assertEqual(compiled.parse(self.LINE_A).get("CurrentSpeed"), 10.0)
+
+    def test_empty_line(self):
+        compiled = parser.CompiledLineParser()
+        self.assertEqual(compiled.parse("").as_dict(), {})
+        self.assertEqual(compiled.parse("no_pipe_here").as_dict(), {})
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.pipeline import LatestQueue, TelemetryPipeline
+
+
+class TestLatestQueue(unittest.TestCase):
+    def test_drop_oldest(self):
+        async def run():
+            queue = LatestQueue(maxsize=1)
+            queue.put_nowait(1)
+            queue.put_nowait(2)
+            queue.put_nowait(3)
+            return queue.get_nowait(), queue.dropped
+
+        latest, dropped = asyncio.run(run())
+        self.assertEqual(latest, 3)
+        self.assertEqual(dropped, 2)
+
+    def test_merge_folds_dropped_items(self):
+        async def run():
+            queue = LatestQueue(maxsize=1, merge=lambda old, new: old + new)
+            for item in ([1], [2], [3]):
+                queue.put_nowait(item)
+            return queue.get_nowait()
+
+        self.assertEqual(asyncio.run(run()), [1, 2, 3])
+
+
+class TestTelemetryPipeline(unittest.TestCase):
+    def test_chain_passes_results(self):
+        async def run():
+            published = []
+
+            async def double(x):
+                return x * 2
+
+            async def publish(x):
+                published.append(x)
+
+            pipeline = TelemetryPipeline().add_stage("double", double).add_stage("publish", publish)
+            pipeline.start()
+            pipeline.feed(21)
+            await asyncio.sleep(0.01)
+            await pipeline.stop()
+            return published, pipeline.status()
+
+        published, status = asyncio.run(run())
+        self.assertEqual(published, [42])
+        self.assertEqual(status["double"]["processed"], 1)
+        self.assertEqual(status["publish"]["processed"], 1)
+
+    def test_slow_branch_does_not_delay_main_chain(self):
+        async def run():
+            published = []
+            logged = []
+
+            async def track(x):
+                return x
+
+            async def publish(x):
+                published.append(x)
+
+            async def slow_log(x):
+                await asyncio.sleep(0.05)
+                logged.append(x)
+
+            pipeline = (
+                TelemetryPipeline()
+                .add_stage("track", track)
+                .add_stage("publish", publish)
+                .add_stage("session_log", slow_log, after="track")
+            )
+            pipeline.start()
+            for i in range(10):
+                pipeline.feed(i)
+                await asyncio.sleep(0.002)
+            await asyncio.sleep(0.12)
+            await pipeline.stop()
+            return published, logged, pipeline.status()
+
+        published, logged, status = asyncio.run(run())
+        self.assertEqual(published, list(range(10)))
+        self.assertLess(len(logged), 10)
+        self.assertEqual(logged[-1], 9)
+        self.assertGreater(status["session_log"]["dropped"], 0)
+        self.assertGreaterEqual(status["session_log"]["max_ms"], 40.0)
+
+    def test_handler_error_is_counted_and_skipped(self):
+        async def run():
+            seen = []
+
+            async def fragile(x):
+                if x == 1:
+                    raise ValueError("boom")
+                seen.append(x)
+
+            pipeline = TelemetryPipeline().add_stage("fragile", fragile)
+            pipeline.start()
+            for i in range(3):
+                pipeline.feed(i)
+                await asyncio.sleep(0.005)
+            await pipeline.stop()
+            return seen, pipeline.status()
+
+        seen, status = asyncio.run(run())
+        self.assertEqual(seen, [0, 2])
+        self.assertEqual(status["fragile"]["errors"], 1)
+
+    def test_duplicate_stage_rejected(self):
+        async def noop(x):
+            return x
+
+        pipeline = TelemetryPipeline().add_stage("a", noop)
+        with self.assertRaises(ValueError):
+            pipeline.add_stage("a", noop)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -42,6 +42,25 @@ class TestProfiles(unittest.TestCase):
         by_id = {p["id"]: p for p in profiles}
         self.assertEqual(by_id["class390"]["visuals"], {"unit": "MPH", "color": "#3498db"})
 
+    def test_summaries_cached_until_reload(self):
+        first = self.manager.get_all_profiles()
+        self.assertIs(self.manager.get_all_profiles(), first)
+        with open(os.path.join(self.test_dir, "class158.json"), "w", encoding="utf-8") as f:
+            json.dump({"name": "Class 158"}, f)
+        self.assertEqual(len(self.manager.get_all_profiles()), 2)
+        version = self.manager.version
+        self.manager.load_profiles()
+        self.assertEqual(self.manager.version, version + 1)
+        self.assertEqual(len(self.manager.get_all_profiles()), 3)
+
+    def test_non_finite_values_load_as_zero(self):
+        path = os.path.join(self.test_dir, "broken.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"name": "Broken", "maxSpeed": NaN, "limits": [Infinity, 1e999, 2.5]}')
+        profile = _load_profile_file(path)
+        self.assertEqual(profile["maxSpeed"], 0.0)
+        self.assertEqual(profile["limits"], [0.0, 0.0, 2.5])
+
     def test_select_manual_profile(self):
         self.assertTrue(self.manager.select_manual_profile("class323"))
         manual = self.manager.manual_profile
@@ -0,0 +1,100 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import railworks_paths
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRailWorksPathResolver(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.plugins = os.path.join(self.root, "plugins")
+        os.makedirs(self.plugins)
+        self.getdata = os.path.join(self.plugins, "GetData.txt")
+        self.clock = _FakeClock()
+        self.resolver = railworks_paths.RailWorksPathResolver(
+            roots=[self.root],
+            reprobe_found_s=30.0,
+            reprobe_missing_s=1.0,
+            clock=self.clock,
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _touch(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("Speed:1|")
+
+    def test_caches_found_path(self):
+        self._touch(self.getdata)
+        for _ in range(50):
+            self.assertEqual(self.resolver.getdata_path(), self.getdata)
+        self.assertEqual(self.resolver.probes, 1)
+        self.assertEqual(
+            self.resolver.send_command_path(),
+            os.path.join(self.plugins, "SendCommand.txt"),
+        )
+
+    def test_missing_path_reprobed_on_short_timer(self):
+        self.assertIsNone(self.resolver.getdata_path())
+        self._touch(self.getdata)
+        self.assertIsNone(self.resolver.getdata_path())
+        self.clock.now = 1.5
+        self.assertEqual(self.resolver.getdata_path(), self.getdata)
+        self.assertEqual(self.resolver.probes, 2)
+
+    def test_invalidate_forces_reprobe(self):
+        self._touch(self.getdata)
+        self.resolver.getdata_path()
+        os.remove(self.getdata)
+        alt = os.path.join(self.root, "GetData.txt")
+        self._touch(alt)
+        self.assertEqual(self.resolver.getdata_path(), self.getdata)
+        self.resolver.invalidate()
+        self.assertEqual(self.resolver.getdata_path(), alt)
+
+    def test_plugin_getdata_preferred_over_root(self):
+        alt = os.path.join(self.root, "GetData.txt")
+        self.assertEqual(
+            railworks_paths.getdata_candidates([self.root]),
+            [self.getdata, alt],
+        )
+        self._touch(self.getdata)
+        self._touch(alt)
+        self.assertEqual(self.resolver.getdata_path(), self.getdata)
+        os.remove(self.getdata)
+        self.resolver.invalidate()
+        self.assertEqual(self.resolver.getdata_path(), alt)
+        os.remove(alt)
+        self.resolver.invalidate()
+        self.assertIsNone(self.resolver.getdata_path())
+
+    def test_plugins_dir_without_getdata(self):
+        self.assertEqual(self.resolver.plugins_dir(), self.plugins)
+        self.assertEqual(self.resolver.shm_path(), os.path.join(self.plugins, "GetData.shm"))
+        self.assertIsNone(self.resolver.send_command_path())
+
+    def test_roots_from_env(self):
+        other = os.path.join(self.root, "other")
+        with patch.dict(os.environ, {"NEXUS_RAILWORKS_DIR": os.pathsep.join([other, self.root])}):
+            roots = railworks_paths.configured_roots()
+        self.assertEqual(roots[:2], [other, self.root])
+        self.assertEqual(roots[-1], railworks_paths.DEFAULT_RAILWORKS_ROOT)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import relay
+
+
+class TestRelayConfig(unittest.TestCase):
+    def test_env(self):
+        env = {"NEXUS_RELAY_ROLE": " Relay ", "NEXUS_RELAY_ADDR": "10.0.0.2:9000", "NEXUS_WORKERS": "4"}
+        with patch.dict(os.environ, env):
+            self.assertEqual(relay.role_from_env(), relay.ROLE_RELAY)
+            self.assertEqual(relay.addr_from_env(), ("10.0.0.2", 9000))
+            self.assertEqual(relay.workers_from_env(), 4)
+        env = {"NEXUS_RELAY_ROLE": "other", "NEXUS_RELAY_ADDR": "nope", "NEXUS_WORKERS": "x"}
+        with patch.dict(os.environ, env):
+            self.assertEqual(relay.role_from_env(), "")
+            self.assertEqual(relay.addr_from_env(), relay.DEFAULT_ADDR)
+            self.assertEqual(relay.workers_from_env(), 1)
+
+
+class TestFraming(unittest.TestCase):
+    def test_roundtrip_and_eof(self):
+        async def run():
+            reader = asyncio.StreamReader()
+            reader.feed_data(relay.pack_frame('{"message": {"type": "HEARTBEAT"}}'))
+            reader.feed_data(relay.pack_frame(b'{"command": {}}')[:6])
+            reader.feed_eof()
+            return await relay.read_frame(reader), await relay.read_frame(reader)
+
+        first, truncated = asyncio.run(run())
+        self.assertEqual(first, {"message": {"type": "HEARTBEAT"}})
+        self.assertIsNone(truncated)
+
+    def test_rejects_oversized(self):
+        async def run():
+            reader = asyncio.StreamReader()
+            reader.feed_data((relay.MAX_FRAME_BYTES + 1).to_bytes(4, "big"))
+            return await relay.read_frame(reader)
+
+        with self.assertRaises(ValueError):
+            asyncio.run(run())
+
+
+class TestLoopback(unittest.TestCase):
+    def test_ingest_to_relay_and_commands_back(self):
+        received = []
+        commands = []
+
+        async def on_message(message, delta):
+            received.append((message, delta))
+
+        async def on_command(cmd):
+            commands.append(cmd)
+
+        async def run():
+            publisher = relay.RelayPublisher(
+                ("127.0.0.1", 0),
+                on_command=on_command,
+                snapshot=lambda: [{"type": "PROFILE_CHANGED", "active_profile_id": "class323"}],
+            )
+            await publisher.start()
+            subscriber = relay.RelaySubscriber(publisher.addr, on_message, reconnect_s=None)
+            task = asyncio.create_task(subscriber.run())
+            while publisher.peers < 1:
+                await asyncio.sleep(0.01)
+            publisher.publish({"type": "TELEMETRY", "seq": 1, "Speed": 1.0})
+            publisher.publish({"type": "TELEMETRY", "seq": 2, "Speed": 2.0}, {"Speed": 2.0})
+            self.assertTrue(subscriber.send_command({"type": "SELECT_PROFILE", "profile_id": "x"}))
+            while len(received) < 3 or not commands:
+                await asyncio.sleep(0.01)
+            await publisher.stop()
+            await asyncio.wait_for(task, 1.0)
+            return publisher.status(), subscriber.status()
+
+        pub_status, sub_status = asyncio.run(run())
+        self.assertEqual(received[0], ({"type": "PROFILE_CHANGED", "active_profile_id": "class323"}, None))
+        self.assertEqual(received[1][1], None)
+        self.assertEqual(received[2], ({"type": "TELEMETRY", "seq": 2, "Speed": 2.0}, {"Speed": 2.0}))
+        self.assertEqual(commands, [{"type": "SELECT_PROFILE", "profile_id": "x"}])
+        self.assertEqual(pub_status["published"], 2)
+        self.assertEqual(sub_status["received"], 3)
+        self.assertFalse(sub_status["connected"])
+
+
+if __name__ == "__main__":
+    unittest.main()
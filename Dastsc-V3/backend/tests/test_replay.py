@@ -0,0 +1,124 @@
+import asyncio
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import replay
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestFrameRecorder(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _record(self, path, lines, start=0.0, step=0.1):
+        clock = _FakeClock()
+        clock.now = start
+        recorder = replay.FrameRecorder(path, clock=clock)
+        for line in lines:
+            recorder.record(line)
+            clock.now += step
+        recorder.close()
+
+    def test_round_trip_with_offsets(self):
+        path = os.path.join(self.tmp, "capture.log")
+        self._record(path, ["Speed:1|SimulationTime:1.0\n", "Speed:2|SimulationTime:1.1"], start=500.0)
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.readline().strip(), replay.REPLAY_HEADER)
+        frames = list(replay.read_frames(path))
+        self.assertEqual([line for _, line in frames], ["Speed:1|SimulationTime:1.0", "Speed:2|SimulationTime:1.1"])
+        self.assertAlmostEqual(frames[0][0], 0.0)
+        self.assertAlmostEqual(frames[1][0], 0.1)
+
+    def test_segments_keep_offsets_increasing(self):
+        path = os.path.join(self.tmp, "capture.log")
+        self._record(path, ["A:1", "A:2"])
+        self._record(path, ["A:3", "A:4"], start=9000.0)
+        offsets = [t for t, _ in replay.read_frames(path)]
+        self.assertEqual(offsets, sorted(offsets))
+        self.assertEqual(len(offsets), 4)
+
+    def test_gzip_capture(self):
+        path = os.path.join(self.tmp, "capture.log.gz")
+        self._record(path, ["A:1", "A:2"])
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            self.assertEqual(f.readline().strip(), replay.REPLAY_HEADER)
+        self.assertEqual(len(list(replay.read_frames(path))), 2)
+
+
+class TestReplaySource(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "capture.log")
+        clock = _FakeClock()
+        recorder = replay.FrameRecorder(self.path, clock=clock)
+        for i in range(11):
+            recorder.record(f"Speed:{i}")
+            clock.now += 0.05
+        recorder.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_max_speed_feeds_every_frame_with_virtual_time(self):
+        received = []
+        source = replay.ReplaySource(self.path, speed=0)
+        count = asyncio.run(source.run(received.append))
+        self.assertEqual(count, 11)
+        self.assertEqual(received[-1].line, "Speed:10")
+        self.assertAlmostEqual(received[-1].received_at - received[0].received_at, 0.5, places=3)
+        self.assertEqual(source.status()["frames"], 11)
+
+    def test_speed_scales_wall_time(self):
+        source = replay.ReplaySource(self.path, speed=10.0)
+        started = time.monotonic()
+        asyncio.run(source.run(lambda raw: None))
+        elapsed = time.monotonic() - started
+        self.assertGreaterEqual(elapsed, 0.045)
+        self.assertLess(elapsed, 0.4)
+
+    def test_awaits_coroutine_feed(self):
+        seen = []
+
+        async def feed(raw):
+            seen.append(raw.line)
+
+        asyncio.run(replay.ReplaySource(self.path, speed=0).run(feed))
+        self.assertEqual(len(seen), 11)
+
+    def test_rejects_negative_speed(self):
+        with self.assertRaises(ValueError):
+            replay.ReplaySource(self.path, speed=-1)
+
+    def test_watcher_fills_queue(self):
+        async def run():
+            queue: asyncio.Queue = asyncio.Queue()
+            watcher = replay.ReplayWatcher(self.path, queue, speed=0)
+            watcher.start()
+            await asyncio.sleep(0.05)
+            watcher.stop()
+            return queue.qsize(), watcher.status()
+
+        size, status = asyncio.run(run())
+        self.assertEqual(size, 11)
+        self.assertEqual(status["source"], "replay")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import session_archive
+
+
+def _lines(count):
+    return [(json.dumps({"type": "tick", "n": n}) + "\n").encode("utf-8") for n in range(count)]
+
+
+class TestSessionArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.now = [1000.0]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _archive(self, **kwargs):
+        kwargs.setdefault("codec", session_archive.CODEC_GZIP)
+        kwargs.setdefault("max_bytes", 0)
+        kwargs.setdefault("max_age_s", 0)
+        return session_archive.SessionArchive(self.tmp, clock=lambda: self.now[0], **kwargs)
+
+    def test_add_list_and_read(self):
+        archive = self._archive()
+        archive.add("a", {"id": "a", "ended_at": "x"}, _lines(3))
+        self.now[0] += 1
+        archive.add("b", {"id": "b"}, _lines(1))
+        self.assertEqual([e["header"]["id"] for e in archive.entries()], ["b", "a"])
+        self.assertEqual(archive.entry("a")["event_count"], 3)
+        self.assertEqual(list(archive.iter_events("a")), _lines(3))
+        ndjson = b"".join(archive.iter_ndjson("b")).decode("utf-8").splitlines()
+        self.assertEqual(json.loads(ndjson[0]), {"session": {"id": "b"}})
+        self.assertEqual(os.listdir(self.tmp).count("session_a.ndjson.gz"), 1)
+
+    def test_budget_drops_oldest_first(self):
+        archive = self._archive()
+        for sid in ("a", "b", "c"):
+            archive.add(sid, {"id": sid}, _lines(50))
+            self.now[0] += 1
+        archive.max_bytes = archive.entry("c")["bytes"] * 2
+        self.assertEqual(archive.enforce(), ["a"])
+        archive.max_age_s = 1.5
+        self.assertEqual(archive.enforce(), ["b"])
+        self.assertEqual([e["header"]["id"] for e in archive.entries()], ["c"])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, "session_a.ndjson.gz")))
+        self.assertEqual(archive.status()["expired"], 2)
+
+    def test_index_is_shared_and_rebuilt(self):
+        self._archive().add("a", {"id": "a"}, _lines(2))
+        self.assertEqual(self._archive().entry("a")["event_count"], 2)
+        os.remove(os.path.join(self.tmp, session_archive.INDEX_FILE))
+        rebuilt = self._archive()
+        self.assertEqual(rebuilt.entry("a")["event_count"], 2)
+        self.assertTrue(os.path.exists(rebuilt.index_path))
+
+    def test_status_is_a_snapshot_without_disk_access(self):
+        self._archive().add("a", {"id": "a"}, _lines(2))
+        archive = self._archive()
+        self.assertIsNone(archive.status()["sessions"])
+        archive.load()
+        with patch.object(session_archive.os.path, "getmtime", side_effect=AssertionError("disco")), \
+                patch.object(session_archive.SessionArchive, "_rebuild", side_effect=AssertionError("disco")):
+            status = archive.status()
+        self.assertEqual(status["sessions"], 1)
+        self.assertEqual(status["bytes"], archive.entry("a")["bytes"])
+
+    def test_env_config(self):
+        env = {
+            "NEXUS_SESSION_ARCHIVE_CODEC": "gzip",
+            "NEXUS_SESSION_ARCHIVE_MAX_MB": "1",
+            "NEXUS_SESSION_ARCHIVE_MAX_DAYS": "x",
+        }
+        with patch.dict(os.environ, env):
+            archive = session_archive.SessionArchive(self.tmp)
+        self.assertEqual(archive.codec, session_archive.CODEC_GZIP)
+        self.assertEqual(archive.max_bytes, 1024 * 1024)
+        self.assertEqual(archive.max_age_s, session_archive.DEFAULT_MAX_DAYS * 86400.0)
+
+    @unittest.skipUnless(session_archive.ZSTD_OK, "zstandard no instalado")
+    def test_zstd_roundtrip(self):
+        archive = self._archive(codec=session_archive.CODEC_ZSTD)
+        archive.add("z", {"id": "z"}, _lines(3))
+        self.assertTrue(archive.entry("z")["file"].endswith(".ndjson.zst"))
+        self.assertEqual(list(archive.iter_events("z")), _lines(3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,7 +3,9 @@ import os
 import shutil
 import sys
 import tempfile
+import time
 import unittest
+from unittest.mock import patch
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
@@ -18,38 +20,105 @@ class TestSessionLog(unittest.TestCase):
         self.store = session_log.SessionLogStore(max_files=5)
 
     def tearDown(self):
+        self.store.close()
         if self._prev is None:
             os.environ.pop("NEXUS_V4_LOG_DIR", None)
         else:
             os.environ["NEXUS_V4_LOG_DIR"] = self._prev
         shutil.rmtree(self.tmp)
 
+    def _from_disk(self, sid):
+        """Vista reconstruida por un store nuevo: solo lo que quedó en disco."""
+        self.store.flush()
+        return session_log.SessionLogStore().get(sid)
+
     def test_start_append_end(self):
         sid = self.store.start({"profile": "icet"})
         self.assertTrue(self.store.append(sid, [{"type": "tick", "speed": 40}]))
         self.assertTrue(self.store.end(sid, {"note": "ok"}))
-        path = session_log._session_path(sid)
-        with open(path, encoding="utf-8") as f:
-            data = json.load(f)
+        data = self._from_disk(sid)
         self.assertEqual(data["meta"]["profile"], "icet")
         self.assertEqual(len(data["events"]), 1)
         self.assertIsNotNone(data["ended_at"])
 
-    def test_prune_keeps_last_five(self):
-        ids = [self.store.start({"n": i}) for i in range(7)]
-        for sid in ids:
+    def test_ended_sessions_move_to_archive(self):
+        ids = ["2024-01-01_10-00-0%d" % i for i in range(7)]
+        for n, sid in enumerate(ids):
+            self.store.append(sid, [{"type": "tick", "n": n}])
             self.store.end(sid)
         listed = self.store.list_sessions()
-        self.assertLessEqual(len(listed), 5)
-        on_disk = [n for n in os.listdir(self.tmp) if n.endswith(".json")]
-        self.assertLessEqual(len(on_disk), 5)
+        self.assertEqual(sorted(item["id"] for item in listed), ids)
+        self.assertTrue(all(item["archived"] for item in listed))
+        self.assertEqual([item["event_count"] for item in listed], [1] * 7)
+        on_disk = [n for n in os.listdir(self.tmp) if n.endswith(".meta.json")]
+        self.assertEqual(on_disk, [])
+        data = self._from_disk(ids[3])
+        self.assertEqual(data["events"], [{"type": "tick", "n": 3}])
+        self.assertIsNotNone(data["ended_at"])
+
+    def test_abandoned_live_sessions_beyond_max_files_are_archived(self):
+        for i in range(4):
+            self.store.append("2024-01-01_10-00-0%d" % i, [{"n": i}])
+            self.store.flush()
+            time.sleep(0.01)  # orden por mtime
+        self.store.close()
+        store = session_log.SessionLogStore(max_files=2)
+        self.addCleanup(store.close)
+        store.start({})
+        store.flush()
+        live = sorted(n for n in os.listdir(self.tmp) if n.endswith(".meta.json"))
+        self.assertEqual(len(live), 2)
+        archived = [item for item in store.list_sessions() if item["archived"]]
+        self.assertEqual(len(archived), 3)
+        self.assertTrue(all(item["ended_at"] is None for item in archived))
+
+    def test_append_only_adds_lines(self):
+        sid = self.store.start({"profile": "icet"})
+        meta_path = session_log._meta_path(sid)
+        self.store.flush()
+        with open(meta_path, encoding="utf-8") as f:
+            header = f.read()
+        for i in range(3):
+            self.store.append(sid, [{"type": "tick", "n": i}])
+        self.store.flush()
+        with open(meta_path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), header)
+        with open(session_log._events_path(sid), encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertEqual([json.loads(line)["n"] for line in lines], [0, 1, 2])
+        self.assertEqual(self.store.list_sessions()[0]["event_count"], 3)
+
+    def test_torn_last_line_is_skipped(self):
+        sid = self.store.start({})
+        self.store.append(sid, [{"type": "tick", "n": 1}])
+        self.store.flush()
+        with open(session_log._events_path(sid), "a", encoding="utf-8") as f:
+            f.write('{"type": "ti')
+        self.assertEqual(self._from_disk(sid)["events"], [{"type": "tick", "n": 1}])
+
+    def test_legacy_json_is_read_and_migrated_on_write(self):
+        sid = "2024-01-01_10-00-00"
+        legacy = session_log._legacy_path(sid)
+        with open(legacy, "w", encoding="utf-8") as f:
+            json.dump({
+                "id": sid, "started_at": "2024-01-01T10:00:00+00:00", "ended_at": None,
+                "meta": {"source": "v4_session"}, "events": [{"type": "tick", "n": 0}],
+            }, f)
+        self.assertEqual(self.store.get(sid)["events"], [{"type": "tick", "n": 0}])
+        self.assertEqual(self.store.list_sessions()[0]["event_count"], 1)
+        self.assertTrue(self.store.append(sid, [{"type": "tick", "n": 1}]))
+        self.store.flush()
+        self.assertFalse(os.path.exists(legacy))
+        data = self._from_disk(sid)
+        self.assertEqual([e["n"] for e in data["events"]], [0, 1])
+        self.assertEqual(data["meta"], {"source": "v4_session"})
+        self.assertEqual(data["started_at"], "2024-01-01T10:00:00+00:00")
 
     def test_append_active(self):
         sid = self.store.start({"profile": "icet"})
         self.assertTrue(self.store.append_active([{"type": "ocr_capture", "event": "door_anchor"}]))
         self.store.end(sid)
-        with open(session_log._session_path(sid), encoding="utf-8") as f:
-            data = json.load(f)
+        data = self._from_disk(sid)
         types = [e["type"] for e in data["events"]]
         self.assertIn("ocr_capture", types)
 
@@ -62,16 +131,13 @@ class TestSessionLog(unittest.TestCase):
         sid = self.store.start({"profile": "class323"})
         self.store.end(sid)
         self.assertTrue(self.store.adopt_session(sid, {"policy": "AUTO"}))
-        path = session_log._session_path(sid)
-        with open(path, encoding="utf-8") as f:
-            data = json.load(f)
+        data = self._from_disk(sid)
         self.assertEqual(data["meta"].get("policy"), "AUTO")
 
     def test_meta_merge_preserves_v4_source(self):
         sid = self.store.start({"source": "v4_session", "policyMode": "AUTO"})
         self.store.ensure_active_session({"source": "backend_telemetry"})
-        with open(session_log._session_path(sid), encoding="utf-8") as f:
-            data = json.load(f)
+        data = self._from_disk(sid)
         self.assertEqual(data["meta"].get("source"), "v4_session")
 
     def test_meta_merge_promotes_backend_to_v4(self):
@@ -81,8 +147,7 @@ class TestSessionLog(unittest.TestCase):
             "profileSelection": "AUTO",
             "policyMode": "AUTO",
         })
-        with open(session_log._session_path(sid), encoding="utf-8") as f:
-            data = json.load(f)
+        data = self._from_disk(sid)
         self.assertEqual(data["meta"].get("source"), "v4_session")
         self.assertEqual(data["meta"].get("profileSelection"), "AUTO")
 
@@ -92,8 +157,7 @@ class TestSessionLog(unittest.TestCase):
         attached = self.store.open_or_attach({"source": "v4_session", "policyMode": "AUTO"})
         self.assertEqual(attached, sid)
         self.store.append(attached, [{"type": "tick", "headline": "test"}])
-        with open(session_log._session_path(sid), encoding="utf-8") as f:
-            data = json.load(f)
+        data = self._from_disk(sid)
         types = [e["type"] for e in data["events"]]
         self.assertIn("backend_tick", types)
         self.assertIn("tick", types)
@@ -104,8 +168,7 @@ class TestSessionLog(unittest.TestCase):
         self.store.append(sid, [{"type": "backend_tick", "n": 1}])
         sid2 = self.store.start({"source": "v4_session", "policyMode": "ARM"})
         self.assertEqual(sid2, sid)
-        with open(session_log._session_path(sid), encoding="utf-8") as f:
-            data = json.load(f)
+        data = self._from_disk(sid)
         self.assertEqual(len(data["events"]), 1)
         self.assertEqual(data["meta"].get("source"), "v4_session")
         self.assertEqual(data["meta"].get("policyMode"), "ARM")
@@ -117,5 +180,250 @@ class TestSessionLog(unittest.TestCase):
         self.assertTrue(self.store.v4_recently_active())
 
 
+class TestSessionWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self._env = patch.dict(os.environ, {"NEXUS_V4_LOG_DIR": self.tmp})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+        shutil.rmtree(self.tmp)
+
+    def _store(self, **kwargs):
+        kwargs.setdefault("flush_interval_s", 60.0)
+        store = session_log.SessionLogStore(writer=session_log.SessionWriter(**kwargs))
+        self.addCleanup(store.close)
+        return store
+
+    def test_appends_are_batched_off_the_caller(self):
+        store = self._store()
+        sid = store.start({})
+        for i in range(5):
+            self.assertTrue(store.append(sid, [{"type": "tick", "n": i}]))
+        self.assertFalse(os.path.exists(session_log._events_path(sid)))
+        self.assertTrue(store.flush())
+        self.assertEqual(len(store.get(sid)["events"]), 5)
+        status = store.status()["writer"]
+        self.assertEqual(status["batches"], 1)
+        self.assertEqual(status["written_events"], 5)
+
+    def test_size_trigger_writes_without_flush(self):
+        store = self._store(batch_events=3)
+        sid = store.start({})
+        store.append(sid, [{"n": i} for i in range(3)])
+        deadline = time.monotonic() + 2.0
+        while not os.path.exists(session_log._events_path(sid)) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(os.path.exists(session_log._events_path(sid)))
+
+    def test_bounded_queue_drops_and_counts(self):
+        store = self._store(max_pending_events=2)
+        sid = store.start({})
+        self.assertTrue(store.append(sid, [{"n": 1}, {"n": 2}]))
+        self.assertFalse(store.append(sid, [{"n": 3}]))
+        self.assertEqual(store.status()["writer"]["dropped_events"], 1)
+
+    def test_fsync_policies(self):
+        with patch("core.session_log.os.fsync") as fsync:
+            store = self._store(fsync_policy=session_log.FSYNC_END)
+            sid = store.start({})
+            store.append(sid, [{"n": 1}])
+            store.flush()
+            self.assertEqual(fsync.call_count, 0)
+            store.end(sid)
+            store.flush()
+            self.assertEqual(fsync.call_count, 1)  # la copia archivada; la viva se borra
+
+            fsync.reset_mock()
+            batch = self._store(fsync_policy=session_log.FSYNC_BATCH)
+            batch.append(sid, [{"n": 2}])
+            batch.flush()
+            self.assertEqual(fsync.call_count, 2)  # cabecera nueva + eventos
+
+    def test_close_writes_pending_events(self):
+        store = self._store(fsync_policy=session_log.FSYNC_NEVER)
+        sid = store.start({})
+        store.append(sid, [{"n": 1}])
+        store.close()
+        self.assertEqual(session_log.SessionLogStore().get(sid)["events"], [{"n": 1}])
+
+    def test_policy_from_env(self):
+        with patch.dict(os.environ, {"NEXUS_SESSION_FLUSH_MS": "50", "NEXUS_SESSION_FSYNC": "batch"}):
+            writer = session_log.SessionWriter()
+        self.assertEqual(writer.flush_interval_s, 0.05)
+        self.assertEqual(writer.fsync_policy, session_log.FSYNC_BATCH)
+
+
+class TestSessionMemory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self._env = patch.dict(os.environ, {"NEXUS_V4_LOG_DIR": self.tmp})
+        self._env.start()
+
+    def tearDown(self):
+        self._env.stop()
+        shutil.rmtree(self.tmp)
+
+    def _store(self, **kwargs):
+        writer = session_log.SessionWriter(flush_interval_s=60.0)
+        store = session_log.SessionLogStore(writer=writer, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def test_lru_evicts_inactive_sessions(self):
+        store = self._store(max_open=2)
+        store.update_meta("a", {"policy": "AUTO"})
+        store.append("b", [{"n": 1}])
+        store.append("c", [{"n": 1}])
+        status = store.status()
+        self.assertEqual(status["open_sessions"], 2)
+        self.assertEqual(status["evicted_sessions"], 1)
+        # Recargada con la cabecera aún en cola, no con la de disco.
+        store.append("a", [{"n": 2}])
+        self.assertEqual(store.get("a")["meta"], {"policy": "AUTO"})
+
+    def test_active_session_is_never_evicted(self):
+        store = self._store(max_open=1)
+        sid = store.start({})
+        store.append("other", [{"n": 1}])
+        self.assertIn(sid, store._open)
+        self.assertTrue(store.append_active([{"n": 2}]))
+
+    def test_tail_window_served_from_memory(self):
+        store = self._store(tail_events=3)
+        sid = store.start({})
+        store.append(sid, [{"n": i} for i in range(5)])
+        recent = store.get(sid, tail=2)
+        self.assertEqual(recent["events"], [{"n": 3}, {"n": 4}])
+        self.assertFalse(os.path.exists(session_log._events_path(sid)))
+        # Más de lo que guarda la cola: se lee de disco.
+        self.assertEqual([e["n"] for e in store.get(sid, tail=5)["events"]], [0, 1, 2, 3, 4])
+
+    def test_tail_byte_budget_and_resident_report(self):
+        store = self._store(max_tail_bytes=64)
+        sid = store.start({})
+        store.append(sid, [{"type": "tick", "n": i} for i in range(20)])
+        status = store.status()
+        self.assertLessEqual(status["tail_bytes"], 64)
+        self.assertGreater(status["tail_events"], 0)
+        self.assertEqual(
+            status["resident_bytes"],
+            status["tail_bytes"] + status["writer"]["pending_bytes"],
+        )
+        store.flush()
+        self.assertEqual(store.status()["writer"]["pending_bytes"], 0)
+
+
+class TestSessionPaging(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self._env = patch.dict(os.environ, {"NEXUS_V4_LOG_DIR": self.tmp})
+        self._env.start()
+        self.store = session_log.SessionLogStore()
+        self.sid = self.store.start({})
+        self.store.append(self.sid, [
+            {"type": "tick" if n % 2 else "ocr_capture", "t": 100.0 + n, "n": n} for n in range(7)
+        ])
+
+    def tearDown(self):
+        self.store.close()
+        self._env.stop()
+        shutil.rmtree(self.tmp)
+
+    def test_index_sidecar_counts_events(self):
+        with patch.object(session_log, "INDEX_STRIDE", 2):
+            self.store.append(self.sid, [{"type": "tick", "n": 7}])
+            self.store.flush()
+        with open(session_log._index_path(self.sid), encoding="utf-8") as f:
+            index = json.load(f)
+        self.assertEqual(index["events"], 8)
+        self.assertEqual(index["bytes"], os.path.getsize(session_log._events_path(self.sid)))
+        self.assertEqual(self.store.list_sessions()[0]["event_count"], 8)
+
+    def test_cursor_pages(self):
+        first = self.store.page(self.sid, limit=3)
+        self.assertEqual([e["n"] for e in first["events"]], [0, 1, 2])
+        self.assertEqual((first["next"], first["has_more"], first["event_count"]), (3, True, 7))
+        rest = self.store.page(self.sid, after=first["next"], limit=10)
+        self.assertEqual([e["n"] for e in rest["events"]], [3, 4, 5, 6])
+        self.assertEqual((rest["next"], rest["has_more"]), (7, False))
+
+    def test_page_seeks_from_checkpoint(self):
+        self.store.flush()
+        os.remove(session_log._index_path(self.sid))  # se reconstruye al leer
+        with patch.object(session_log, "INDEX_STRIDE", 2):
+            page = self.store.page(self.sid, after=5, limit=1)
+        self.assertEqual(page["events"], [{"type": "tick", "t": 105.0, "n": 5}])
+
+    def test_type_and_time_filters(self):
+        ticks = self.store.page(self.sid, types=["tick"], since=102.0, until=106.0)
+        self.assertEqual([e["n"] for e in ticks["events"]], [3, 5])
+        self.assertFalse(ticks["has_more"])
+        page = self.store.page(self.sid, types=["ocr_capture"], limit=1)
+        self.assertEqual(([e["n"] for e in page["events"]], page["next"]), ([0], 1))
+
+    def test_export_ndjson(self):
+        body = b"".join(self.store.export(self.sid, types=["tick"]))
+        lines = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+        self.assertEqual(lines[0]["session"]["id"], self.sid)
+        self.assertEqual([e["n"] for e in lines[1:]], [1, 3, 5])
+        self.assertIsNone(self.store.export("missing"))
+
+    def test_archived_session_reads(self):
+        self.store.end(self.sid, {"note": "ok"})
+        self.store.flush()
+        self.assertFalse(os.path.exists(session_log._events_path(self.sid)))
+        page = self.store.page(self.sid, after=2, limit=2, types=["tick"])
+        self.assertEqual(([e["n"] for e in page["events"]], page["next"]), ([3, 5], 6))
+        self.assertEqual(page["summary"], {"note": "ok"})
+        lines = b"".join(self.store.export(self.sid)).decode("utf-8").splitlines()
+        self.assertEqual(json.loads(lines[0])["session"]["summary"], {"note": "ok"})
+        self.assertEqual(len(lines), 8)
+        self.assertEqual(self.store.status()["archive"]["sessions"], 1)
+
+    def test_late_events_join_the_archived_copy(self):
+        self.store.end(self.sid, {"note": "ok"})
+        self.store.flush()
+        self.assertTrue(self.store.append(self.sid, [{"type": "tick", "n": 7}]))
+        self.assertEqual(self.store.get(self.sid)["summary"], {"note": "ok"})
+        self.store.end(self.sid)  # se vuelve a archivar
+        self.store.flush()
+        self.assertFalse(os.path.exists(session_log._events_path(self.sid)))
+        data = self.store.get(self.sid)
+        self.assertEqual([e["n"] for e in data["events"]], list(range(8)))
+        self.assertEqual(data["summary"], {"note": "ok"})
+
+    def test_reads_chain_archive_and_late_live_events(self):
+        with patch.object(session_log, "INDEX_STRIDE", 100):
+            self.store.append(self.sid, [{"type": "tick", "n": n} for n in range(7, 3000)])
+            self.store.end(self.sid)
+            self.store.flush()
+            self.assertTrue(self.store.append(self.sid, [{"type": "late", "n": 3000}]))
+            self.store.flush()
+            self.assertTrue(os.path.exists(session_log._events_path(self.sid)))
+            data = self.store.get(self.sid)
+            self.assertEqual([e["n"] for e in data["events"]], list(range(3001)))
+            self.assertIsNotNone(data["ended_at"])
+            listed = {item["id"]: item for item in self.store.list_sessions()}[self.sid]
+            self.assertEqual((listed["event_count"], listed["archived"]), (3001, True))
+            page = self.store.page(self.sid, after=2998)
+            self.assertEqual([e["n"] for e in page["events"]], [2998, 2999, 3000])
+            self.assertEqual((page["event_count"], page["next"]), (3001, 3001))
+            self.assertEqual(self.store.page(self.sid, after=3000)["events"], [{"type": "late", "n": 3000}])
+            exported = b"".join(self.store.export(self.sid)).decode("utf-8").splitlines()
+            self.assertEqual(len(exported), 3002)
+
+    def test_torn_tail_is_cut_before_appending(self):
+        self.store.close()
+        with open(session_log._events_path(self.sid), "a", encoding="utf-8") as f:
+            f.write('{"type": "ti')
+        store = session_log.SessionLogStore()
+        store.append(self.sid, [{"type": "tick", "n": 7}])
+        store.close()
+        self.assertEqual([e["n"] for e in store.get(self.sid)["events"]], list(range(8)))
+        self.assertEqual(store.page(self.sid, after=7)["events"], [{"type": "tick", "n": 7}])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import shm_transport
+from core.getdata_watcher import AdaptiveCadence
+
+
+class TestShmRing(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "GetData.shm")
+        self.writer = shm_transport.ShmRingWriter(self.path, slot_count=4, slot_size=256)
+
+    def tearDown(self):
+        self.writer.close()
+        shutil.rmtree(self.tmp)
+
+    def test_reads_latest_frame_once(self):
+        reader = shm_transport.ShmRingReader(self.path)
+        try:
+            self.assertIsNone(reader.read_latest())
+            self.writer.write("Speed:10|SimulationTime:1.00")
+            self.assertEqual(reader.read_latest(), (1, "Speed:10|SimulationTime:1.00"))
+            self.assertIsNone(reader.read_latest())
+        finally:
+            reader.close()
+
+    def test_counts_skipped_frames(self):
+        reader = shm_transport.ShmRingReader(self.path)
+        try:
+            self.writer.write("Speed:1")
+            reader.read_latest()
+            for i in range(2, 6):
+                self.writer.write(f"Speed:{i}")
+            seq, line = reader.read_latest() or (0, "")
+            self.assertEqual((seq, line), (5, "Speed:5"))
+            self.assertEqual(reader.skipped_frames, 3)
+        finally:
+            reader.close()
+
+    def test_detects_torn_slot(self):
+        reader = shm_transport.ShmRingReader(self.path)
+        try:
+            self.writer.write("Speed:10")
+            # Simula al escritor a mitad de slot: seq_start nuevo, seq_end aún viejo.
+            base = shm_transport._slot_offset(2 % 4, 256)
+            shm_transport._SLOT_HEAD.pack_into(self.writer._map, base, 2, 3, 0)
+            shm_transport._SEQ.pack_into(self.writer._map, shm_transport._WRITE_SEQ_OFFSET, 2)
+            self.assertIsNone(reader.read_latest())
+            self.assertEqual(reader.torn_reads, shm_transport.MAX_READ_RETRIES)
+        finally:
+            reader.close()
+
+    def test_rejects_oversized_frame(self):
+        with self.assertRaises(ValueError):
+            self.writer.write("x" * 1024)
+
+    def test_rejects_foreign_file(self):
+        other = os.path.join(self.tmp, "GetData.txt")
+        with open(other, "w", encoding="utf-8") as f:
+            f.write("Speed:10|" * 8)
+        with self.assertRaises(ValueError):
+            shm_transport.ShmRingReader(other)
+
+    def test_watcher_publishes_frames(self):
+        async def run():
+            queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+            watcher = shm_transport.ShmRingWatcher(
+                lambda: self.path,
+                queue,
+                asyncio.get_running_loop(),
+                cadence=AdaptiveCadence(fast_s=0.001),
+            )
+            watcher.start()
+            try:
+                self.writer.write("Speed:42|SimulationTime:2.00")
+                return await asyncio.wait_for(queue.get(), timeout=2.0), watcher.source_name
+            finally:
+                watcher.stop()
+
+        frame, source = asyncio.run(run())
+        self.assertEqual(frame.line, "Speed:42|SimulationTime:2.00")
+        self.assertEqual(source, "shm")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import telemetry_codec
+
+
+class TestEncodeJson(unittest.TestCase):
+    PAYLOAD = {"type": "TELEMETRY", "Speed": 12.5, "LocoName": "Clase 323 — Ñ", "seq": 3}
+
+    def test_round_trip(self):
+        self.assertEqual(json.loads(telemetry_codec.encode_json(self.PAYLOAD)), self.PAYLOAD)
+
+    def test_stdlib_fallback_is_compact(self):
+        with patch.object(telemetry_codec, "ORJSON_OK", False):
+            text = telemetry_codec.encode_json(self.PAYLOAD)
+            self.assertEqual(telemetry_codec.encoder_name(), "json")
+        self.assertNotIn(", ", text)
+        self.assertIn("Ñ", text)
+        self.assertEqual(json.loads(text), self.PAYLOAD)
+
+    def test_stdlib_rejects_non_finite(self):
+        with patch.object(telemetry_codec, "ORJSON_OK", False):
+            with self.assertRaises(ValueError):
+                telemetry_codec.encode_json({"Speed": float("nan")})
+
+
+class TestFieldTable(unittest.TestCase):
+    def test_ids_are_stable_and_append_only(self):
+        table = telemetry_codec.FieldTable()
+        base = len(table)
+        packed = table.pack({"type": "TELEMETRY", "seq": 1, "CurrentSpeed": 3.0})
+        self.assertEqual(packed, {0: "TELEMETRY", 1: 1, base: 3.0})
+        table.pack({"Throttle": 0.5, "CurrentSpeed": 4.0})
+        self.assertEqual(table.ids()["CurrentSpeed"], base)
+        self.assertEqual(table.ids_since(base), {"CurrentSpeed": base, "Throttle": base + 1})
+
+    def test_patch_changes_are_packed(self):
+        table = telemetry_codec.FieldTable()
+        patch_msg = {"type": "TELEMETRY_DELTA", "seq": 2, "base": 1, "changes": {"Speed": 1.0}}
+        self.assertEqual(table.unpack(table.pack(patch_msg)), patch_msg)
+
+    def test_full_table_falls_back_to_text_keys(self):
+        table = telemetry_codec.FieldTable(base=("type",), max_ids=2)
+        packed = table.pack({"type": "TELEMETRY", "A": 1, "B": 2})
+        self.assertEqual(packed, {0: "TELEMETRY", 1: 1, "B": 2})
+        self.assertEqual(len(table), 2)
+
+
+class TestNegotiateEncoding(unittest.TestCase):
+    def test_json_unless_requested(self):
+        self.assertEqual(telemetry_codec.negotiate_encoding(None), ("json", None))
+        self.assertEqual(telemetry_codec.negotiate_encoding("xml"), ("json", None))
+
+    def test_msgpack_without_dependency_falls_back_to_json(self):
+        with patch.object(telemetry_codec, "MSGPACK_OK", False):
+            self.assertEqual(
+                telemetry_codec.negotiate_encoding("msgpack", ["nexus.msgpack"]),
+                ("json", None),
+            )
+
+    @unittest.skipUnless(telemetry_codec.MSGPACK_OK, "msgpack no instalado")
+    def test_msgpack_by_query_or_subprotocol(self):
+        self.assertEqual(telemetry_codec.negotiate_encoding("MsgPack"), ("msgpack", None))
+        self.assertEqual(
+            telemetry_codec.negotiate_encoding(None, ["nexus.msgpack"]),
+            ("msgpack", "nexus.msgpack"),
+        )
+
+    @unittest.skipUnless(telemetry_codec.MSGPACK_OK, "msgpack no instalado")
+    def test_msgpack_round_trip(self):
+        import msgpack
+
+        table = telemetry_codec.FieldTable()
+        frame = {"type": "TELEMETRY", "seq": 7, "CurrentSpeed": 12.5, "LocoName": "Clase 323"}
+        data = telemetry_codec.encode_msgpack(table.pack(frame))
+        self.assertLess(len(data), len(telemetry_codec.encode_json(frame)))
+        self.assertEqual(table.unpack(msgpack.unpackb(data, strict_map_key=False)), frame)
+
+
+if __name__ == "__main__":
+    unittest.main()
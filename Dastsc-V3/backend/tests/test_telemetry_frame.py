@@ -0,0 +1,187 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.cab_inference import CabInferenceState, enrich_cab_telemetry, reapply_cab_fields
+from core.parser import CompiledLineParser
+from core.telemetry_frame import DeltaTracker, FrameSubscription, TelemetryFrame
+
+
+class _FakeRailDriver:
+    available = True
+
+    def __init__(self, values):
+        self._values = values
+
+    def get_loco_names(self):
+        return ["DTG", "Class 323"]
+
+    def get_value(self, name):
+        return self._values.get(name)
+
+
+class TestTelemetryFrame(unittest.TestCase):
+    def test_resolves_aliases_and_units(self):
+        frame = TelemetryFrame({
+            "SpeedoType": 2.0,
+            "Speed": 36.0,
+            "Combined": -0.25,
+            "Reverser": 1.0,
+            "DoorL": 1.0,
+            "StationDistance": 3.95,
+            "LocoName": "Class 323",
+        }, received_at=12.0)
+        self.assertEqual(frame.speedo_type, 2)
+        self.assertEqual(frame.speed_unit, "km/h")
+        self.assertAlmostEqual(frame.speed_ms, 10.0, places=2)
+        self.assertEqual(frame.combined_control, -0.25)
+        self.assertTrue(frame.has_reversal)
+        self.assertEqual(frame.reversal, 1.0)
+        self.assertEqual(frame.door_l, 1.0)
+        self.assertEqual(frame.door_r, 0.0)
+        self.assertEqual(frame.lua_station_raw, 3.95)
+        self.assertEqual(frame.loco_name, "Class 323")
+        self.assertEqual(frame.received_at, 12.0)
+
+    def test_defaults_on_missing_or_garbage(self):
+        frame = TelemetryFrame({"SpeedoType": "x", "ActiveCab": "?", "CombinedControl": "n/a"})
+        self.assertEqual(frame.speedo_type, 1)
+        self.assertEqual(frame.speed_unit, "MPH")
+        self.assertEqual(frame.speed_ms, 0.0)
+        self.assertEqual(frame.active_cab, 1)
+        self.assertEqual(frame.combined_control, 0.0)
+        self.assertFalse(frame.has_reversal)
+        self.assertEqual(frame.lua_station_raw, -1.0)
+
+    def test_from_record(self):
+        record = CompiledLineParser().parse("SpeedoType:1|CurrentSpeed:12.5000|ActiveCab:2")
+        frame = TelemetryFrame.from_record(record)
+        self.assertEqual(frame.speed_ms, 12.5)
+        self.assertEqual(frame.active_cab, 2)
+        frame.data["Extra"] = 1
+        self.assertIsNone(record.get("Extra"))
+
+    def test_cab_enrichment_updates_frame_and_data(self):
+        frame = TelemetryFrame({"CurrentSpeed": 5.0, "Reversal": 1.0, "ActiveCab": 1})
+        state = CabInferenceState()
+        client = _FakeRailDriver({"WheelSpeedAbsMS": -5.0})
+        enrich_cab_telemetry(frame, state, client=client)  # type: ignore[arg-type]
+        self.assertEqual(frame.active_cab, 2)
+        self.assertEqual(frame.data["ActiveCab"], 2)
+        self.assertEqual(frame.loco_name, "DTG / Class 323")
+        self.assertEqual(frame.data["WheelSpeedMS"], -5.0)
+        self.assertEqual(state.latched_cab, 2)
+
+    def test_reapply_cab_fields_without_raildriver(self):
+        state = CabInferenceState()
+        client = _FakeRailDriver({"WheelSpeedAbsMS": -5.0, "TrackMPH": -11.0})
+        enrich_cab_telemetry(
+            TelemetryFrame({"CurrentSpeed": 5.0, "Reversal": 1.0, "ActiveCab": 1}),
+            state,
+            client=client,  # type: ignore[arg-type]
+        )
+        frame = TelemetryFrame({"CurrentSpeed": 5.0, "Reversal": 1.0, "ActiveCab": 1})
+        reapply_cab_fields(frame, state)
+        self.assertEqual(frame.active_cab, 2)
+        self.assertEqual(frame.data["TrackMPH"], -11.0)
+        self.assertEqual(frame.loco_name, "DTG / Class 323")
+
+
+class TestFrameDelta(unittest.TestCase):
+    BASE = "SpeedoType:1|CurrentSpeed:10.0000|ActiveCab:1|LocoName:Class 323|SimulationTime:1.00"
+
+    def setUp(self):
+        self.parser = CompiledLineParser()
+
+    def _frame(self, line, received_at=0.0):
+        return TelemetryFrame.from_record(self.parser.parse(line), received_at)
+
+    def test_changed_keys_from_ingest(self):
+        first = self._frame(self.BASE)
+        self.assertIsNone(first.changed)
+        second = self._frame(self.BASE.replace("SimulationTime:1.00", "SimulationTime:1.10"))
+        self.assertEqual(second.changed, frozenset({"SimulationTime"}))
+        self.assertFalse(second.touches(frozenset({"CurrentSpeed", "ActiveCab"})))
+        self.assertTrue(second.touches(frozenset({"SimulationTime"})))
+
+    def test_coalesce_unions_changed_keys(self):
+        self._frame(self.BASE)
+        older = self._frame(self.BASE.replace("CurrentSpeed:10.0000", "CurrentSpeed:11.0000"))
+        newer = self._frame(self.BASE.replace("CurrentSpeed:10.0000", "CurrentSpeed:11.0000")
+                            .replace("SimulationTime:1.00", "SimulationTime:1.20"))
+        merged = TelemetryFrame.coalesce(older, newer)
+        self.assertEqual(merged.changed, frozenset({"CurrentSpeed", "SimulationTime"}))
+        self.assertIs(merged.data, newer.data)
+
+    def test_coalesce_leaves_shared_frame_untouched(self):
+        # El mismo frame va a publish y a session_log: coalescer en una rama no afecta a la otra.
+        self._frame(self.BASE)
+        shared = self._frame(self.BASE.replace("SimulationTime:1.00", "SimulationTime:1.10"))
+        before = shared.changed
+        full = TelemetryFrame({"CurrentSpeed": 1.0})
+        widened = TelemetryFrame.coalesce(full, shared)
+        self.assertIsNone(widened.changed)
+        self.assertIsNot(widened, shared)
+        self.assertEqual(shared.changed, before)
+
+    def test_subscription_skips_unrelated_frames(self):
+        sub = FrameSubscription("cab", ("CurrentSpeed", "ActiveCab"), refresh_s=1.0)
+        self.assertTrue(sub.wants(self._frame(self.BASE, 0.0)))
+        idle = self._frame(self.BASE.replace("SimulationTime:1.00", "SimulationTime:1.10"), 0.1)
+        self.assertFalse(sub.wants(idle))
+        moved = self._frame(self.BASE.replace("CurrentSpeed:10.0000", "CurrentSpeed:12.0000"), 0.2)
+        self.assertTrue(sub.wants(moved))
+        refresh = self._frame(self.BASE.replace("CurrentSpeed:10.0000", "CurrentSpeed:12.0000")
+                              .replace("SimulationTime:1.00", "SimulationTime:9.00"), 1.5)
+        self.assertTrue(sub.wants(refresh))
+        self.assertEqual(sub.status()["skipped"], 1)
+
+    def test_subscription_sees_rewritten_derived_keys(self):
+        sub = FrameSubscription("profile", ("LocoName",))
+        first = self._frame(self.BASE)
+        first.set_loco_name("DTG / Class 323")
+        self.assertTrue(sub.wants(first))
+        same = self._frame(self.BASE.replace("SimulationTime:1.00", "SimulationTime:1.10"))
+        same.set_loco_name("DTG / Class 323")
+        self.assertFalse(sub.wants(same))
+        other = self._frame(self.BASE.replace("SimulationTime:1.00", "SimulationTime:1.20"))
+        other.set_loco_name("DTG / Class 390")
+        self.assertTrue(sub.wants(other))
+
+    def test_subscription_change_stays_due_until_ran(self):
+        sub = FrameSubscription("profile", ("LocoName",))
+        self.assertTrue(sub.wants(self._frame(self.BASE, 0.0)))
+        changed = self._frame(self.BASE.replace("SimulationTime:1.00", "SimulationTime:1.10"), 0.1)
+        changed.set_loco_name("DTG / Class 390")
+        self.assertTrue(sub.due(changed))
+        later = self._frame(self.BASE.replace("SimulationTime:1.00", "SimulationTime:1.20"), 0.2)
+        self.assertTrue(sub.due(later))  # no se ejecutó: sigue pendiente
+        sub.ran(later)
+        idle = self._frame(self.BASE.replace("SimulationTime:1.00", "SimulationTime:1.30"), 0.3)
+        self.assertFalse(sub.due(idle))
+
+    def test_delta_tracker_reports_ingest_and_derived_changes(self):
+        tracker = DeltaTracker()
+        first = self._frame(self.BASE)
+        first.data["StationDistanceSource"] = "none"
+        self.assertIsNone(tracker.delta(first))
+
+        second = self._frame(self.BASE.replace("SimulationTime:1.00", "SimulationTime:1.10"))
+        second.data["StationDistanceSource"] = "none"
+        self.assertEqual(tracker.delta(second), {"SimulationTime": 1.1})
+
+        third = self._frame(self.BASE.replace("SimulationTime:1.00", "SimulationTime:1.10"))
+        third.data["StationDistanceSource"] = "lua"
+        third.data["StationDistance"] = 250.0
+        self.assertEqual(tracker.delta(third), {"StationDistanceSource": "lua", "StationDistance": 250.0})
+
+        fourth = self._frame(self.BASE.replace("SimulationTime:1.00", "SimulationTime:1.10"))
+        fourth.data["StationDistanceSource"] = "lua"
+        fourth.data["StationDistance"] = 250.0
+        self.assertEqual(tracker.delta(fourth), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core.ws_client import ClientConnection
+
+
+class _FakeWebSocket:
+    def __init__(self, stall=False):
+        self.sent = []
+        self.stall = stall
+        self.release = asyncio.Event()
+
+    async def send_text(self, text):
+        if self.stall:
+            await self.release.wait()
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+
+def _telemetry(seq):
+    return json.dumps({"type": "TELEMETRY", "seq": seq})
+
+
+class TestClientConnection(unittest.TestCase):
+    def test_sends_in_order_and_measures_lag(self):
+        async def run():
+            ws = _FakeWebSocket()
+            client = ClientConnection(ws)
+            client.start()
+            client.offer(json.dumps({"type": "COMMAND_ACK"}))
+            client.offer_telemetry(_telemetry(1))
+            await asyncio.sleep(0.01)
+            client.stop()
+            return ws.sent, client.status()
+
+        sent, status = asyncio.run(run())
+        self.assertEqual([m["type"] for m in sent], ["COMMAND_ACK", "TELEMETRY"])
+        self.assertEqual(status["sent"], 2)
+        self.assertEqual(status["pending"], 0)
+        self.assertGreaterEqual(status["max_lag_ms"], 0.0)
+
+    def test_binary_telemetry_goes_out_as_bytes(self):
+        async def run():
+            ws = _FakeWebSocket()
+            client = ClientConnection(ws, encoding="msgpack")
+            client.start()
+            client.offer(json.dumps({"type": "FIELD_IDS"}))
+            client.offer_telemetry(b"\x81\x00\xa9TELEMETRY")
+            await asyncio.sleep(0.01)
+            client.stop()
+            return ws.sent, client.status()
+
+        sent, status = asyncio.run(run())
+        self.assertEqual(sent, [{"type": "FIELD_IDS"}, b"\x81\x00\xa9TELEMETRY"])
+        self.assertEqual(status["encoding"], "msgpack")
+
+    def test_keeps_only_latest_telemetry(self):
+        async def run():
+            ws = _FakeWebSocket()
+            client = ClientConnection(ws)
+            for seq in range(1, 6):
+                client.offer_telemetry(_telemetry(seq))
+            client.start()
+            await asyncio.sleep(0.01)
+            client.stop()
+            return ws.sent, client.dropped
+
+        sent, dropped = asyncio.run(run())
+        self.assertEqual([m["seq"] for m in sent], [5])
+        self.assertEqual(dropped, 4)
+
+    def test_delta_client_needs_keyframe_after_drop(self):
+        async def run():
+            client = ClientConnection(_FakeWebSocket(), "delta")
+            client.state.keyframe_sent()
+            client.prepare_telemetry()
+            self.assertFalse(client.state.needs_keyframe)
+            client.offer_telemetry(_telemetry(1))
+            client.prepare_telemetry()
+            return client.state.needs_keyframe
+
+        self.assertTrue(asyncio.run(run()))
+
+    def test_evicts_stalled_consumer(self):
+        async def run():
+            evicted = []
+            ws = _FakeWebSocket(stall=True)
+            client = ClientConnection(
+                ws,
+                max_dropped_streak=10,
+                on_evict=lambda c, reason: evicted.append(reason),
+            )
+            client.start()
+            client.offer_telemetry(_telemetry(0))
+            await asyncio.sleep(0.01)  # el escritor queda bloqueado en send_text
+            for seq in range(1, 50):
+                client.offer_telemetry(_telemetry(seq))
+            status = client.status()
+            client.stop()
+            return evicted, status
+
+        evicted, status = asyncio.run(run())
+        self.assertEqual(evicted, ["dropped_streak"])
+        self.assertEqual(status["pending"], 0)
+        self.assertEqual(status["evicted"], "dropped_streak")
+
+    def test_evicts_on_send_timeout(self):
+        async def run():
+            evicted = []
+            client = ClientConnection(
+                _FakeWebSocket(stall=True),
+                send_timeout_s=0.01,
+                on_evict=lambda c, reason: evicted.append(reason),
+            )
+            client.start()
+            client.offer_telemetry(_telemetry(1))
+            await asyncio.sleep(0.05)
+            return evicted
+
+        self.assertEqual(asyncio.run(run()), ["send_timeout"])
+
+    def test_control_queue_is_bounded(self):
+        async def run():
+            evicted = []
+            client = ClientConnection(
+                _FakeWebSocket(),
+                max_control_queue=3,
+                on_evict=lambda c, reason: evicted.append(reason),
+            )
+            for _ in range(5):
+                client.offer("{}")
+            return evicted, client.status()["pending"]
+
+        evicted, pending = asyncio.run(run())
+        self.assertEqual(evicted, ["control_queue_full"])
+        self.assertEqual(pending, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
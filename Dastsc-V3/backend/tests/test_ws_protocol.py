@@ -0,0 +1,109 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from core import ws_protocol
+
+
+class TestClientState(unittest.TestCase):
+    def test_full_protocol_by_default(self):
+        state = ws_protocol.ClientState()
+        self.assertEqual(state.protocol, ws_protocol.PROTOCOL_FULL)
+        self.assertEqual(state.next_send(True), ws_protocol.SEND_FULL)
+
+    def test_keyframe_then_patches_then_periodic_keyframe(self):
+        state = ws_protocol.ClientState("delta", keyframe_every=3)
+        sends = [state.next_send(True) for _ in range(6)]
+        self.assertEqual(sends, ["keyframe", "patch", "patch", "patch", "keyframe", "patch"])
+
+    def test_keyframe_when_no_patch_available(self):
+        state = ws_protocol.ClientState("DELTA", keyframe_every=10)
+        state.next_send(True)
+        self.assertEqual(state.next_send(False), ws_protocol.SEND_KEYFRAME)
+
+    def test_resync_forces_keyframe(self):
+        state = ws_protocol.ClientState("delta", keyframe_every=10)
+        state.next_send(True)
+        state.next_send(True)
+        state.request_resync()
+        self.assertEqual(state.next_send(True), ws_protocol.SEND_KEYFRAME)
+        self.assertEqual(state.status()["resyncs"], 1)
+
+    def test_normalize_protocol(self):
+        self.assertEqual(ws_protocol.normalize_protocol(" Delta "), "delta")
+        self.assertIsNone(ws_protocol.normalize_protocol("msgpack"))
+        self.assertIsNone(ws_protocol.normalize_protocol(None))
+
+
+class TestMessages(unittest.TestCase):
+    def test_build_patch(self):
+        message = {"type": "TELEMETRY", "seq": 7, "Speed": 10.0, "Throttle": 0.5,
+                   "timestamp": 123.0, "gameLinked": True}
+        patch = ws_protocol.build_patch(message, {"Speed": 9.0})
+        self.assertEqual(patch, {
+            "type": "TELEMETRY_DELTA",
+            "seq": 7,
+            "base": 6,
+            "changes": {"Speed": 10.0, "timestamp": 123.0, "gameLinked": True},
+        })
+
+    def test_build_keyframe_keeps_message(self):
+        message = {"type": "TELEMETRY", "seq": 1, "Speed": 1.0}
+        keyframe = ws_protocol.build_keyframe(message)
+        self.assertTrue(keyframe["keyframe"])
+        self.assertNotIn("keyframe", message)
+
+
+class TestSubscription(unittest.TestCase):
+    def test_parse_subscription(self):
+        sub = ws_protocol.parse_subscription({"fields": ["CurrentSpeed", "TrainBrake"], "max_hz": 10})
+        self.assertEqual(sub.fields, frozenset({"CurrentSpeed", "TrainBrake"}))
+        self.assertAlmostEqual(sub.min_interval_s, 0.1)
+        self.assertEqual(ws_protocol.parse_subscription({"fields": "*"}), ws_protocol.ALL_FIELDS)
+
+    def test_parse_subscription_errors(self):
+        for cmd, error in (
+            ({"fields": "CurrentSpeed"}, "invalid_fields"),
+            ({"fields": [1, 2]}, "invalid_fields"),
+            ({"max_hz": 0}, "invalid_max_hz"),
+            ({"max_hz": "fast"}, "invalid_max_hz"),
+        ):
+            with self.assertRaises(ValueError) as ctx:
+                ws_protocol.parse_subscription(cmd)
+            self.assertEqual(str(ctx.exception), error)
+
+    def test_project_keeps_envelope(self):
+        message = {"type": "TELEMETRY", "seq": 4, "timestamp": 1.0, "gameLinked": True,
+                   "CurrentSpeed": 10.0, "Throttle": 0.4}
+        projected = ws_protocol.project(message, frozenset({"CurrentSpeed", "Missing"}))
+        self.assertEqual(projected, {"type": "TELEMETRY", "seq": 4, "timestamp": 1.0,
+                                     "gameLinked": True, "CurrentSpeed": 10.0})
+        self.assertIs(ws_protocol.project(message, None), message)
+
+    def test_group_rate_limit_accumulates_changes(self):
+        group = ws_protocol.SubscriptionGroup(
+            ws_protocol.Subscription(frozenset({"CurrentSpeed", "TrainBrake"}), 10.0),
+        )
+        group.note_frame(None)
+        self.assertTrue(group.should_send(0.0, group.relevant_changes(), False))
+        group.mark_sent(0.0)
+        group.note_frame({"CurrentSpeed"})
+        self.assertFalse(group.should_send(0.05, group.relevant_changes(), False))
+        group.note_frame({"TrainBrake", "Throttle"})
+        changes = group.relevant_changes()
+        self.assertEqual(changes, {"CurrentSpeed", "TrainBrake"})
+        self.assertTrue(group.should_send(0.1, changes, False))
+
+    def test_group_skips_irrelevant_frames_until_keepalive(self):
+        group = ws_protocol.SubscriptionGroup(ws_protocol.Subscription(frozenset({"CurrentSpeed"})))
+        group.mark_sent(0.0)
+        group.note_frame({"Throttle"})
+        self.assertFalse(group.should_send(0.5, group.relevant_changes(), False))
+        self.assertTrue(group.should_send(0.5, group.relevant_changes(), True))
+        self.assertTrue(group.should_send(1.5, group.relevant_changes(), False))
+
+
+if __name__ == "__main__":
+    unittest.main()
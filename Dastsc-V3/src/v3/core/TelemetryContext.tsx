@@ -249,7 +249,8 @@ export const TelemetryProvider = ({ children }: { children: ReactNode }) => {
           applyProfiles(message.available_profiles);
         }
         applyActiveProfile(resolveIncomingProfile(message, availableProfilesRef.current));
-        return;
+        // INIT puede traer el último frame para no esperar al siguiente TELEMETRY.
+        if (!isTelemetryMessage(message)) return;
       }
 
       syncActiveProfile(message);
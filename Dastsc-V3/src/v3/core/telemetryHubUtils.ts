@@ -19,16 +19,25 @@ export type WsMessage = Record<string, unknown> & {
   active_profile?: ProfileSummary | null;
   active_profile_id?: string | null;
   data?: WsMessage;
+  /** INIT: último TELEMETRY conocido (omitido si caducó). */
+  telemetry?: WsMessage;
 };
 
 export function isTelemetryMessage(message: WsMessage): boolean {
-  return message.type === 'TELEMETRY' || message.type === 'DATA';
+  return (
+    message.type === 'TELEMETRY' ||
+    message.type === 'DATA' ||
+    (message.type === 'INIT' && !!message.telemetry)
+  );
 }
 
 export function extractRawTelemetry(message: WsMessage): WsMessage | null {
   if (message.type === 'DATA') {
     return message.data ?? null;
   }
+  if (message.type === 'INIT') {
+    return message.telemetry ?? null;
+  }
   if (message.type === 'TELEMETRY') {
     return message;
   }